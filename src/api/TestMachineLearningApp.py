@@ -1,10 +1,19 @@
 import unittest
-from unittest.mock import MagicMock, patch
+from unittest.mock import MagicMock, patch, ANY
+from concurrent.futures import ThreadPoolExecutor
 import mysql.connector
 import pandas as pd
 from datetime import datetime, timedelta
 import joblib
-from machine_learning_aadam import DatabaseManager, ForecastModel, ForecastGenerator
+import threading
+import time
+import os
+import tempfile
+import numpy as np
+from compiled_prophet import CompiledProphet
+import sensor_archive
+from bulk_load import infile_literal
+from machine_learning_aadam import DatabaseManager, ForecastModel, ForecastGenerator, ModelRegistry, ForecastJobQueue, app
 
 class EmojiTestResult(unittest.TextTestResult):
     def addSuccess(self, test):
@@ -59,6 +68,85 @@ class TestDatabaseManager(unittest.TestCase):
         self.mock_cursor.execute.assert_any_call("TRUNCATE TABLE forecastedline5")
         self.mock_conn.commit.assert_called()
 
+    def test_store_forecast_frame(self):
+        forecast = pd.DataFrame({
+            'ds': pd.to_datetime(["2025-01-01 00:00:00", "2025-01-01 00:00:30"]),
+            'yhat': [10.5, 10.6],
+            'yhat_lower': [9.5, 9.6],
+            'yhat_upper': [11.5, 11.6]
+        })
+        stats = self.db_manager.store_forecast_frame(self.mock_conn, "line4", "r01", forecast)
+        query, params = self.mock_cursor.execute.call_args[0]
+        self.assertIn("INSERT INTO forecastedline4", query)
+        self.assertEqual(query.count("(%s, %s, %s, %s, %s)"), 2)
+        self.assertEqual(params[5:], ["r01", datetime(2025, 1, 1, 0, 0, 30), 10.6, 9.6, 11.6])
+        self.mock_conn.commit.assert_called_once()
+        self.assertEqual(stats['rows'], 2)
+
+    def test_store_line_forecasts_batched(self):
+        self.db_manager.batch_size = 4
+        forecasts = pd.DataFrame({
+            'sensor': ["r01"] * 10,
+            'ds': pd.date_range("2025-01-01", periods=10, freq="30s"),
+            'yhat': [10.0] * 10,
+            'yhat_lower': [9.0] * 10,
+            'yhat_upper': [11.0] * 10
+        })
+        stats = self.db_manager.store_line_forecasts(self.mock_conn, "line5", forecasts)
+        self.assertEqual(self.mock_cursor.execute.call_count, 3)
+        self.mock_conn.commit.assert_called_once()
+        self.assertEqual(stats['rows'], 10)
+        self.assertGreater(stats['rows_per_second'], 0)
+
+    def test_store_line_forecasts_load_data_infile(self):
+        self.db_manager.load_data_infile = True
+        forecasts = pd.DataFrame({
+            'sensor': ["r01", "r02"],
+            'ds': pd.to_datetime(["2025-01-01 00:00:00", "2025-01-01 00:00:00"]),
+            'yhat': [10.0, 20.0],
+            'yhat_lower': [9.0, 19.0],
+            'yhat_upper': [11.0, 21.0]
+        })
+        self.db_manager.store_line_forecasts(self.mock_conn, "line5", forecasts)
+        query = self.mock_cursor.execute.call_args[0][0]
+        self.assertTrue(query.startswith("LOAD DATA LOCAL INFILE"))
+        self.assertIn("INTO TABLE forecastedline5", query)
+        self.mock_conn.commit.assert_called_once()
+
+    def test_load_data_infile_path_literal(self):
+        # Backslashes would be read as escapes (\t, \n) inside the MySQL string
+        self.assertEqual(infile_literal("C:\\Users\\me\\AppData\\Local\\Temp\\tmpn1.csv"),
+                         "'C:/Users/me/AppData/Local/Temp/tmpn1.csv'")
+        self.assertEqual(infile_literal("/tmp/it's.csv"), "'/tmp/it\\'s.csv'")
+
+    def test_setup_forecast_table_incremental_keeps_rows(self):
+        self.mock_cursor.fetchone.return_value = ("forecastedline5",)
+        self.db_manager.setup_forecast_table(self.mock_conn, "line5", truncate=False)
+        executed = [call[0][0] for call in self.mock_cursor.execute.call_args_list]
+        self.assertNotIn("TRUNCATE TABLE forecastedline5", executed)
+
+    def test_store_line_forecasts_upsert(self):
+        forecasts = pd.DataFrame({
+            'sensor': ["r01"],
+            'ds': pd.to_datetime(["2025-01-01 00:00:00"]),
+            'yhat': [10.0],
+            'yhat_lower': [9.0],
+            'yhat_upper': [11.0]
+        })
+        self.db_manager.store_line_forecasts(self.mock_conn, "line5", forecasts, upsert=True)
+        query = self.mock_cursor.execute.call_args[0][0]
+        self.assertIn("ON DUPLICATE KEY UPDATE", query)
+
+    def test_expire_forecasts(self):
+        self.mock_cursor.rowcount = 3
+        expired = self.db_manager.expire_forecasts(
+            self.mock_conn, "line4", datetime(2025, 1, 1, 0, 0), datetime(2025, 1, 1, 0, 10)
+        )
+        self.assertEqual(expired, 3)
+        query = self.mock_cursor.execute.call_args[0][0]
+        self.assertTrue(query.startswith("DELETE FROM forecastedline4"))
+        self.mock_conn.commit.assert_called_once()
+
     def test_store_forecasts(self):
         test_forecast = {
             'yhat': 10.5,
@@ -103,6 +191,12 @@ class TestForecastModel(unittest.TestCase):
         sensors = self.forecast_model.detect_sensors("line4")
         self.assertEqual(sensors, [])
 
+    @patch('os.path.exists', return_value=True)
+    def test_model_path_prefers_compiled_artifact(self, mock_exists):
+        self.assertTrue(self.forecast_model.model_path("line5", "r01").endswith("prophet_r01.pkl"))
+        self.forecast_model.compiled = True
+        self.assertTrue(self.forecast_model.model_path("line5", "r01").endswith("prophet_r01.npz"))
+
     @patch('joblib.load')
     def test_load_model_and_forecast_success(self, mock_load):
         mock_load.return_value = self.mock_model
@@ -112,6 +206,23 @@ class TestForecastModel(unittest.TestCase):
         )
         self.assertEqual(forecast['yhat'], 10.0)
 
+    @patch('joblib.load')
+    def test_forecast_horizon_single_predict(self, mock_load):
+        mock_load.return_value = self.mock_model
+        timestamps = [datetime(2025, 1, 1, 0, 0, 0) + i * timedelta(seconds=30) for i in range(5)]
+        self.mock_model.predict.return_value = pd.DataFrame({
+            'ds': timestamps,
+            'yhat': [10.0] * 5,
+            'yhat_lower': [9.0] * 5,
+            'yhat_upper': [11.0] * 5
+        })
+        forecast = self.forecast_model.forecast_horizon(
+            "/test/path/models/line4/prophet_r01.pkl", timestamps
+        )
+        self.mock_model.predict.assert_called_once()
+        self.assertEqual(len(self.mock_model.predict.call_args[0][0]), 5)
+        self.assertEqual(list(forecast.columns), ['ds', 'yhat', 'yhat_lower', 'yhat_upper'])
+
     @patch('joblib.load')
     def test_load_model_and_forecast_failure(self, mock_load):
         mock_load.side_effect = Exception("Model error")
@@ -121,6 +232,122 @@ class TestForecastModel(unittest.TestCase):
         )
         self.assertIsNone(forecast)
 
+class TestModelRegistry(unittest.TestCase):
+    def setUp(self):
+        self.registry = ModelRegistry(max_models=2)
+
+    @patch('os.path.getmtime', return_value=1.0)
+    @patch('joblib.load')
+    def test_model_loaded_once(self, mock_load, mock_mtime):
+        first = self.registry.get("models/line5/prophet_r01.pkl")
+        second = self.registry.get("models/line5/prophet_r01.pkl")
+        self.assertIs(first, second)
+        mock_load.assert_called_once()
+
+    @patch('os.path.getmtime')
+    @patch('joblib.load')
+    def test_model_reloaded_when_file_changes(self, mock_load, mock_mtime):
+        mock_mtime.return_value = 1.0
+        self.registry.get("models/line5/prophet_r01.pkl")
+        mock_mtime.return_value = 2.0
+        self.registry.get("models/line5/prophet_r01.pkl")
+        self.assertEqual(mock_load.call_count, 2)
+
+    @patch('os.path.getmtime', return_value=1.0)
+    @patch('joblib.load')
+    def test_least_recently_used_evicted(self, mock_load, mock_mtime):
+        self.registry.get("prophet_r01.pkl")
+        self.registry.get("prophet_r02.pkl")
+        self.registry.get("prophet_r01.pkl")
+        self.registry.get("prophet_r03.pkl")
+        self.assertEqual(len(self.registry), 2)
+        self.registry.get("prophet_r01.pkl")
+        self.assertEqual(mock_load.call_count, 3)
+
+MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "line5", "prophet_r01.pkl")
+
+try:
+    import prophet
+    HAS_PROPHET = True
+except ImportError:
+    HAS_PROPHET = False
+
+@unittest.skipUnless(HAS_PROPHET, "prophet is required to load the pickled models")
+class TestCompiledProphet(unittest.TestCase):
+    def setUp(self):
+        self.model = joblib.load(MODEL_PATH)
+        self.compiled = CompiledProphet.from_prophet(self.model)
+        self.future = pd.DataFrame({
+            "ds": [datetime(2025, 4, 7, 14, 28, 0) + i * timedelta(seconds=30) for i in range(60)]
+        })
+
+    def test_yhat_matches_prophet(self):
+        expected = self.model.predict(self.future)
+        actual = self.compiled.predict(self.future)
+        np.testing.assert_allclose(actual['yhat'], expected['yhat'], rtol=1e-9, atol=1e-6)
+
+    def test_intervals_match_prophet(self):
+        expected = self.model.predict(self.future)
+        actual = self.compiled.predict(self.future)
+        width = (expected['yhat_upper'] - expected['yhat_lower']).mean()
+        # Both sides are Monte Carlo quantiles, so compare on average
+        self.assertLess((actual['yhat_lower'] - expected['yhat_lower']).abs().mean(), 0.1 * width)
+        self.assertLess((actual['yhat_upper'] - expected['yhat_upper']).abs().mean(), 0.1 * width)
+
+    def test_artifact_round_trip(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "prophet_r01.npz")
+            self.compiled.save(path)
+            loaded = CompiledProphet.load(path)
+        np.testing.assert_array_equal(
+            loaded.predict(self.future)['yhat'], self.compiled.predict(self.future)['yhat']
+        )
+
+    def test_registry_loads_compiled_artifact(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "prophet_r01.npz")
+            self.compiled.save(path)
+            model = ModelRegistry().get(path)
+        self.assertIsInstance(model, CompiledProphet)
+
+try:
+    import pyarrow
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+@unittest.skipUnless(HAS_PYARROW, "pyarrow is required for the sensor archive")
+class TestSensorArchive(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cursor = MagicMock()
+        self.cursor.description = [("timestamp",), ("timezone",), ("r01",)]
+        self.conn = MagicMock()
+        self.conn.cursor.return_value = self.cursor
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_export_is_incremental_and_read_back(self):
+        self.cursor.fetchone.return_value = (datetime(2025, 4, 6, 23, 59, 30),)
+        self.cursor.fetchall.side_effect = [
+            [(datetime(2025, 4, 6, 23, 59, 30), "+01", 1.5)],
+            [(datetime(2025, 4, 7, 0, 0, 0), "+01", 2.5), (datetime(2025, 4, 7, 0, 0, 30), "+01", None)]
+        ]
+        written = sensor_archive.export_line(self.conn, "line5", self.tmp.name, until=datetime(2025, 4, 8).date())
+        self.assertEqual([os.path.basename(p) for p in written], ["2025-04-06.arrow", "2025-04-07.arrow"])
+
+        # A second run only asks for the days after the newest partition
+        self.cursor.fetchall.side_effect = [[]]
+        sensor_archive.export_line(self.conn, "line5", self.tmp.name, until=datetime(2025, 4, 9).date())
+        self.assertEqual(self.cursor.execute.call_args[0][1][0], datetime(2025, 4, 8).date())
+
+        df = sensor_archive.read_line("line5", self.tmp.name, start=datetime(2025, 4, 7).date())
+        self.assertEqual(list(df.columns), ["timestamp", "timezone", "r01"])
+        self.assertEqual(df["timestamp"].tolist(), [pd.Timestamp("2025-04-07 00:00:00"), pd.Timestamp("2025-04-07 00:00:30")])
+        self.assertEqual(df["r01"].iloc[0], 2.5)
+        self.assertTrue(np.isnan(df["r01"].iloc[1]))
+
 class TestForecastGenerator(unittest.TestCase):
     def setUp(self):
         self.db_config = {
@@ -140,6 +367,12 @@ class TestForecastGenerator(unittest.TestCase):
         )
         self.generator.db_manager = MagicMock()
         self.generator.forecast_model = MagicMock()
+        self.generator.forecast_model.forecast_horizon.return_value = pd.DataFrame({
+            'ds': self.generator.generate_timestamps(),
+            'yhat': [10.0] * 11,
+            'yhat_lower': [9.0] * 11,
+            'yhat_upper': [11.0] * 11
+        })
 
     def test_generate_timestamps(self):
         timestamps = self.generator.generate_timestamps()
@@ -148,12 +381,41 @@ class TestForecastGenerator(unittest.TestCase):
     def test_process_line_line4(self):
         self.generator.forecast_model.detect_sensors.return_value = [f"r{i:02d}" for i in range(1, 9)]
         self.generator.process_line("line4")
-        self.assertEqual(self.generator.db_manager.store_forecasts.call_count, 8 * 11)
+        self.assertEqual(self.generator.forecast_model.forecast_horizon.call_count, 8)
+        self.generator.db_manager.store_line_forecasts.assert_called_once()
+        _, _, forecasts = self.generator.db_manager.store_line_forecasts.call_args[0]
+        self.assertEqual(len(forecasts), 8 * 11)
+        _, timestamps = self.generator.forecast_model.forecast_horizon.call_args[0]
+        self.assertEqual(len(timestamps), 11)
 
     def test_process_line_line5(self):
         self.generator.forecast_model.detect_sensors.return_value = [f"r{i:02d}" for i in range(1, 18)]
         self.generator.process_line("line5")
-        self.assertEqual(self.generator.db_manager.store_forecasts.call_count, 17 * 11)
+        self.assertEqual(self.generator.forecast_model.forecast_horizon.call_count, 17)
+        self.generator.db_manager.store_line_forecasts.assert_called_once()
+        _, _, forecasts = self.generator.db_manager.store_line_forecasts.call_args[0]
+        self.assertEqual(len(forecasts), 17 * 11)
+        _, timestamps = self.generator.forecast_model.forecast_horizon.call_args[0]
+        self.assertEqual(len(timestamps), 11)
+
+    def test_process_line_incremental(self):
+        self.generator.incremental = True
+        self.generator.forecast_model.detect_sensors.return_value = ["r01", "r02"]
+        self.generator.db_manager.get_last_forecast_times.return_value = {
+            "r01": datetime(2025, 1, 1, 0, 7, 0),
+            "r02": datetime(2025, 1, 1, 0, 10, 0)
+        }
+        self.generator.process_line("line4")
+        # r01 only needs the three minutes after its last forecast, r02 is up to date
+        self.generator.forecast_model.forecast_horizon.assert_called_once()
+        _, timestamps = self.generator.forecast_model.forecast_horizon.call_args[0]
+        self.assertEqual(timestamps[0], datetime(2025, 1, 1, 0, 8, 0))
+        self.assertEqual(len(timestamps), 3)
+        self.generator.db_manager.setup_forecast_table.assert_called_once_with(
+            ANY, "line4", truncate=False
+        )
+        self.generator.db_manager.expire_forecasts.assert_called_once()
+        self.assertTrue(self.generator.db_manager.store_line_forecasts.call_args[1]['upsert'])
 
     def test_process_line_no_sensors(self):
         self.generator.forecast_model.detect_sensors.return_value = []
@@ -165,6 +427,93 @@ class TestForecastGenerator(unittest.TestCase):
         self.generator.generate_and_store_forecasts()
         self.assertEqual(self.generator.process_line.call_count, 2)
 
+    @patch('machine_learning_aadam.ProcessPoolExecutor', wraps=ThreadPoolExecutor)
+    @patch('machine_learning_aadam.forecast_sensor')
+    def test_generate_and_store_forecasts_parallel(self, mock_forecast_sensor, mock_executor):
+        self.generator.parallel = True
+        self.generator.workers = 2
+        self.generator.forecast_model.detect_sensors.side_effect = lambda line: (
+            ["r01", "r02"] if line == "line4" else ["r01", "r02", "r03"]
+        )
+        mock_forecast_sensor.side_effect = lambda script_dir, line, sensor, timestamps, compiled: pd.DataFrame({
+            'ds': timestamps,
+            'yhat': [10.0] * len(timestamps),
+            'yhat_lower': [9.0] * len(timestamps),
+            'yhat_upper': [11.0] * len(timestamps),
+            'sensor': sensor
+        })
+        self.generator.generate_and_store_forecasts()
+        self.assertEqual(mock_forecast_sensor.call_count, 5)
+        written = {call[0][1]: len(call[0][2])
+                   for call in self.generator.db_manager.store_line_forecasts.call_args_list}
+        self.assertEqual(written, {"line4": 2 * 11, "line5": 3 * 11})
+
+        # The pool outlives the run, so its workers keep their models resident
+        self.generator.generate_and_store_forecasts()
+        self.assertEqual(mock_forecast_sensor.call_count, 10)
+        mock_executor.assert_called_once_with(max_workers=2)
+        self.generator.close()
+        self.assertIsNone(self.generator._executor)
+
+class TestForecastJobQueue(unittest.TestCase):
+    def setUp(self):
+        self.release = threading.Event()
+        self.generator = MagicMock()
+        self.generator.lines = ["line4", "line5"]
+
+        def run(progress):
+            progress("line4", "running")
+            self.release.wait(5)
+            progress("line4", "done", rows=88, seconds=0.1)
+            progress("line5", "done", rows=187, seconds=0.2)
+
+        self.generator.generate_and_store_forecasts.side_effect = run
+        self.jobs = ForecastJobQueue(self.generator)
+
+    def wait_for(self, job_id, status):
+        for _ in range(100):
+            job = self.jobs.get(job_id)
+            if job["status"] == status:
+                return job
+            time.sleep(0.01)
+        self.fail(f"Job never reached {status}")
+
+    def test_job_completes_with_line_progress(self):
+        job, coalesced = self.jobs.submit()
+        self.assertFalse(coalesced)
+        self.release.set()
+        job = self.wait_for(job["job_id"], "completed")
+        self.assertEqual(job["progress"], 1.0)
+        self.assertEqual(job["lines"]["line5"], {"status": "done", "rows": 187, "seconds": 0.2})
+        self.assertIsNotNone(job["seconds"])
+
+    def test_duplicate_submission_coalesces(self):
+        first, _ = self.jobs.submit()
+        self.wait_for(first["job_id"], "running")
+        second, coalesced = self.jobs.submit()
+        self.assertTrue(coalesced)
+        self.assertEqual(first["job_id"], second["job_id"])
+        self.release.set()
+        self.wait_for(first["job_id"], "completed")
+        self.generator.generate_and_store_forecasts.assert_called_once()
+
+    def test_failed_job_reports_error(self):
+        self.generator.generate_and_store_forecasts.side_effect = Exception("DB down")
+        job, _ = self.jobs.submit()
+        job = self.wait_for(job["job_id"], "failed")
+        self.assertEqual(job["error"], "DB down")
+
+    @patch('machine_learning_aadam.forecast_jobs')
+    def test_forecast_endpoint_returns_job_id(self, mock_jobs):
+        mock_jobs.submit.return_value = ({"job_id": "abc123"}, False)
+        mock_jobs.get.side_effect = lambda job_id: {"job_id": job_id, "status": "running"} if job_id == "abc123" else None
+        client = app.test_client()
+        response = client.post('/forecast')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.get_json()["job_id"], "abc123")
+        self.assertEqual(client.get('/forecast/abc123').get_json()["status"], "running")
+        self.assertEqual(client.get('/forecast/unknown').status_code, 404)
+
 if __name__ == '__main__':
     unittest.main(
         testRunner=unittest.TextTestRunner(
@@ -0,0 +1,140 @@
+import re
+from datetime import datetime, timedelta
+import numpy as np
+
+EPOCH = datetime(1970, 1, 1)
+BUCKET_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+# Stats that can be rebuilt from count/sum/min/max/sumsq, and so served from rollups
+BASIC_STATS = ("count", "sum", "avg", "min", "max", "std")
+MAX_BUCKETS = 10000
+
+def parse_bucket(bucket):
+    """Bucket width in seconds from strings like '30s', '5m', '1h' or '1d'"""
+    match = re.fullmatch(r"(\d+)([smhd])", bucket.strip())
+    if not match or int(match.group(1)) == 0:
+        raise ValueError(f"Invalid bucket '{bucket}', expected e.g. 30s, 5m, 1h or 1d")
+    return int(match.group(1)) * BUCKET_UNITS[match.group(2)]
+
+def parse_stats(stats):
+    """Validated list of stats: count, sum, avg, min, max or a percentile like p95"""
+    parsed = [stat.strip().lower() for stat in stats.split(",") if stat.strip()]
+    for stat in parsed:
+        if stat not in BASIC_STATS and not re.fullmatch(r"p(100|\d{1,2})", stat):
+            raise ValueError(f"Unknown stat '{stat}'")
+    if not parsed:
+        raise ValueError("No stats requested")
+    return parsed
+
+def bucket_starts(timestamps, bucket_seconds):
+    """Epoch seconds of the bucket each timestamp falls in"""
+    x = np.fromiter(((t - EPOCH).total_seconds() for t in timestamps), dtype=np.float64, count=len(timestamps))
+    return np.floor(x / bucket_seconds) * bucket_seconds
+
+def aggregate(timestamps, columns, bucket_seconds, stats):
+    """Per-bucket stats for each column in one vectorized pass
+
+    timestamps must be ascending. Returns the bucket start times and, for each
+    column, a dict of stat -> array with NaN where a bucket had no values.
+    Buckets without any rows are left out.
+    """
+    if not len(timestamps):
+        return np.array([]), [{stat: np.array([]) for stat in stats} for _ in columns]
+
+    buckets = bucket_starts(timestamps, bucket_seconds)
+    changed = np.r_[True, buckets[1:] != buckets[:-1]]
+    starts = np.flatnonzero(changed)
+    bucket_ids = np.cumsum(changed)
+
+    results = []
+    for column in columns:
+        y = np.fromiter((np.nan if v is None else v for v in column), dtype=np.float64, count=len(buckets))
+        valid = ~np.isnan(y)
+        filled = np.where(valid, y, 0.0)
+        count = np.add.reduceat(valid.astype(np.int64), starts).astype(np.float64)
+        result = finalize(
+            stats,
+            count=count,
+            total=np.add.reduceat(filled, starts),
+            low=np.fmin.reduceat(y, starts),
+            high=np.fmax.reduceat(y, starts),
+            sumsq=np.add.reduceat(filled * filled, starts)
+        )
+        for stat in stats:
+            if stat not in BASIC_STATS:
+                result[stat] = _percentile(y, bucket_ids, starts, count, int(stat[1:]) / 100)
+        results.append(result)
+    return buckets[starts], results
+
+def aggregate_rollups(rows, sensors, bucket_seconds, stats):
+    """Merge rollup rows (bucket, sensor, samples, sum, min, max, sumsq) into wider buckets
+
+    Works for any bucket that is a whole multiple of the rollup width, since
+    count, sum, min, max and sumsq all combine exactly.
+    """
+    if not rows:
+        return np.array([]), [{stat: np.array([]) for stat in stats} for _ in sensors]
+
+    keys, position = np.unique(bucket_starts([row[0] for row in rows], bucket_seconds), return_inverse=True)
+    sensor_index = {sensor: i for i, sensor in enumerate(sensors)}
+    owner = np.fromiter((sensor_index[row[1]] for row in rows), dtype=np.int64, count=len(rows))
+    values = np.array([row[2:7] for row in rows], dtype=np.float64)
+
+    results = []
+    for i in range(len(sensors)):
+        mine = owner == i
+        at, samples, total, low, high, sumsq = position[mine], *values[mine].T
+        lows = np.full(len(keys), np.nan)
+        highs = np.full(len(keys), np.nan)
+        np.fmin.at(lows, at, low)
+        np.fmax.at(highs, at, high)
+        result = finalize(
+            stats,
+            count=np.bincount(at, weights=samples, minlength=len(keys)),
+            total=np.bincount(at, weights=total, minlength=len(keys)),
+            low=lows,
+            high=highs,
+            sumsq=np.bincount(at, weights=sumsq, minlength=len(keys))
+        )
+        results.append(result)
+    return keys, results
+
+def finalize(stats, count, total, low, high, sumsq):
+    """Basic stats per bucket from its running sums, NaN where a bucket had no values"""
+    empty = count == 0
+    result = {}
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = total / count
+        for stat in stats:
+            if stat == "count":
+                result[stat] = count
+            elif stat == "sum":
+                result[stat] = np.where(empty, np.nan, total)
+            elif stat == "avg":
+                result[stat] = np.where(empty, np.nan, mean)
+            elif stat == "min":
+                result[stat] = np.where(empty, np.nan, low)
+            elif stat == "max":
+                result[stat] = np.where(empty, np.nan, high)
+            elif stat == "std":
+                # Population standard deviation; clamp rounding noise below zero
+                result[stat] = np.where(empty, np.nan, np.sqrt(np.maximum(sumsq / count - mean * mean, 0.0)))
+    return result
+
+def _percentile(y, bucket_ids, starts, count, q):
+    """Linear-interpolated percentile per bucket, matching np.percentile's default"""
+    # Sorting by (bucket, value) leaves each bucket's values ascending with NaNs last
+    order = np.lexsort((y, bucket_ids))
+    ordered = y[order]
+    rank = q * np.maximum(count - 1, 0)
+    lower = np.floor(rank).astype(np.int64)
+    upper = np.ceil(rank).astype(np.int64)
+    low = ordered[starts + lower]
+    high = ordered[starts + upper]
+    return np.where(count == 0, np.nan, low + (high - low) * (rank - lower))
+
+def epoch_to_string(seconds):
+    return (EPOCH + timedelta(seconds=int(seconds))).strftime("%Y-%m-%d %H:%M:%S")
+
+def to_json_list(values):
+    """Floats rounded for transport, NaN as null"""
+    return [None if np.isnan(v) else round(float(v), 4) for v in values]
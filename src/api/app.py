@@ -1,34 +1,652 @@
-from flask import Flask, jsonify, request, render_template, redirect, url_for, session, flash
+from flask import Flask, jsonify, request, render_template, redirect, url_for, session, flash, Response, stream_with_context
 from flask_cors import CORS
 import mysql.connector
 from config import Config
 from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime
+from datetime import datetime, timedelta
 import random
 import time
 import threading
+import queue
+import json
+import atexit
+import csv
+import io
+import os
+import re
+from collections import deque
+import numpy as np
+import pandas as pd
+from downsampling import downsample, DOWNSAMPLERS
+import aggregation
+from timestamp_indexes import has_timestamp_index
+
+class PooledConnection:
+    """Wraps a pooled connection so that close() hands it back to the pool"""
+    def __init__(self, pool, connection):
+        self._pool = pool
+        self._connection = connection
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def close(self):
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            self._pool.release(connection)
+
+    def discard(self):
+        """Close the connection instead of returning it, e.g. with a result still unread"""
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            self._pool.discard(connection)
+
+    def __del__(self):
+        # Safety net for code paths that never close their connection
+        try:
+            self.close()
+        except Exception:
+            pass
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of database connections"""
+    def __init__(self, connect, size=10, timeout=5, recycle=300, ping=True):
+        self.connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.recycle = recycle
+        self.ping = ping
+        self._idle = deque()  # (connection, released_at) pairs, most recent last
+        self._in_use = 0
+        self._lock = threading.Condition(threading.RLock())
+
+    def acquire(self):
+        """Check out a connection, waiting up to `timeout` seconds for a free slot."""
+        deadline = time.monotonic() + self.timeout
+        with self._lock:
+            while not self._idle and self._in_use >= self.size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"No database connection available after {self.timeout}s")
+                self._lock.wait(remaining)
+            idle = self._idle.pop() if self._idle else None
+            self._in_use += 1
+
+        try:
+            connection = self._revive(*idle) if idle else None
+            if connection is None:
+                connection = self.connect()
+        except Exception:
+            with self._lock:
+                self._in_use -= 1
+                self._lock.notify()
+            raise
+        return PooledConnection(self, connection)
+
+    def release(self, connection):
+        """Return a connection to the pool, dropping it if it cannot be reset."""
+        try:
+            # End the open transaction so the next user doesn't read a stale snapshot
+            connection.rollback()
+        except Exception:
+            self._discard(connection)
+            connection = None
+
+        with self._lock:
+            self._in_use -= 1
+            if connection is not None:
+                self._idle.append((connection, time.monotonic()))
+            self._lock.notify()
+
+    def discard(self, connection):
+        """Close a checked out connection rather than returning it to the pool."""
+        self._discard(connection)
+        with self._lock:
+            self._in_use -= 1
+            self._lock.notify()
+
+    def close_all(self):
+        """Close every idle connection (checked out connections close on release)."""
+        with self._lock:
+            idle, self._idle = self._idle, deque()
+        for connection, _ in idle:
+            self._discard(connection)
+
+    def _revive(self, connection, released_at):
+        """Return the idle connection if it is still usable, otherwise None."""
+        if self.recycle and time.monotonic() - released_at > self.recycle:
+            self._discard(connection)
+            return None
+        if self.ping:
+            try:
+                connection.ping(reconnect=False)
+            except Exception:
+                self._discard(connection)
+                return None
+        return connection
+
+    def _discard(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
 
 class DatabaseManager:
     def __init__(self):
         self.config = Config
+        self.pool = ConnectionPool(
+            self._connect,
+            size=self.config.DB_POOL_SIZE,
+            timeout=self.config.DB_POOL_TIMEOUT,
+            recycle=self.config.DB_POOL_RECYCLE,
+            ping=self.config.DB_POOL_PING
+        )
+
+    def _connect(self):
+        return mysql.connector.connect(
+            host=self.config.DB_HOST,
+            user=self.config.DB_USER,
+            password=self.config.DB_PASSWORD,
+            database=self.config.DB_NAME
+        )
     
     def get_connection(self):
         try:
-            return mysql.connector.connect(
-                host=self.config.DB_HOST,
-                user=self.config.DB_USER,
-                password=self.config.DB_PASSWORD,
-                database=self.config.DB_NAME
-            )
+            return self.pool.acquire()
         except Exception as e:
             print(f"Database connection error: {e}")
             return None
 
-class LogService:
+    def close(self):
+        self.pool.close_all()
+
+class ReadingPublisher:
+    """Fans each committed reading out to every open live-data stream"""
+    def __init__(self, max_pending=100):
+        self.max_pending = max_pending
+        self._subscribers = {}  # line -> set of subscriber queues
+        self._lock = threading.Lock()
+
+    def subscribe(self, line):
+        subscriber = queue.Queue(maxsize=self.max_pending)
+        with self._lock:
+            self._subscribers.setdefault(line, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, line, subscriber):
+        with self._lock:
+            self._subscribers.get(line, set()).discard(subscriber)
+
+    def subscriber_count(self, line):
+        with self._lock:
+            return len(self._subscribers.get(line, ()))
+
+    def publish(self, line, reading):
+        with self._lock:
+            subscribers = list(self._subscribers.get(line, ()))
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(reading)
+            except queue.Full:
+                # A slow client loses its oldest reading rather than blocking ingest
+                try:
+                    subscriber.get_nowait()
+                    subscriber.put_nowait(reading)
+                except (queue.Empty, queue.Full):
+                    pass
+
+class LatestReadingCache:
+    """Latest reading per line, kept current by the ingest path
+
+    Entries expire `ttl` seconds after they were stored, so readings written by
+    another process (a second worker, backfill.py, an external feeder) are picked
+    up from the table instead of the cache staying at the first value read.
+    """
+    def __init__(self, ttl=30):
+        self.ttl = ttl
+        self._readings = {}  # line -> (reading, stored at)
+        self._lock = threading.Lock()
+
+    def _current(self, line):
+        entry = self._readings.get(line)
+        if entry and time.monotonic() - entry[1] < self.ttl:
+            return entry[0]
+        return None
+
+    def update(self, line, reading):
+        with self._lock:
+            current = self._current(line)
+            # Never let an older reading replace a newer one
+            if current is None or str(reading['timestamp']) >= str(current['timestamp']):
+                self._readings[line] = (dict(reading), time.monotonic())
+
+    def get(self, line):
+        with self._lock:
+            reading = self._current(line)
+            return dict(reading) if reading else None
+
+    def get_sensor(self, line, sensor):
+        with self._lock:
+            reading = self._current(line)
+            if not reading or sensor not in reading:
+                return None
+            return {"timestamp": reading['timestamp'], sensor: reading[sensor]}
+
+    def invalidate(self, line=None):
+        with self._lock:
+            if line is None:
+                self._readings.clear()
+            else:
+                self._readings.pop(line, None)
+
+class SchemaCache:
+    """Column names per table, so the hot read and write paths skip SHOW COLUMNS
+
+    AdminService invalidates a table when it alters it; entries also expire after
+    `ttl` seconds to pick up schema changes made outside the app.
+    """
+    def __init__(self, db_manager, ttl=300):
+        self.db_manager = db_manager
+        self.ttl = ttl
+        self._columns = {}  # table -> (columns, loaded at)
+        self._lock = threading.Lock()
+
+    def columns(self, table, cursor=None):
+        """Column names of a table, loading them on a miss with the given cursor or a pooled one"""
+        with self._lock:
+            entry = self._columns.get(table)
+        if entry and time.monotonic() - entry[1] < self.ttl:
+            return list(entry[0])
+
+        if cursor is not None:
+            columns = self._load(cursor, table)
+        else:
+            connection = self.db_manager.get_connection()
+            if not connection:
+                return None
+            try:
+                own_cursor = connection.cursor()
+                columns = self._load(own_cursor, table)
+            finally:
+                if 'own_cursor' in locals(): own_cursor.close()
+                connection.close()
+        with self._lock:
+            self._columns[table] = (columns, time.monotonic())
+        return list(columns)
+
+    @staticmethod
+    def _load(cursor, table):
+        cursor.execute(f"SHOW COLUMNS FROM {table}")
+        return [column[0] for column in cursor.fetchall()]
+
+    def invalidate(self, table=None):
+        with self._lock:
+            if table is None:
+                self._columns.clear()
+            else:
+                self._columns.pop(table, None)
+
+class RecordCounter:
+    """Row counts per line in hour and day buckets, kept current by the ingest path
+
+    Buckets are seeded from the table with one grouped scan the first time a line
+    is counted, then incremented as readings are inserted, so historical queries
+    no longer need a COUNT(*) over the requested range.
+    """
+    HOUR = timedelta(hours=1)
+    DAY = timedelta(days=1)
+
+    def __init__(self, db_manager, exact_threshold=10000):
+        self.db_manager = db_manager
+        self.exact_threshold = exact_threshold  # estimates below this are re-counted exactly
+        self._hours = {}  # line -> {hour start: rows}
+        self._days = {}  # line -> {day start: rows}
+        self._totals = {}
+        self._pending = {}  # line -> increments recorded while its buckets load
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def parse(value):
+        if isinstance(value, datetime):
+            return value
+        try:
+            return datetime.fromisoformat(str(value).strip())
+        except ValueError:
+            return None
+
+    def load(self, line):
+        """Seed the buckets for a line from the table
+
+        Rows committed while the scan runs may be missing from it, so increments
+        recorded from here on are buffered and merged into the result. Ingest
+        records after committing, so a batch committed just before the scan can
+        be counted twice; the over-count is at most that one batch.
+        """
+        with self._lock:
+            pending = self._pending.setdefault(line, [])
+        try:
+            connection = self.db_manager.get_connection()
+            if not connection:
+                return False
+            cursor = connection.cursor()
+            cursor.execute(f"""
+                SELECT DATE_FORMAT(timestamp, '%Y-%m-%d %H:00:00') AS hour, COUNT(*)
+                FROM {line}
+                GROUP BY hour
+            """)
+            hours, days = {}, {}
+            for hour, rows in cursor.fetchall():
+                if hour is None:
+                    continue
+                hour = datetime.strptime(hour, "%Y-%m-%d %H:%M:%S")
+                hours[hour] = rows
+                day = hour.replace(hour=0)
+                days[day] = days.get(day, 0) + rows
+            with self._lock:
+                # A concurrent load may have registered the line already
+                if line not in self._hours:
+                    for hour, rows in pending:
+                        hours[hour] = hours.get(hour, 0) + rows
+                        day = hour.replace(hour=0)
+                        days[day] = days.get(day, 0) + rows
+                    self._hours[line] = hours
+                    self._days[line] = days
+                    self._totals[line] = sum(hours.values())
+            return True
+        finally:
+            with self._lock:
+                if self._pending.get(line) is pending:
+                    del self._pending[line]
+            if 'cursor' in locals(): cursor.close()
+            if 'connection' in locals() and connection: connection.close()
+
+    def record(self, line, timestamp, rows=1):
+        """Count inserted rows; lines that have not been seeded yet pick them up on load"""
+        timestamp = self.parse(timestamp)
+        if timestamp is None:
+            return
+        hour = timestamp.replace(minute=0, second=0, microsecond=0)
+        day = hour.replace(hour=0)
+        with self._lock:
+            if line not in self._hours:
+                if line in self._pending:
+                    self._pending[line].append((hour, rows))
+                return
+            self._hours[line][hour] = self._hours[line].get(hour, 0) + rows
+            self._days[line][day] = self._days[line].get(day, 0) + rows
+            self._totals[line] += rows
+
+    def invalidate(self, line=None):
+        with self._lock:
+            for buckets in (self._hours, self._days, self._totals, self._pending):
+                if line is None:
+                    buckets.clear()
+                else:
+                    buckets.pop(line, None)
+
+    def _count_hours(self, hours, start, stop):
+        """Rows in [start, stop) from hour buckets, interpolating partly covered hours"""
+        rows, exact = 0.0, True
+        hour = start.replace(minute=0, second=0, microsecond=0)
+        while hour < stop:
+            count = hours.get(hour, 0)
+            if count:
+                covered = min(hour + self.HOUR, stop) - max(hour, start)
+                if covered < self.HOUR:
+                    exact = False
+                rows += count * (covered / self.HOUR)
+            hour += self.HOUR
+        return rows, exact
+
+    def _count_range(self, line, start, end):
+        # BETWEEN is inclusive and timestamps have whole-second precision
+        stop = end + timedelta(seconds=1)
+        if stop <= start:
+            return 0, True
+        first_day = start.replace(hour=0, minute=0, second=0, microsecond=0)
+        if first_day < start:
+            first_day += self.DAY
+        last_day = stop.replace(hour=0, minute=0, second=0, microsecond=0)
+        with self._lock:
+            hours, days = self._hours[line], self._days[line]
+            if first_day >= last_day:
+                return self._count_hours(hours, start, stop)
+            # Whole days from day buckets, the ragged ends from hour buckets
+            rows = sum(count for day, count in days.items() if first_day <= day < last_day)
+            head, head_exact = self._count_hours(hours, start, first_day)
+            tail, tail_exact = self._count_hours(hours, last_day, stop)
+        return rows + head + tail, head_exact and tail_exact
+
+    def count(self, line, start=None, end=None):
+        """(recordsTotal, recordsFiltered, exact) for a line and optional range
+
+        Returns None when the caller should run COUNT(*) instead: the buckets
+        could not be loaded, the range could not be parsed, or the estimate is
+        interpolated and small enough that an exact count is cheap.
+        """
+        with self._lock:
+            loaded = line in self._hours
+        if not loaded and not self.load(line):
+            return None
+        with self._lock:
+            total = self._totals[line]
+        if not (start and end):
+            return total, total, True
+
+        start, end = self.parse(start), self.parse(end)
+        if start is None or end is None:
+            return None
+        filtered, exact = self._count_range(line, start, end)
+        if not exact and filtered < self.exact_threshold:
+            return None
+        return total, int(round(filtered)), exact
+
+class RollupManager:
+    """Minute, hour and day rollups per line, maintained in the ingest transaction
+
+    Each {line}_rollup_{level} table holds one row per bucket and sensor with the
+    sample count, sum, min, max and sum of squares, which is enough to rebuild
+    count/sum/avg/min/max/std for any wider bucket without touching raw rows.
+    """
+    LEVELS = (("day", 86400), ("hour", 3600), ("minute", 60))  # coarsest first
+    BUCKET_FORMATS = {"minute": "%Y-%m-%d %H:%i:00", "hour": "%Y-%m-%d %H:00:00", "day": "%Y-%m-%d 00:00:00"}
+
     def __init__(self, db_manager):
         self.db_manager = db_manager
+        self._ready = set()
+        self._unavailable = set()  # lines served from raw rows until the process restarts
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def table(line, level):
+        return f"{line}_rollup_{level}"
+
+    def ready(self, line):
+        return line in self._ready
+
+    def ensure(self, line, writing=False):
+        """Whether a line's rollups exist and can be used; never builds them
+
+        Filling rollups scans every raw row, far too slow for ingest or a request,
+        so rollups.py builds them as a setup step. The first call per line checks
+        that the tables exist. A line without them stays on raw rows until the
+        process restarts, as does one that ingest (writing=True) had to write
+        without checking, since its rollups now miss those rows.
+        """
+        if line in self._ready:
+            return True
+        if line in self._unavailable:
+            return False
+        with self._lock:
+            if line in self._ready:
+                return True
+            if line in self._unavailable:
+                return False
+            try:
+                connection = self.db_manager.get_connection()
+                if not connection:
+                    if writing:
+                        self._unavailable.add(line)
+                        print(f"Rollups for {line} miss rows written without them; rebuild with rollups.py {line}")
+                    return False
+                cursor = connection.cursor()
+                cursor.execute("SHOW TABLES LIKE %s", (self.table(line, "minute"),))
+                if cursor.fetchone() is None:
+                    self._unavailable.add(line)
+                    print(f"No rollups for {line}; run rollups.py {line}")
+                    return False
+                self._ready.add(line)
+                return True
+            finally:
+                if 'cursor' in locals(): cursor.close()
+                if 'connection' in locals() and connection: connection.close()
+
+    def build(self, cursor, line):
+        """Create the rollup tables for a line and fill them from raw rows, replacing any contents"""
+        for level, _ in self.LEVELS:
+            cursor.execute(f"""
+                CREATE TABLE IF NOT EXISTS {self.table(line, level)} (
+                    bucket DATETIME NOT NULL,
+                    sensor VARCHAR(64) NOT NULL,
+                    samples INT NOT NULL,
+                    value_sum DOUBLE NOT NULL,
+                    value_min DOUBLE NOT NULL,
+                    value_max DOUBLE NOT NULL,
+                    value_sumsq DOUBLE NOT NULL,
+                    PRIMARY KEY (bucket, sensor)
+                )
+            """)
+            cursor.execute(f"DELETE FROM {self.table(line, level)}")
+        self.backfill(cursor, line)
+
+    def backfill(self, cursor, line, start=None, end=None):
+        """Fill minute rollups from raw rows, then each coarser level from the one below
+
+        With start and end (whole days) only [start, end) is filled; see refresh.
+        """
+        cursor.execute(f"SHOW COLUMNS FROM {line}")
+        sensors = [column[0] for column in cursor.fetchall() if column[0] not in ('timestamp', 'timezone')]
+        bounded = start is not None
+        for sensor in sensors:
+            cursor.execute(f"""
+                INSERT INTO {self.table(line, 'minute')}
+                SELECT DATE_FORMAT(timestamp, %s), '{sensor}',
+                       COUNT({sensor}), SUM({sensor}), MIN({sensor}), MAX({sensor}), SUM({sensor} * {sensor})
+                FROM {line}
+                WHERE {sensor} IS NOT NULL{" AND timestamp >= %s AND timestamp < %s" if bounded else ""}
+                GROUP BY 1
+            """, (self.BUCKET_FORMATS['minute'], start, end) if bounded else (self.BUCKET_FORMATS['minute'],))
+        for level, finer in (("hour", "minute"), ("day", "hour")):
+            cursor.execute(f"""
+                INSERT INTO {self.table(line, level)}
+                SELECT DATE_FORMAT(bucket, %s), sensor,
+                       SUM(samples), SUM(value_sum), MIN(value_min), MAX(value_max), SUM(value_sumsq)
+                FROM {self.table(line, finer)}{" WHERE bucket >= %s AND bucket < %s" if bounded else ""}
+                GROUP BY 1, sensor
+            """, (self.BUCKET_FORMATS[level], start, end) if bounded else (self.BUCKET_FORMATS[level],))
+
+    def refresh(self, cursor, line, start, end):
+        """Rebuild the rollups of every day touched by [start, end) from raw rows
+
+        For rows written outside the ingest path, such as a bulk backfill. Does
+        nothing if the line has no rollups yet, since build fills them in full.
+        """
+        cursor.execute("SHOW TABLES LIKE %s", (self.table(line, "minute"),))
+        if cursor.fetchone() is None:
+            return False
+        start = start.replace(hour=0, minute=0, second=0, microsecond=0)
+        day = end.replace(hour=0, minute=0, second=0, microsecond=0)
+        end = day if day == end else day + timedelta(days=1)
+        for level, _ in self.LEVELS:
+            cursor.execute(f"DELETE FROM {self.table(line, level)} WHERE bucket >= %s AND bucket < %s", (start, end))
+        self.backfill(cursor, line, start, end)
+        return True
+
+    def record(self, cursor, line, rows):
+        """Fold (timestamp, {sensor: value}) rows into every level, on the caller's transaction"""
+        rows = [(RecordCounter.parse(timestamp), readings) for timestamp, readings in rows]
+        for level, width in self.LEVELS:
+            buckets = {}
+            for timestamp, readings in rows:
+                epoch = int((timestamp - aggregation.EPOCH).total_seconds())
+                bucket = aggregation.EPOCH + timedelta(seconds=epoch - epoch % width)
+                for sensor, value in readings.items():
+                    if value is None:
+                        continue
+                    value = float(value)
+                    current = buckets.get((bucket, sensor))
+                    if current is None:
+                        buckets[(bucket, sensor)] = [1, value, value, value, value * value]
+                    else:
+                        current[0] += 1
+                        current[1] += value
+                        current[2] = min(current[2], value)
+                        current[3] = max(current[3], value)
+                        current[4] += value * value
+            if not buckets:
+                return
+            cursor.executemany(f"""
+                INSERT INTO {self.table(line, level)}
+                (bucket, sensor, samples, value_sum, value_min, value_max, value_sumsq)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE
+                    samples = samples + VALUES(samples),
+                    value_sum = value_sum + VALUES(value_sum),
+                    value_min = LEAST(value_min, VALUES(value_min)),
+                    value_max = GREATEST(value_max, VALUES(value_max)),
+                    value_sumsq = value_sumsq + VALUES(value_sumsq)
+            """, [(bucket, sensor, *totals) for (bucket, sensor), totals in buckets.items()])
+
+    def plan(self, bucket_seconds, stats, start=None, end=None):
+        """Coarsest rollup level that answers the query exactly, or None for raw rows"""
+        if any(stat not in aggregation.BASIC_STATS for stat in stats):
+            return None
+        for level, width in self.LEVELS:
+            aligned = all(
+                bound is None or (bound - aggregation.EPOCH).total_seconds() % width == 0
+                for bound in (start, end)
+            )
+            if bucket_seconds % width == 0 and aligned:
+                return level
+        return None
+
+class LogService:
+    """Writes events to the logs table
+
+    By default each event is inserted and committed on the caller's thread. With
+    batched=True, log_event only queues the event; a background writer flushes the
+    queue with multi-row inserts every `batch_size` events or `flush_interval`
+    seconds, and close() (registered with atexit) flushes what is left. When the
+    queue is full the overflow policy decides: 'block' waits for space, 'drop'
+    discards the event, and 'sample' starts keeping only a `sample_rate` share of
+    INFO events once the queue is 80% full so warnings and errors still get through.
+    """
+    OVERFLOW_POLICIES = ("block", "drop", "sample")
+    SAMPLE_ABOVE = 0.8
+
+    def __init__(self, db_manager, batched=False, max_pending=10000, batch_size=200, flush_interval=1.0,
+                 overflow='drop', sample_rate=0.1):
+        if overflow not in self.OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown log overflow policy '{overflow}'")
+        self.db_manager = db_manager
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.sample_rate = sample_rate
+        self.dropped = 0
+        self.written = 0
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._closed = threading.Event()
+        self._writer = None
+        if batched:
+            self._writer = threading.Thread(target=self._run, name="log-writer", daemon=True)
+            self._writer.start()
+            atexit.register(self.close)
     
     def log_event(self, message, type='INFO', log_level='admin'):
+        if self._writer is not None and not self._closed.is_set():
+            self._enqueue((datetime.now().replace(microsecond=0), log_level, type, message))
+            return
         try:
             connection = self.db_manager.get_connection()
             if connection:
@@ -43,6 +661,79 @@ class LogService:
         except Exception as e:
             print(f"Log error: {e}")
 
+    def _enqueue(self, entry):
+        if self.overflow == 'block':
+            self._queue.put(entry)
+            return
+        if (self.overflow == 'sample' and entry[2] == 'INFO'
+                and self._queue.qsize() >= self.SAMPLE_ABOVE * self._queue.maxsize
+                and random.random() >= self.sample_rate):
+            self.dropped += 1
+            return
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while not (self._closed.is_set() and self._queue.empty()):
+            try:
+                entry = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            if entry is None:  # close() waking the writer
+                continue
+            batch = [entry]
+            # Keep collecting until the batch is full or the interval since its first event is up
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._closed.is_set():
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                    continue
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._flush([entry for entry in batch if entry is not None])
+
+    def _flush(self, batch):
+        try:
+            connection = self.db_manager.get_connection()
+            if not connection:
+                print(f"Log error: database connection failed, {len(batch)} events lost")
+                return
+            cursor = connection.cursor()
+            # mysql-connector turns executemany on an INSERT into a single multi-row insert
+            cursor.executemany("""
+                INSERT INTO logs (timestamp, level, type, message)
+                VALUES (%s, %s, %s, %s)
+            """, batch)
+            connection.commit()
+            self.written += len(batch)
+        except Exception as e:
+            print(f"Log error: {e}, {len(batch)} events lost")
+        finally:
+            if 'cursor' in locals(): cursor.close()
+            if 'connection' in locals() and connection: connection.close()
+
+    def close(self, timeout=5):
+        """Stop accepting events and flush everything still queued"""
+        if self._writer is None or self._closed.is_set():
+            return
+        self._closed.set()
+        try:
+            # Wake the writer rather than waiting out its flush interval
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass
+        self._writer.join(timeout)
+        # Apps built and closed repeatedly, as in tests, must not pile up exit hooks
+        atexit.unregister(self.close)
+
 class AuthService:
     def __init__(self, db_manager, log_service):
         self.db_manager = db_manager
@@ -60,6 +751,8 @@ class AuthService:
         cursor = conn.cursor(dictionary=True)
         cursor.execute("SELECT * FROM user_accounts WHERE email = %s", (email,))
         if cursor.fetchone(): 
+            cursor.close()
+            conn.close()
             return {"success": False, "error": "User already exists", "code": 400}
         
         hashed_pw = generate_password_hash(new_password)
@@ -106,7 +799,7 @@ class AuthService:
             return {'success': False, 'error': str(e), 'code': 500}
         finally:
             if 'cursor' in locals(): cursor.close()
-            if 'connection' in locals(): connection.close()
+            if 'connection' in locals() and connection: connection.close()
 
     def login(self, data):
         email = data.get('email')
@@ -178,7 +871,7 @@ class AuthService:
             return {"success": False, "error": str(e), "code": 500}
         finally:
             if 'cursor' in locals(): cursor.close()
-            if 'connection' in locals(): connection.close()
+            if 'connection' in locals() and connection: connection.close()
 
     def update_dark_mode(self, data):
         operator_id = data.get('operator_id')
@@ -205,12 +898,14 @@ class AuthService:
             return {"success": False, "error": str(e), "code": 500}
         finally:
             if 'cursor' in locals(): cursor.close()
-            if 'connection' in locals(): connection.close()
+            if 'connection' in locals() and connection: connection.close()
 
 class AdminService:
-    def __init__(self, db_manager, log_service):
+    def __init__(self, db_manager, log_service, schema_cache=None, reading_cache=None):
         self.db_manager = db_manager
         self.log_service = log_service
+        self.schema_cache = schema_cache or SchemaCache(db_manager)
+        self.reading_cache = reading_cache
     
     def validate_admin_request(self, data):
         if not data:
@@ -249,7 +944,7 @@ class AdminService:
             return {"success": False, "error": str(e), "code": 500}
         finally:
             if 'cursor' in locals(): cursor.close()
-            if 'connection' in locals(): connection.close()
+            if 'connection' in locals() and connection: connection.close()
 
     def toggle_admin_status(self, data):
         try:
@@ -291,6 +986,9 @@ class AdminService:
         except Exception as e:
             self.log_service.log_event(f"Error in toggle_admin_status: {str(e)}", type='ERROR', log_level='admin')
             return {"success": False, "error": str(e), "code": 400}
+        finally:
+            if 'cursor' in locals(): cursor.close()
+            if 'connection' in locals() and connection: connection.close()
 
     def toggle_user_status(self, data):
         try:
@@ -331,6 +1029,9 @@ class AdminService:
         except Exception as e:
             self.log_service.log_event(f"Error in toggle_user_status: {str(e)}", type='ERROR', log_level='admin')
             return {"success": False, "error": str(e), "code": 500}
+        finally:
+            if 'cursor' in locals(): cursor.close()
+            if 'connection' in locals() and connection: connection.close()
 
     def delete_user(self, data):
         try:
@@ -368,6 +1069,9 @@ class AdminService:
         except Exception as e:
             self.log_service.log_event(f"Error in delete_user: {str(e)}", type='ERROR', log_level='admin')
             return {"success": False, "error": str(e), "code": 500}
+        finally:
+            if 'cursor' in locals(): cursor.close()
+            if 'connection' in locals() and connection: connection.close()
 
     def delete_sensor(self, data):
         try:
@@ -392,6 +1096,11 @@ class AdminService:
 
             cursor.execute(f"ALTER TABLE {table_id} DROP COLUMN {sensor}")
             connection.commit()
+
+            # Drop cached metadata and the cached live reading that still carry the sensor
+            self.schema_cache.invalidate(table_id)
+            if self.reading_cache:
+                self.reading_cache.invalidate(table_id)
             
             self.log_service.log_event(
                 f"Sensor {sensor} deleted from table {table_id}", 
@@ -403,6 +1112,9 @@ class AdminService:
         except Exception as e:
             self.log_service.log_event(f"Error in delete_sensor: {str(e)}", type='ERROR', log_level='admin')
             return {"success": False, "error": str(e), "code": 400}
+        finally:
+            if 'cursor' in locals(): cursor.close()
+            if 'connection' in locals() and connection: connection.close()
 
     def update_user_details(self, data):
         try:
@@ -454,47 +1166,34 @@ class AdminService:
             return {"success": False, "error": str(e), "code": 500}
         finally:
             if 'cursor' in locals(): cursor.close()
-            if 'connection' in locals(): connection.close()
+            if 'connection' in locals() and connection: connection.close()
 
     def get_table_headers(self, table_id):
         try:
-            connection = self.db_manager.get_connection()
-            if not connection:
+            headers = self.schema_cache.columns(table_id)
+            if headers is None:
                 return {"success": False, "error": "Database connection failed", "code": 500}
-
-            cursor = connection.cursor()
-            cursor.execute(f"SHOW COLUMNS FROM {table_id}")
-            columns = cursor.fetchall()
-            headers = [column[0] for column in columns]
             return {"success": True, "headers": headers}
         except Exception as e:
             return {"success": False, "error": str(e), "code": 400}
-        finally:
-            if 'cursor' in locals(): cursor.close()
-            if 'connection' in locals(): connection.close()
 
 class DataService:
-    def __init__(self, db_manager, log_service):
+    def __init__(self, db_manager, log_service, reading_cache=None, record_counter=None, rollups=None, schema_cache=None):
         self.db_manager = db_manager
         self.log_service = log_service
+        self.reading_cache = reading_cache
+        self.record_counter = record_counter
+        self.rollups = rollups
+        self.schema_cache = schema_cache or SchemaCache(db_manager)
+        self.index_checked = set()  # lines whose timestamp index has been checked
         
     def get_table_columns(self, line):
         """Get all columns for a given line table"""
         try:
-            connection = self.db_manager.get_connection()
-            if not connection:
-                return None
-                
-            cursor = connection.cursor()
-            cursor.execute(f"SHOW COLUMNS FROM {line}")
-            columns = [column[0] for column in cursor.fetchall()]
-            return columns
+            return self.schema_cache.columns(line)
         except Exception as e:
             self.log_service.log_event(f"Error getting columns for {line}: {str(e)}", type='ERROR')
             return None
-        finally:
-            if 'cursor' in locals(): cursor.close()
-            if 'connection' in locals(): connection.close()
 
     def get_historical_data(self, line, data):
         try:
@@ -503,6 +1202,19 @@ class DataService:
             start = int(data.get("start", 0))
             start_date_time = data.get("startDateTime", "")
             end_date_time = data.get("endDateTime", "")
+            # Keyset pagination: the cursor to seek from and which way to page
+            page_cursor = data.get("cursor")
+            direction = data.get("direction", "next")
+            if page_cursor:
+                try:
+                    cursor_time, cursor_skip = self.parse_page_cursor(page_cursor)
+                except ValueError:
+                    return {"success": False, "error": f"Invalid cursor '{page_cursor}'", "code": 400}
+            # Optional downsampling of the unlimited (length=-1) result for charts
+            points = int(data.get("points", 0))
+            method = data.get("downsample", "lttb")
+            if method not in DOWNSAMPLERS:
+                return {"success": False, "error": f"Unknown downsample method '{method}'", "code": 400}
 
             # First get the actual columns in the table
             columns = self.get_table_columns(line)
@@ -534,18 +1246,24 @@ class DataService:
                 count_query += " AND timestamp BETWEEN %s AND %s"
                 params.extend([start_date_time, end_date_time])
 
-            # Add ordering
-            query += " ORDER BY timestamp DESC"
-            
-             # Handle pagination differently for unlimited entries
+            # Handle pagination differently for unlimited entries
             if length == -1:
                 # For unlimited entries, remove LIMIT clause
+                query += " ORDER BY timestamp DESC"
                 pagination_params = params
+            elif page_cursor and direction == "prev":
+                # Seek to the page of newer rows from the cursor, skipping the rows at
+                # its timestamp that were already shown
+                query += " AND timestamp >= %s ORDER BY timestamp ASC LIMIT %s OFFSET %s"
+                pagination_params = params + [cursor_time, length, cursor_skip]
+            elif page_cursor:
+                # Seek to the page of older rows from the cursor, likewise
+                query += " AND timestamp <= %s ORDER BY timestamp DESC LIMIT %s OFFSET %s"
+                pagination_params = params + [cursor_time, length, cursor_skip]
             else:
-                # Normal pagination
-                query += " LIMIT %s OFFSET %s"
-                pagination_params = params.copy()
-                pagination_params.extend([length, start])
+                # OFFSET pagination, kept for jumps to arbitrary pages
+                query += " ORDER BY timestamp DESC LIMIT %s OFFSET %s"
+                pagination_params = params + [length, start]
                 
             connection = self.db_manager.get_connection()
             if not connection:
@@ -553,14 +1271,38 @@ class DataService:
 
             cursor = connection.cursor(dictionary=True)
             
-            # Get total records
-            cursor.execute(count_query, params if params else None)
-            total_records = cursor.fetchone()['total']
+            # Get total records, from the ingest-maintained buckets when they can answer
+            counts = None
+            if self.record_counter:
+                counts = self.record_counter.count(
+                    line, start_date_time if params else None, end_date_time if params else None
+                )
+            if counts:
+                total_records, filtered_records, exact = counts
+            else:
+                cursor.execute(count_query, params if params else None)
+                total_records = filtered_records = cursor.fetchone()['total']
+                exact = True
 
             # Get paginated data
             cursor.execute(query, pagination_params)
             results = cursor.fetchall()
 
+            # Previous pages are read oldest first, so flip them back to newest first
+            if page_cursor and direction == "prev" and length != -1:
+                results.reverse()
+
+            if length == -1 and points > 0 and len(results) > points:
+                results = self.downsample_rows(results, sensor_columns, points, method)
+
+            prev_cursor = next_cursor = None
+            if results and length != -1:
+                if page_cursor:
+                    fetched_by = (direction, cursor_time, cursor_skip)
+                else:
+                    fetched_by = ("offset", start, count_query, params)
+                prev_cursor, next_cursor = self.page_cursors(cursor, results, fetched_by, line)
+
             # Format timestamps
             for record in results:
                 record["timestamp"] = record["timestamp"].strftime("%Y-%m-%d %H:%M:%S")
@@ -569,8 +1311,12 @@ class DataService:
                 "success": True,
                 "data": results,
                 "recordsTotal": total_records,
-                "recordsFiltered": total_records,
-                "sensors": sensor_columns  # Return available sensors for frontend
+                "recordsFiltered": filtered_records,
+                "recordsApproximate": not exact,
+                "sensors": sensor_columns,  # Return available sensors for frontend
+                # Cursors for the neighbouring pages
+                "prevCursor": prev_cursor,
+                "nextCursor": next_cursor
             }
 
         except Exception as e:
@@ -580,8 +1326,49 @@ class DataService:
             return {"success": False, "error": str(e)}
         finally:
             if 'cursor' in locals(): cursor.close()
-            if 'connection' in locals(): connection.close()
-
+            if 'connection' in locals() and connection: connection.close()
+
+
+    @staticmethod
+    def parse_page_cursor(page_cursor):
+        """(timestamp, rows already shown at that timestamp) from a 'YYYY-MM-DD HH:MM:SS|n' cursor"""
+        timestamp, _, skip = str(page_cursor).partition("|")
+        skip = int(skip)
+        if skip < 0:
+            raise ValueError(f"Negative cursor offset {skip}")
+        return datetime.fromisoformat(timestamp.strip()), skip
+
+    def page_cursors(self, cursor, results, fetched_by, line):
+        """prev/next cursors for a page of rows, newest first
+
+        Timestamps can repeat, so a cursor is the boundary timestamp plus how many
+        rows at that timestamp sit on the near side of it: seeking from there with
+        <= / >= and skipping them neither repeats nor drops rows. Rows that share a
+        timestamp come back in index order, the same assumption OFFSET paging makes.
+        """
+        first, last = results[0]["timestamp"], results[-1]["timestamp"]
+        if first != last:
+            # The page holds the older end of the first timestamp's rows and the
+            # newer end of the last one's
+            prev_skip = sum(1 for record in results if record["timestamp"] == first)
+            next_skip = sum(1 for record in results if record["timestamp"] == last)
+        else:
+            # The whole page shares one timestamp, so place it within that group
+            cursor.execute(f"SELECT COUNT(*) as total FROM {line} WHERE timestamp = %s", [first])
+            group = cursor.fetchone()['total']
+            if fetched_by[0] == "offset":
+                _, start, count_query, params = fetched_by
+                cursor.execute(count_query + " AND timestamp > %s", params + [first])
+                index = start - cursor.fetchone()['total']
+            else:
+                direction, cursor_time, cursor_skip = fetched_by
+                already = cursor_skip if first == cursor_time else 0
+                index = group - len(results) - already if direction == "prev" else already
+            prev_skip, next_skip = group - index, index + len(results)
+        return (
+            f"{first.strftime('%Y-%m-%d %H:%M:%S')}|{prev_skip}",
+            f"{last.strftime('%Y-%m-%d %H:%M:%S')}|{next_skip}"
+        )
 
     def get_logs(self):
         try:
@@ -603,9 +1390,14 @@ class DataService:
             return {"success": False, "error": str(e), "code": 500}
         finally:
             if 'cursor' in locals(): cursor.close()
-            if 'connection' in locals(): connection.close()
+            if 'connection' in locals() and connection: connection.close()
 
     def get_live_data(self, line):
+        if self.reading_cache:
+            cached = self.reading_cache.get(line)
+            if cached:
+                return {"success": True, "data": cached}
+
         try:
             connection = self.db_manager.get_connection()
             if not connection:
@@ -619,11 +1411,14 @@ class DataService:
                 return {"success": False, "error": "No live data available", "code": 404}
             
             data["timestamp"] = data["timestamp"].strftime("%Y-%m-%d %H:%M:%S")
+            # Cold start: seed the cache until the simulator's next insert
+            if self.reading_cache:
+                self.reading_cache.update(line, data)
             return {"success": True, "data": data}
         except Exception as e:
             return {"success": False, "error": str(e), "code": 500}
         finally:
-            if 'connection' in locals(): connection.close()
+            if 'connection' in locals() and connection: connection.close()
 
     def get_forecasted_data(self, line):
         try:
@@ -655,32 +1450,118 @@ class DataService:
             return {"success": False, "error": str(e), "code": 500}
         finally:
             if 'cursor' in locals(): cursor.close()
-            if 'connection' in locals(): connection.close()
+            if 'connection' in locals() and connection: connection.close()
+
+    def downsample_rows(self, rows, columns, points, method):
+        """Reduce newest-first rows to about `points` per column, keeping their order"""
+        ascending = rows[::-1]
+        keep = downsample(
+            [row['timestamp'] for row in ascending],
+            [[row[column] for row in ascending] for column in columns],
+            points, method
+        )
+        return [ascending[i] for i in keep[::-1]]
+
+    @staticmethod
+    def prefix_range(text):
+        """Half-open [start, end) covered by a date prefix such as 2025, 2025-04-07 or 2025-04-07 14:30"""
+        text = text.strip().replace("T", " ")
+        for fmt in ("%Y", "%Y-%m", "%Y-%m-%d", "%Y-%m-%d %H", "%Y-%m-%d %H:%M", "%Y-%m-%d %H:%M:%S"):
+            try:
+                start = datetime.strptime(text, fmt)
+            except ValueError:
+                continue
+            if fmt == "%Y":
+                end = start.replace(year=start.year + 1)
+            elif fmt == "%Y-%m":
+                end = (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+            else:
+                end = start + {
+                    "%Y-%m-%d": timedelta(days=1), "%Y-%m-%d %H": timedelta(hours=1),
+                    "%Y-%m-%d %H:%M": timedelta(minutes=1), "%Y-%m-%d %H:%M:%S": timedelta(seconds=1)
+                }[fmt]
+            return start, end
+        raise ValueError(f"'{text}' is not a date prefix such as 2025-04-07 or 2025-04-07 14:30")
+
+    def check_timestamp_index(self, line):
+        """Warn once per line if timestamp leads no index; never fails the read
+
+        The index is created by timestamp_indexes.py, since building it on a large
+        table is far too slow for a request.
+        """
+        if line in self.index_checked:
+            return
+        try:
+            connection = self.db_manager.get_connection()
+            if not connection:
+                return
+            cursor = connection.cursor(dictionary=True)
+            if not has_timestamp_index(cursor, line):
+                warning_msg = f"No timestamp index on {line}; run timestamp_indexes.py {line}"
+                self.log_service.log_event(warning_msg, type='WARNING')
+                print(warning_msg)
+            self.index_checked.add(line)
+        except Exception as e:
+            print(f"Could not check the timestamp index on {line}: {e}")
+        finally:
+            if 'cursor' in locals(): cursor.close()
+            if 'connection' in locals() and connection: connection.close()
 
     def get_historical_data_sensor(self, line, sensor, args):
         try:
             length = args.get('length', default=50, type=int)
+            points = args.get('points', default=0, type=int)
+            method = args.get('downsample', default='lttb', type=str)
+            if method not in DOWNSAMPLERS:
+                return {"success": False, "error": f"Unknown downsample method '{method}'", "code": 400}
             search_value = args.get('searchValue', default='', type=str)
             date_filter = args.get('dateFilter', default='', type=str)
             start_date_time = args.get('startDateTime', default='', type=str)
             end_date_time = args.get('endDateTime', default='', type=str)
 
+            # Every filter becomes a half-open timestamp range, so the index can seek straight to it
+            try:
+                ranges = [self.prefix_range(value) for value in (date_filter, search_value) if value]
+                if start_date_time and end_date_time:
+                    # BETWEEN semantics: the end second itself is included
+                    ranges.append((
+                        datetime.fromisoformat(start_date_time),
+                        datetime.fromisoformat(end_date_time) + timedelta(seconds=1)
+                    ))
+            except ValueError as e:
+                return {"success": False, "error": str(e), "code": 400}
+
+            columns = self.get_table_columns(line)
+            if not columns:
+                return {"success": False, "error": f"Could not retrieve columns for table {line}", "code": 404}
+            if sensor not in columns or sensor in ('timestamp', 'timezone'):
+                return {"success": False, "error": f"Unknown sensor {sensor} for {line}", "code": 404}
+
             query = f"SELECT timestamp, {sensor} as value FROM {line} WHERE 1=1"
-            if date_filter:
-                query += f" AND DATE(timestamp) = '{date_filter}'"
-            if start_date_time and end_date_time:
-                query += f" AND timestamp BETWEEN '{start_date_time}' AND '{end_date_time}'"
-            if search_value:
-                query += f" AND (timestamp LIKE '%{search_value}%')"
-            query += f" ORDER BY timestamp DESC LIMIT {length}"
+            params = []
+            if ranges:
+                lower = max(start for start, _ in ranges)
+                upper = min(end for _, end in ranges)
+                if lower >= upper:
+                    return {"success": True, "data": []}
+                query += " AND timestamp >= %s AND timestamp < %s"
+                params.extend([lower, upper])
+            query += " ORDER BY timestamp DESC"
+            if length != -1:
+                query += " LIMIT %s"
+                params.append(length)
+
+            self.check_timestamp_index(line)
 
             connection = self.db_manager.get_connection()
             if not connection:
                 return {"success": False, "error": "Database connection failed", "code": 500}
 
             cursor = connection.cursor(dictionary=True)
-            cursor.execute(query)
+            cursor.execute(query, params)
             data = cursor.fetchall()
+            if points > 0 and len(data) > points:
+                data = self.downsample_rows(data, ['value'], points, method)
             formatted = [
                 {
                     'timestamp': record['timestamp'].strftime("%Y-%m-%d %H:%M:%S"),
@@ -691,9 +1572,194 @@ class DataService:
         except Exception as e:
             return {"success": False, "error": str(e), "code": 500}
         finally:
-            if 'connection' in locals(): connection.close()
+            if 'connection' in locals() and connection: connection.close()
+
+    def export_data(self, line, args):
+        """Validate an export request and return a generator that streams it
+
+        Rows come from a single query on an unbuffered cursor, read in chunks of
+        Config.EXPORT_CHUNK_SIZE, so memory stays constant however long the range
+        is and rows that share a timestamp are never split across chunks.
+        """
+        export_format = args.get('format', default='csv', type=str).lower()
+        if export_format not in ('csv', 'ndjson'):
+            return {"success": False, "error": f"Unknown export format '{export_format}'", "code": 400}
+        try:
+            start_date_time = args.get('start', default='', type=str)
+            end_date_time = args.get('end', default='', type=str)
+            start = datetime.fromisoformat(start_date_time) if start_date_time else None
+            end = datetime.fromisoformat(end_date_time) if end_date_time else None
+        except ValueError as e:
+            return {"success": False, "error": str(e), "code": 400}
+
+        columns = self.get_table_columns(line)
+        if not columns:
+            return {"success": False, "error": f"Could not retrieve columns for table {line}", "code": 404}
+        sensor_columns = [col for col in columns if col not in ['timestamp', 'timezone']]
+        requested = args.get('sensors', default='', type=str)
+        sensors = [sensor.strip() for sensor in requested.split(',') if sensor.strip()] or sensor_columns
+        unknown = [sensor for sensor in sensors if sensor not in sensor_columns]
+        if unknown:
+            return {"success": False, "error": f"Unknown sensors for {line}: {', '.join(unknown)}", "code": 400}
+
+        return {
+            "success": True,
+            "stream": self.export_rows(line, ["timestamp", "timezone"] + sensors, start, end, export_format),
+            "mimetype": "text/csv" if export_format == "csv" else "application/x-ndjson",
+            "filename": f"{line}.{export_format}"
+        }
+
+    def export_rows(self, line, columns, start, end, export_format, chunk_size=None):
+        """Yield the export body chunk by chunk, oldest rows first"""
+        chunk_size = chunk_size or Config.EXPORT_CHUNK_SIZE
+        query, params = f"SELECT {', '.join(columns)} FROM {line} WHERE 1=1", []
+        if start:
+            query += " AND timestamp >= %s"
+            params.append(start)
+        if end:
+            query += " AND timestamp < %s"
+            params.append(end)
+
+        if export_format == "csv":
+            yield ",".join(columns) + "\n"
+        connection = None
+        cursor = None
+        finished = False
+        try:
+            connection = self.db_manager.get_connection()
+            if not connection:
+                raise Exception("Database connection failed")
+            # One query on an unbuffered cursor: the server streams rows as we read them
+            cursor = connection.cursor(buffered=False)
+            cursor.execute(query + " ORDER BY timestamp ASC", params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    finished = True
+                    break
+                buffer = io.StringIO()
+                if export_format == "csv":
+                    writer = csv.writer(buffer, lineterminator="\n")
+                    writer.writerows(
+                        (row[0].strftime("%Y-%m-%d %H:%M:%S"), *row[1:]) for row in rows
+                    )
+                else:
+                    for row in rows:
+                        record = dict(zip(columns, row))
+                        record["timestamp"] = row[0].strftime("%Y-%m-%d %H:%M:%S")
+                        buffer.write(json.dumps(record, default=float) + "\n")
+                yield buffer.getvalue()
+        except Exception as e:
+            # Headers are already sent, so all we can do is log and end the stream
+            error_msg = f"Error exporting {line}: {str(e)}"
+            self.log_service.log_event(error_msg, type='ERROR')
+            print(error_msg)
+        finally:
+            if connection and not finished:
+                # A client that disconnected mid-export leaves rows unread; dropping the
+                # connection is cheaper than draining the rest of the result to reuse it
+                connection.discard()
+            else:
+                if cursor: cursor.close()
+                if connection: connection.close()
+
+    def get_aggregated_data(self, line, args):
+        """Bucketed stats per sensor over [start, end), returned as columns"""
+        try:
+            bucket = args.get('bucket', default='5m', type=str)
+            bucket_seconds = aggregation.parse_bucket(bucket)
+            stats = aggregation.parse_stats(args.get('stats', default='avg,min,max', type=str))
+            start_date_time = args.get('start', default='', type=str)
+            end_date_time = args.get('end', default='', type=str)
+            start = datetime.fromisoformat(start_date_time) if start_date_time else None
+            end = datetime.fromisoformat(end_date_time) if end_date_time else None
+        except ValueError as e:
+            return {"success": False, "error": str(e), "code": 400}
+
+        if start and end and (end - start).total_seconds() / bucket_seconds > aggregation.MAX_BUCKETS:
+            return {"success": False, "error": f"Range spans more than {aggregation.MAX_BUCKETS} buckets, use a wider bucket", "code": 400}
+
+        columns = self.get_table_columns(line)
+        if not columns:
+            return {"success": False, "error": f"Could not retrieve columns for table {line}", "code": 404}
+        sensor_columns = [col for col in columns if col not in ['timestamp', 'timezone']]
+        requested = args.get('sensors', default='', type=str)
+        sensors = [sensor.strip() for sensor in requested.split(',') if sensor.strip()] or sensor_columns
+        unknown = [sensor for sensor in sensors if sensor not in sensor_columns]
+        if unknown:
+            return {"success": False, "error": f"Unknown sensors for {line}: {', '.join(unknown)}", "code": 400}
+
+        try:
+            # Serve from the coarsest rollup that answers exactly, otherwise scan raw rows
+            level = None
+            if self.rollups:
+                level = self.rollups.plan(bucket_seconds, stats, start, end)
+                if level and not self.rollups.ensure(line):
+                    level = None
+
+            if level:
+                query = f"""
+                    SELECT bucket, sensor, samples, value_sum, value_min, value_max, value_sumsq
+                    FROM {self.rollups.table(line, level)}
+                    WHERE sensor IN ({', '.join(['%s'] * len(sensors))})
+                """
+                time_column = "bucket"
+            else:
+                query = f"SELECT timestamp, {', '.join(sensors)} FROM {line} WHERE 1=1"
+                time_column = "timestamp"
+            params = list(sensors) if level else []
+            if start:
+                query += f" AND {time_column} >= %s"
+                params.append(start)
+            if end:
+                query += f" AND {time_column} < %s"
+                params.append(end)
+            query += f" ORDER BY {time_column} ASC"
+
+            connection = self.db_manager.get_connection()
+            if not connection:
+                return {"success": False, "error": "Database connection failed", "code": 500}
+
+            cursor = connection.cursor()
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+
+            if level:
+                buckets, results = aggregation.aggregate_rollups(rows, sensors, bucket_seconds, stats)
+            else:
+                timestamps = [row[0] for row in rows]
+                values = [[row[i + 1] for row in rows] for i in range(len(sensors))]
+                buckets, results = aggregation.aggregate(timestamps, values, bucket_seconds, stats)
+            if len(buckets) > aggregation.MAX_BUCKETS:
+                return {"success": False, "error": f"Result spans more than {aggregation.MAX_BUCKETS} buckets, use a wider bucket", "code": 400}
+
+            return {
+                "success": True,
+                "bucket": bucket,
+                "stats": stats,
+                "source": level or "raw",
+                "timestamps": [aggregation.epoch_to_string(b) for b in buckets],
+                "data": {
+                    sensor: {stat: aggregation.to_json_list(result[stat]) for stat in stats}
+                    for sensor, result in zip(sensors, results)
+                }
+            }
+        except Exception as e:
+            error_msg = f"Error in get_aggregated_data: {str(e)}"
+            self.log_service.log_event(error_msg, type='ERROR')
+            print(error_msg)
+            return {"success": False, "error": str(e), "code": 500}
+        finally:
+            if 'cursor' in locals(): cursor.close()
+            if 'connection' in locals() and connection: connection.close()
 
     def get_sensor_data(self, line, sensor):
+        if self.reading_cache:
+            cached = self.reading_cache.get_sensor(line, sensor)
+            if cached:
+                self.log_service.log_event(f"Sensor data retrieved for {sensor} from {line}", type='INFO', log_level='admin')
+                return {"success": True, "data": cached}
+
         try:
             connection = self.db_manager.get_connection()
             if not connection:
@@ -713,13 +1779,77 @@ class DataService:
         except Exception as e:
             return {"success": False, "error": str(e), "code": 500}
         finally:
-            if 'connection' in locals(): connection.close()
+            if 'connection' in locals() and connection: connection.close()
+
+class IngestStats:
+    """Throughput and commit-latency counters for the simulator's write path
+
+    Served at /api/simulation/stats. Ticks are at least a second apart, so the row
+    rate grows with the number of lines (SIM_VIRTUAL_LINES adds more) rather than
+    with faster ticks, and batch_ticks trades commit count for batch latency.
+    """
+    def __init__(self, window=1000):
+        self.rows = 0
+        self.batches = 0
+        self.errors = 0
+        self.missed_ticks = 0
+        self._latencies = deque(maxlen=window)  # seconds per committed batch
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def record_batch(self, rows, seconds):
+        with self._lock:
+            self.rows += rows
+            self.batches += 1
+            self._latencies.append(seconds)
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def record_missed(self, ticks):
+        with self._lock:
+            self.missed_ticks += ticks
+
+    def snapshot(self):
+        with self._lock:
+            elapsed = time.monotonic() - self._started
+            latencies = sorted(self._latencies)
+            rows, batches, errors, missed_ticks = self.rows, self.batches, self.errors, self.missed_ticks
+
+        def percentile(q):
+            return round(latencies[min(int(q * len(latencies)), len(latencies) - 1)] * 1000, 2) if latencies else None
+
+        return {
+            "rows": rows,
+            "batches": batches,
+            "errors": errors,
+            "missed_ticks": missed_ticks,
+            "rows_per_second": round(rows / elapsed, 2) if elapsed else 0.0,
+            "batch_latency_ms": {"p50": percentile(0.5), "p95": percentile(0.95), "max": percentile(1.0)}
+        }
 
 class SimulationService:
-    def __init__(self, db_manager, log_service):
+    def __init__(self, db_manager, log_service, publisher=None, reading_cache=None, record_counter=None, rollups=None,
+                 schema_cache=None, interval=30, batch_ticks=1, seed=None):
         self.db_manager = db_manager
         self.log_service = log_service
+        self.publisher = publisher
+        self.reading_cache = reading_cache
+        self.record_counter = record_counter
+        self.rollups = rollups
+        self.schema_cache = schema_cache or SchemaCache(db_manager)
+        if interval < 1:
+            # Timestamps are stored to the second, so faster ticks would share one
+            raise ValueError(f"Simulation interval must be at least 1 second, got {interval}")
+        self.interval = interval  # seconds between ticks
+        self.batch_ticks = batch_ticks  # ticks written per transaction
+        self.stats = IngestStats()
+        self.virtual_lines = {}  # virtual line -> line whose table it copies
+        self.rng = np.random.default_rng(seed)  # seed it for reproducible benchmarks
+        self._sensor_arrays = {}  # line -> (sensor index, avg, min, max vectors)
         self.thread = None
+        self._stop = threading.Event()
         self.sensors = {}
 
         # Line 4 Sensors Ranges
@@ -756,6 +1886,23 @@ class SimulationService:
         if line not in self.sensors:
             self.sensors[line] = {}
         self.sensors[line][sensor] = range_info
+        self._sensor_arrays.pop(line, None)
+
+    def add_virtual_lines(self, count, template='line5'):
+        """Simulate `count` extra lines shaped like `template`, for write-load testing
+
+        Their tables (e.g. line5_v001) are created LIKE the template when the
+        simulation starts.
+        """
+        for i in range(1, count + 1):
+            line = f"{template}_v{i:03d}"
+            self.virtual_lines[line] = template
+            self.sensors[line] = dict(self.sensors[template])
+            self._sensor_arrays.pop(line, None)
+
+    def create_virtual_tables(self, cursor):
+        for line, template in self.virtual_lines.items():
+            cursor.execute(f"CREATE TABLE IF NOT EXISTS {line} LIKE {template}")
 
     def get_timezone_offset(self):
         """Get timezone offset depending on the current month."""
@@ -766,7 +1913,7 @@ class SimulationService:
         """Generate a random sensor reading within the given range, with 2% fluctuation."""
         avg_temp = ranges[sensor]["avg"]
         fluctuation = avg_temp * 0.02  # 2% fluctuation around the average
-        new_temp = random.uniform(avg_temp - fluctuation, avg_temp + fluctuation)  # Random within the fluctuation range
+        new_temp = float(self.rng.uniform(avg_temp - fluctuation, avg_temp + fluctuation))  # Random within the fluctuation range
         
         # Clamp the value to be within the min and max range defined for the sensor
         limits = ranges[sensor]
@@ -774,97 +1921,166 @@ class SimulationService:
         
         return round(new_temp, 2)
 
-    def insert_line_readings(self, connection, cursor, line_name, sensors, ranges, timestamp, timezone):
-        """Insert readings for a line into the database after verifying sensor columns exist."""
-        values = []  # Initialize values here to prevent reference before assignment
-        
+    def sensor_arrays(self, line, ranges=None):
+        """Contiguous avg/min/max vectors for a line's sensors, rebuilt when its ranges change"""
+        arrays = self._sensor_arrays.get(line)
+        if arrays is None:
+            ranges = ranges if ranges is not None else self.sensors[line]
+            names = list(ranges)
+            arrays = (
+                {name: i for i, name in enumerate(names)},
+                np.array([ranges[name]["avg"] for name in names], dtype=np.float64),
+                np.array([ranges[name]["min"] for name in names], dtype=np.float64),
+                np.array([ranges[name]["max"] for name in names], dtype=np.float64)
+            )
+            self._sensor_arrays[line] = arrays
+        return arrays
+
+    def generate_readings(self, line, sensors, count, ranges=None, scale=None):
+        """count x len(sensors) readings in one call, with the same 2% fluctuation, clamping
+        and rounding as generate_sensor_reading
+
+        scale optionally multiplies each row's averages, e.g. for seasonality or drift.
+        """
+        index, avg, low, high = self.sensor_arrays(line, ranges)
+        columns = [index[sensor] for sensor in sensors]
+        avg, low, high = avg[columns], low[columns], high[columns]
+        if scale is not None:
+            avg = np.asarray(scale, dtype=np.float64)[:, None] * avg
+        readings = self.rng.uniform(avg * 0.98, avg * 1.02, size=(count, len(columns)))
+        return np.round(np.clip(readings, low, high), 2)
+
+    def publish_readings(self, line_name, readings):
+        """Push committed readings to the live-data cache, record counts and any open streams"""
+        for reading in readings:
+            if self.record_counter:
+                self.record_counter.record(line_name, reading["timestamp"])
+        if self.reading_cache:
+            self.reading_cache.update(line_name, readings[-1])
+        if self.publisher:
+            for reading in readings:
+                self.publisher.publish(line_name, reading)
+
+    def insert_line_batch(self, cursor, line_name, sensors, ranges, ticks):
+        """Insert one reading per (timestamp, timezone) tick as a single multi-row insert
+
+        The caller commits, so several lines can share one transaction. Returns the
+        inserted readings for publish_readings once that commit succeeds.
+        """
+        existing_columns = self.schema_cache.columns(line_name, cursor)
+        valid_sensors = [sensor for sensor in sensors if sensor in existing_columns]
+        if not valid_sensors:
+            raise Exception(f"No valid sensors found for table {line_name}")
+
+        # tolist() hands the driver plain Python floats
+        readings = self.generate_readings(line_name, valid_sensors, len(ticks), ranges).tolist()
+        rows = [[timestamp, timezone, *values] for (timestamp, timezone), values in zip(ticks, readings)]
+        return self.insert_rows(cursor, line_name, valid_sensors, rows)
+
+    def insert_rows(self, cursor, line_name, sensors, rows):
+        """Insert [timestamp, timezone, *values] rows and fold them into the rollups
+
+        The caller commits and then publishes the returned readings.
+        """
+        rollups_ready = self.rollups.ensure(line_name, writing=True) if self.rollups else False
+
+        # mysql-connector turns executemany on an INSERT into a single multi-row insert
+        cursor.executemany(f"""
+            INSERT INTO {line_name}
+            (timestamp, timezone, {', '.join(sensors)})
+            VALUES (%s, %s, {', '.join(['%s'] * len(sensors))})
+        """, rows)
+
+        readings = [{"timestamp": row[0], "timezone": row[1], **dict(zip(sensors, row[2:]))} for row in rows]
+        if rollups_ready:
+            self.rollups.record(cursor, line_name, [(row[0], dict(zip(sensors, row[2:]))) for row in rows])
+        return readings
+
+    def write_batch(self, connection, cursor, ticks):
+        """Write every line's readings for the given ticks in one transaction"""
+        started = time.perf_counter()
         try:
-            # First get the current table structure
-            cursor.execute(f"SHOW COLUMNS FROM {line_name}")
-            columns = cursor.fetchall()
-            existing_columns = [column[0] for column in columns]
-            
-            # Filter sensors to only those that exist in the table
-            valid_sensors = [sensor for sensor in sensors if sensor in existing_columns]
-            
-            if not valid_sensors:
-                raise Exception(f"No valid sensors found for table {line_name}")
-                
-            # Generate readings only for valid sensors
-            values = [timestamp, timezone]
-            values.extend([self.generate_sensor_reading(sensor, ranges) for sensor in valid_sensors])
-
-            # Construct the SQL query dynamically using only valid sensors
-            query = f"""
-                INSERT INTO {line_name}
-                (timestamp, timezone, {', '.join(valid_sensors)})
-                VALUES (%s, %s, {', '.join(['%s'] * len(valid_sensors))})
-            """
-
-            # Execute the query
-            cursor.execute(query, values)
-
-            # Log the inserted readings for debugging purposes
-            readings_dict = dict(zip(valid_sensors, values[2:]))
-            print(f"{line_name}: {readings_dict}")
-
+            inserted = {
+                line: self.insert_line_batch(cursor, line, list(sensors.keys()), sensors, ticks)
+                for line, sensors in self.sensors.items()
+            }
             connection.commit()
-            
-            # If some sensors were filtered out, log a warning
-            if len(valid_sensors) != len(sensors):
-                missing_sensors = set(sensors) - set(valid_sensors)
-                warning_msg = f"Some sensors not found in table {line_name}: {', '.join(missing_sensors)}"
-                self.log_service.log_event(warning_msg, type='WARNING')
-                print(warning_msg)
-
-        except Exception as e:
-            self.log_service.log_event(f"Error inserting line {line_name} data: {str(e)}", type='ERROR')
-            print(f"Error inserting line {line_name} data: {e}")
-            if 'values' in locals():
-                print("Parameters:", values)
-                print("Number of parameters:", len(values))
+        except Exception:
+            connection.rollback()
+            self.schema_cache.invalidate()
+            self.stats.record_error()
             raise
+        self.stats.record_batch(sum(len(readings) for readings in inserted.values()), time.perf_counter() - started)
+        for line, readings in inserted.items():
+            self.publish_readings(line, readings)
+
+    def next_tick(self, tick, started):
+        """Wait for tick number `tick` of the fixed-rate schedule; None once stopped
+
+        Ticks fall at started + tick * interval on the monotonic clock, so time spent
+        writing never shifts the schedule. Ticks that are a whole interval overdue
+        are skipped and counted as missed instead of being written late in a burst.
+        Returns the number of the tick to run.
+        """
+        due = started + tick * self.interval
+        late = time.monotonic() - due
+        if late >= self.interval:
+            missed = int(late // self.interval)
+            self.stats.record_missed(missed)
+            tick += missed
+            due += missed * self.interval
+        if self._stop.wait(max(due - time.monotonic(), 0)):
+            return None
+        return tick
 
     def generate_temperature_readings(self):
-        """Simulate and insert temperature readings for each line."""
-        while True:
+        """Simulate readings for every line until stop(), writing `batch_ticks` ticks per transaction.
+
+        Readings are stamped evenly from the wall-clock start time, tick * interval
+        apart, whatever the write latency.
+        """
+        started = time.monotonic()
+        wall_started = time.time()
+        virtual_tables_ready = False
+        tick = 0
+        while not self._stop.is_set():
+            ticks = []
+            while len(ticks) < self.batch_ticks:
+                tick = self.next_tick(tick, started)
+                if tick is None:
+                    break
+                timestamp = datetime.fromtimestamp(wall_started + tick * self.interval).replace(microsecond=0)
+                ticks.append((timestamp.strftime('%Y-%m-%d %H:%M:%S'), self.get_timezone_offset()))
+                tick += 1
+            if not ticks:
+                break
+
             connection = None
             cursor = None
-
             try:
                 connection = self.db_manager.get_connection()
                 if not connection:
                     raise Exception("Failed to establish database connection")
 
                 cursor = connection.cursor()
-                current_timestamp = datetime.now().replace(microsecond=0).strftime('%Y-%m-%d %H:%M:%S')
-                timezone_offset = self.get_timezone_offset()
-
-                # Insert readings for dynamic lines and sensors
-                for line, sensors in self.sensors.items():
-                    self.insert_line_readings(
-                        connection,
-                        cursor,
-                        line,
-                        list(sensors.keys()),
-                        self.sensors[line],
-                        current_timestamp,
-                        timezone_offset
-                    )
+                if not virtual_tables_ready:
+                    self.create_virtual_tables(cursor)
+                    virtual_tables_ready = True
 
-                time.sleep(30)
+                self.write_batch(connection, cursor, ticks)
 
             except Exception as e:
+                # The schedule carries on; ticks lost while failing are counted as missed
                 self.log_service.log_event(f"Simulation error: {str(e)}", type='ERROR')
                 print(f"Simulation error: {e}")
-                time.sleep(5)
             finally:
                 if cursor: cursor.close()
                 if connection: connection.close()
 
     def start(self):
-        """Start the simulation in a separate thread."""
+        """Start the simulation in a separate thread, unless it is already running."""
         if not self.thread or not self.thread.is_alive():
+            self._stop.clear()
             self.thread = threading.Thread(
                 target=self.generate_temperature_readings,
                 daemon=True
@@ -872,9 +2088,187 @@ class SimulationService:
             self.thread.start()
             self.log_service.log_event("Temperature simulation started", type='INFO')
 
+    def stop(self, timeout=None):
+        """Stop the simulation; the worker exits within one tick, after any write in progress."""
+        self._stop.set()
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join(timeout)
+            if self.thread.is_alive():
+                warning_msg = f"Temperature simulation still writing {timeout}s after stop was requested"
+                self.log_service.log_event(warning_msg, type='WARNING')
+                print(warning_msg)
+            else:
+                self.log_service.log_event("Temperature simulation stopped", type='INFO')
+
+class ReplayService:
+    """Streams an exported plant CSV (a timestamp column plus rXX columns) into a line table
+
+    Rows keep their original spacing divided by `speed`, so 1 replays in real time
+    and 60 plays an hour per minute; speed 0 writes as fast as the database takes
+    them. With retime (the default unless speed is 0) each row is stamped with the
+    time it is due, so an incident shows on the live dashboard as if it were
+    happening now. Rows have no due time at speed 0, so retime is refused there
+    and the file's own timestamps are written. The file is read `chunk_size` rows at a time and goes
+    through the simulator's insert path, so rollups, counts and live streams see it.
+    """
+    def __init__(self, simulation_service, log_service, replay_dir, chunk_size=10000, batch_size=500):
+        self.simulation_service = simulation_service
+        self.db_manager = simulation_service.db_manager
+        self.log_service = log_service
+        self.replay_dir = replay_dir  # only files in here can be replayed
+        self.chunk_size = chunk_size
+        self.batch_size = batch_size  # most rows written per transaction
+        self.stats = IngestStats()
+        self.status = {"state": "idle"}
+        self.thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self, data):
+        """Start replaying data['file'] into data['line'] on a background thread"""
+        data = data or {}
+        line = data.get('line')
+        file = data.get('file')
+        try:
+            speed = float(data.get('speed', 1))
+        except (TypeError, ValueError):
+            return {"success": False, "error": "speed must be a number", "code": 400}
+        if not line or not file:
+            return {"success": False, "error": "line and file are required", "code": 400}
+        if line not in self.simulation_service.sensors:
+            return {"success": False, "error": f"Unknown line: {line}", "code": 404}
+        if speed < 0:
+            return {"success": False, "error": "speed must be 0 (as fast as possible) or more", "code": 400}
+        retime = self.parse_flag(data.get('retime', speed > 0))
+        if retime is None:
+            return {"success": False, "error": "retime must be true or false", "code": 400}
+        if retime and speed == 0:
+            return {"success": False, "error": "retime needs a speed above 0", "code": 400}
+
+        replay_dir = os.path.realpath(self.replay_dir)
+        path = os.path.realpath(os.path.join(replay_dir, file))
+        if os.path.dirname(path) != replay_dir or not os.path.isfile(path):
+            return {"success": False, "error": f"No replay file named {file}", "code": 404}
+
+        with self._lock:
+            if self.thread and self.thread.is_alive():
+                return {"success": False, "error": "A replay is already running", "code": 409}
+            self._stop.clear()
+            self.stats = IngestStats()
+            self.status = {"state": "running", "line": line, "file": file, "speed": speed}
+            self.thread = threading.Thread(
+                target=self.replay,
+                args=(path, line, speed, retime),
+                daemon=True
+            )
+            self.thread.start()
+        self.log_service.log_event(f"Replay of {file} into {line} started at speed {speed}", type='INFO')
+        return {"success": True, "message": "Replay started"}
+
     def stop(self):
-        """Stop the simulation if needed."""
-        pass
+        """Ask a running replay to stop after its current batch"""
+        self._stop.set()
+        return {"success": True, "message": "Replay stopping"}
+
+    def get_status(self):
+        return {"success": True, "data": {**self.status, "stats": self.stats.snapshot()}}
+
+    @staticmethod
+    def parse_flag(value):
+        """True or False from a JSON boolean or a string like 'true' / 'false', else None"""
+        if isinstance(value, bool):
+            return value
+        if isinstance(value, str) and value.strip().lower() in ('true', '1', 'yes', 'false', '0', 'no'):
+            return value.strip().lower() in ('true', '1', 'yes')
+        return None
+
+    @staticmethod
+    def prepare(chunk, columns):
+        """Rows of a CSV chunk as timestamps, timezones and the sensor columns the table has
+
+        Timestamps are parsed like the forecasting notebook does: timezone-aware
+        values are converted to UTC, and unparseable rows are dropped. Parsing as
+        ISO 8601 keeps one chunk's guessed format from rejecting the next's rows.
+        """
+        timestamps = pd.to_datetime(chunk['timestamp'], errors='coerce', utc=True, format='ISO8601')
+        chunk = chunk.assign(timestamp=timestamps.dt.tz_localize(None))
+        chunk = chunk.dropna(subset=['timestamp']).sort_values('timestamp', kind='stable')
+        sensors = [column for column in chunk.columns if re.fullmatch(r"r\d+", column) and column in columns]
+        if 'timezone' in chunk.columns:
+            timezones = chunk['timezone'].astype(str)
+        else:
+            timezones = pd.Series(np.where(chunk['timestamp'].dt.month.between(4, 10), "+01", "+00"), index=chunk.index)
+        values = chunk[sensors].astype(object).where(chunk[sensors].notna(), None)
+        return chunk['timestamp'], timezones, sensors, values
+
+    def replay(self, path, line, speed, retime=False):
+        """Write the file's rows as they fall due, in batches of up to batch_size"""
+        connection = None
+        cursor = None
+        state = "finished"
+        try:
+            connection = self.db_manager.get_connection()
+            if not connection:
+                raise Exception("Failed to establish database connection")
+            cursor = connection.cursor()
+            columns = self.simulation_service.schema_cache.columns(line, cursor)
+
+            started = time.monotonic()
+            first = None
+            for chunk in pd.read_csv(path, chunksize=self.chunk_size):
+                timestamps, timezones, sensors, values = self.prepare(chunk, columns)
+                if not sensors:
+                    raise Exception(f"No columns of {os.path.basename(path)} match sensors in {line}")
+                if timestamps.empty:
+                    continue
+                if first is None:
+                    first = timestamps.iloc[0]
+                    replay_start = datetime.now().replace(microsecond=0)
+
+                offsets = (timestamps - first).dt.total_seconds().to_numpy()
+                due = np.maximum(offsets / speed if speed else np.zeros(len(offsets)), 0)
+                if retime:
+                    shift = pd.to_timedelta(due, unit='s')
+                    timestamps = pd.Series(shift, index=timestamps.index) + replay_start
+                stamps = timestamps.dt.strftime('%Y-%m-%d %H:%M:%S').tolist()
+                rows = [
+                    [timestamp, timezone, *row]
+                    for timestamp, timezone, row in zip(stamps, timezones.tolist(), values.values.tolist())
+                ]
+
+                position = 0
+                while position < len(rows):
+                    wait = started + due[position] - time.monotonic()
+                    if (wait > 0 and self._stop.wait(wait)) or self._stop.is_set():
+                        state = "stopped"
+                        return
+                    # Everything already due goes in one transaction, up to batch_size rows
+                    ready = int(np.searchsorted(due, time.monotonic() - started, side='right'))
+                    end = min(max(ready, position + 1), position + self.batch_size)
+                    self.write(connection, cursor, line, sensors, rows[position:end])
+                    position = end
+
+        except Exception as e:
+            state = "failed"
+            self.status = {**self.status, "error": str(e)}
+            self.log_service.log_event(f"Replay error: {str(e)}", type='ERROR')
+            print(f"Replay error: {e}")
+        finally:
+            self.status = {**self.status, "state": state}
+            if cursor: cursor.close()
+            if connection: connection.close()
+
+    def write(self, connection, cursor, line, sensors, rows):
+        started = time.perf_counter()
+        try:
+            readings = self.simulation_service.insert_rows(cursor, line, sensors, rows)
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            self.stats.record_error()
+            raise
+        self.stats.record_batch(len(rows), time.perf_counter() - started)
+        self.simulation_service.publish_readings(line, readings)
 
 class FlaskApp:
     def __init__(self):
@@ -886,11 +2280,36 @@ class FlaskApp:
             methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"])
         
         self.db_manager = DatabaseManager()
-        self.log_service = LogService(self.db_manager)
+        self.log_service = LogService(
+            self.db_manager,
+            batched=Config.LOG_BATCHED,
+            max_pending=Config.LOG_MAX_PENDING,
+            batch_size=Config.LOG_BATCH_SIZE,
+            flush_interval=Config.LOG_FLUSH_INTERVAL,
+            overflow=Config.LOG_OVERFLOW
+        )
         self.auth_service = AuthService(self.db_manager, self.log_service)
-        self.admin_service = AdminService(self.db_manager, self.log_service)
-        self.data_service = DataService(self.db_manager, self.log_service)
-        self.simulation_service = SimulationService(self.db_manager, self.log_service)
+        self.schema_cache = SchemaCache(self.db_manager, Config.SCHEMA_CACHE_TTL)
+        self.reading_cache = LatestReadingCache(Config.READING_CACHE_TTL)
+        self.admin_service = AdminService(self.db_manager, self.log_service, self.schema_cache, self.reading_cache)
+        self.record_counter = RecordCounter(self.db_manager, Config.COUNT_EXACT_THRESHOLD)
+        self.rollups = RollupManager(self.db_manager)
+        self.data_service = DataService(
+            self.db_manager, self.log_service, self.reading_cache, self.record_counter, self.rollups,
+            self.schema_cache
+        )
+        self.publisher = ReadingPublisher()
+        self.simulation_service = SimulationService(
+            self.db_manager, self.log_service, self.publisher, self.reading_cache,
+            self.record_counter, self.rollups, self.schema_cache,
+            interval=Config.SIM_INTERVAL, batch_ticks=Config.SIM_BATCH_TICKS, seed=Config.SIM_SEED
+        )
+        if Config.SIM_VIRTUAL_LINES:
+            self.simulation_service.add_virtual_lines(Config.SIM_VIRTUAL_LINES, Config.SIM_VIRTUAL_TEMPLATE)
+        self.replay_service = ReplayService(
+            self.simulation_service, self.log_service, Config.REPLAY_DIR,
+            chunk_size=Config.REPLAY_CHUNK_SIZE, batch_size=Config.REPLAY_BATCH_SIZE
+        )
         
         self.setup_routes()
     
@@ -903,6 +2322,27 @@ class FlaskApp:
     def error(self, msg, code=400):
         return jsonify({"success": False, "error": msg}), code
     
+    def event(self, data):
+        return f"data: {json.dumps(data, default=str)}\n\n"
+
+    def stream_live_data(self, line, keepalive=15):
+        """Yield Server-Sent Events for each reading published on a line"""
+        subscriber = self.publisher.subscribe(line)
+        try:
+            # Start from the latest stored reading so the dashboard isn't blank until the next tick
+            result = self.data_service.get_live_data(line)
+            if result['success']:
+                yield self.event(result['data'])
+            while True:
+                try:
+                    reading = subscriber.get(timeout=keepalive)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                yield self.event(reading)
+        finally:
+            self.publisher.unsubscribe(line, subscriber)
+    
     def setup_routes(self):
         @self.app.route('/')
         @self.app.route('/home')
@@ -958,6 +2398,14 @@ class FlaskApp:
                 return self.error(result['error'], result.get('code', result.get('code', 500)))
             return jsonify(result)
 
+        @self.app.route('/api/stream/live-data/<line>', methods=['GET'])
+        def stream_live_data(line):
+            return Response(
+                self.stream_live_data(line),
+                mimetype='text/event-stream',
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+            )
+
         @self.app.route('/api/admin/user-accounts', methods=['GET'])
         def get_user_accounts():
             result = self.admin_service.get_user_accounts()
@@ -1042,6 +2490,46 @@ class FlaskApp:
                 return self.error(result['error'], result.get('code', 500))
             return jsonify(result)
 
+        @self.app.route('/api/export/<line>', methods=['GET', 'OPTIONS'])
+        def export_data(line):
+            if request.method == 'OPTIONS': return self.handle_options()
+            result = self.data_service.export_data(line, request.args)
+            if not result['success']:
+                return self.error(result['error'], result.get('code', 500))
+            return Response(
+                stream_with_context(result['stream']),
+                mimetype=result['mimetype'],
+                headers={"Content-Disposition": f"attachment; filename={result['filename']}"}
+            )
+
+        @self.app.route('/api/simulation/stats', methods=['GET', 'OPTIONS'])
+        def get_simulation_stats():
+            if request.method == 'OPTIONS': return self.handle_options()
+            return jsonify({"success": True, "data": self.simulation_service.stats.snapshot()})
+
+        @self.app.route('/api/simulation/replay', methods=['GET', 'POST', 'OPTIONS'])
+        def replay_csv():
+            if request.method == 'OPTIONS': return self.handle_options()
+            if request.method == 'GET':
+                return jsonify(self.replay_service.get_status())
+            result = self.replay_service.start(request.get_json(silent=True))
+            if not result['success']:
+                return self.error(result['error'], result.get('code', 400))
+            return jsonify(result)
+
+        @self.app.route('/api/simulation/replay/stop', methods=['POST', 'OPTIONS'])
+        def stop_replay():
+            if request.method == 'OPTIONS': return self.handle_options()
+            return jsonify(self.replay_service.stop())
+
+        @self.app.route('/api/aggregate/<line>', methods=['GET', 'OPTIONS'])
+        def get_aggregated_data(line):
+            if request.method == 'OPTIONS': return self.handle_options()
+            result = self.data_service.get_aggregated_data(line, request.args)
+            if not result['success']:
+                return self.error(result['error'], result.get('code', 500))
+            return jsonify(result)
+
         @self.app.route('/api/forecasted-data/<line>', methods=['GET', 'OPTIONS'])
         def get_forecasted_data(line):
             if request.method == 'OPTIONS': return self.handle_options()
@@ -1097,12 +2585,11 @@ if __name__ == '__main__':
     # Create the app first
     app = create_app()
     
-    # Create and start simulation thread using the instance's simulation service
-    simulation_thread = threading.Thread(
-        target=app.simulation_service.generate_temperature_readings,
-        daemon=True
-    )
-    simulation_thread.start()
+    # The simulation runs on the service's own managed worker thread
+    app.simulation_service.start()
     
-    # Run the Flask app
-    app.run(host='127.0.0.1', port=5000, debug=True)
\ No newline at end of file
+    # Run the Flask app, then let the worker finish its current write
+    try:
+        app.run(host='127.0.0.1', port=5000, debug=True)
+    finally:
+        app.simulation_service.stop()
\ No newline at end of file
@@ -0,0 +1,139 @@
+"""Generate historical readings for the line tables, for benchmarking at production volume
+
+Usage: python backfill.py line4 [line5 ...] [--days 365] [--interval 30]
+                          [--seasonality 0.1] [--drift 0.05] [--load-data]
+
+Readings come from SimulationService's sensor ranges, one row every `interval`
+seconds for the `days` before the line's oldest row (or before now for an empty
+table), so a backfill never overlaps live data. --seasonality swings the sensor
+averages by that fraction over each day, peaking at noon, and --drift moves them
+linearly by that fraction from the first to the last row. Rows go in as chunked
+multi-row INSERTs, or with --load-data through LOAD DATA LOCAL INFILE, which
+needs local_infile enabled on the server and is faster. Rollups
+are rebuilt for the backfilled days afterwards. A running API keeps its cached
+record counts, so restart it after a backfill.
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+import numpy as np
+from app import SimulationService, RollupManager
+from bulk_load import load_data_infile
+
+def tick_times(start, end, interval):
+    """Tick timestamps in [start, end), `interval` seconds apart"""
+    return np.arange(np.datetime64(start, "s"), np.datetime64(end, "s"), np.timedelta64(int(interval), "s"))
+
+def timezones(times):
+    """'+01' for readings taken April to October and '+00' otherwise, as the simulator records them"""
+    months = times.astype("datetime64[M]").astype(np.int64) % 12 + 1
+    return np.where((months >= 4) & (months <= 10), "+01", "+00")
+
+def scale_factors(times, start, end, seasonality=0.0, drift=0.0):
+    """Per-row multiplier on the sensor averages for daily seasonality and linear drift"""
+    seconds = (times - np.datetime64(start, "s")).astype(np.float64)
+    scale = np.ones(len(times))
+    if seasonality:
+        day_fraction = (times - times.astype("datetime64[D]")).astype(np.float64) / 86400
+        scale += seasonality * np.sin(2 * np.pi * (day_fraction - 0.25))
+    if drift:
+        scale *= 1 + drift * seconds / max((end - start).total_seconds(), 1)
+    return scale
+
+def insert_rows(cursor, line, sensors, rows):
+    # mysql-connector turns executemany on an INSERT into a single multi-row insert
+    cursor.executemany(f"""
+        INSERT INTO {line}
+        (timestamp, timezone, {', '.join(sensors)})
+        VALUES (%s, %s, {', '.join(['%s'] * len(sensors))})
+    """, rows)
+
+def load_rows(cursor, line, sensors, rows):
+    load_data_infile(cursor, line, ["timestamp", "timezone", *sensors], rows)
+
+def backfill_line(connection, simulation, line, start, end, interval=30, seasonality=0.0, drift=0.0,
+                  chunk_size=50000, load_data=False):
+    """Write readings for [start, end) into a line table, committing each chunk
+
+    Returns the rows written, the seconds taken and the rate, like the forecast
+    bulk store does.
+    """
+    started = time.time()
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"SHOW COLUMNS FROM {line}")
+        existing_columns = {column[0] for column in cursor.fetchall()}
+        sensors = [sensor for sensor in simulation.sensors[line] if sensor in existing_columns]
+        if not sensors:
+            raise ValueError(f"No valid sensors found for table {line}")
+
+        times = tick_times(start, end, interval)
+        write = load_rows if load_data else insert_rows
+        written = 0
+        for offset in range(0, len(times), chunk_size):
+            chunk = times[offset:offset + chunk_size]
+            readings = simulation.generate_readings(
+                line, sensors, len(chunk), scale=scale_factors(chunk, start, end, seasonality, drift)
+            )
+            # csv.writer and the driver both handle plain Python values fastest
+            stamps = np.char.replace(np.datetime_as_string(chunk, unit="s"), "T", " ").tolist()
+            rows = [
+                [timestamp, timezone, *values]
+                for timestamp, timezone, values in zip(stamps, timezones(chunk).tolist(), readings.tolist())
+            ]
+            write(cursor, line, sensors, rows)
+            connection.commit()
+            written += len(chunk)
+            print(f"\r{line}: {written:,} / {len(times):,} rows", end="")
+        print()
+
+        if written and RollupManager(None).refresh(cursor, line, start, end):
+            connection.commit()
+    finally:
+        cursor.close()
+
+    elapsed = time.time() - started
+    rate = written / elapsed if elapsed > 0 else float(written)
+    return {"rows": written, "seconds": elapsed, "rows_per_second": rate}
+
+def oldest_timestamp(connection, line):
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"SELECT MIN(timestamp) FROM {line}")
+        return cursor.fetchone()[0]
+    finally:
+        cursor.close()
+
+if __name__ == "__main__":
+    import mysql.connector
+    from config import Config
+
+    parser = argparse.ArgumentParser(description="Backfill line tables with simulated history")
+    parser.add_argument("lines", nargs="*", default=["line4", "line5"])
+    parser.add_argument("--days", type=float, default=365)
+    parser.add_argument("--interval", type=int, default=30, help="seconds between readings")
+    parser.add_argument("--seasonality", type=float, default=0.0, help="daily swing as a fraction of the average")
+    parser.add_argument("--drift", type=float, default=0.0, help="change over the whole range as a fraction")
+    parser.add_argument("--chunk-size", type=int, default=50000)
+    parser.add_argument("--load-data", action="store_true", help="use LOAD DATA LOCAL INFILE")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    connection = mysql.connector.connect(
+        host=Config.DB_HOST, user=Config.DB_USER, password=Config.DB_PASSWORD, database=Config.DB_NAME,
+        allow_local_infile=args.load_data
+    )
+    # Only the sensor ranges and the generator are used, so no pool or log service is needed
+    simulation = SimulationService(None, None, seed=args.seed)
+    try:
+        for line in args.lines:
+            end = oldest_timestamp(connection, line) or datetime.now().replace(microsecond=0)
+            start = end - timedelta(days=args.days)
+            result = backfill_line(
+                connection, simulation, line, start, end, args.interval, args.seasonality, args.drift,
+                args.chunk_size, args.load_data
+            )
+            print(f"{line}: {result['rows']:,} rows from {start} to {end} in {result['seconds']:.1f}s "
+                  f"({result['rows_per_second'] * 60:,.0f} rows/min)")
+    finally:
+        connection.close()
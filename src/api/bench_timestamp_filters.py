@@ -0,0 +1,80 @@
+"""Benchmark the old string-matching date filters against sargable timestamp ranges
+
+Usage: python bench_timestamp_filters.py [rows]
+
+Fills a bench_timestamps table (default 3,000,000 rows, one reading every 30
+seconds from 2022) shaped like the line tables, creates the timestamp index, then
+prints the EXPLAIN access type, the estimated rows examined and the best-of-5
+latency for each filter before and after the rewrite.
+Expect type ALL/index with millions of rows before, and range with about one
+day's or hour's worth of rows after.
+"""
+import sys
+import time
+from datetime import datetime, timedelta
+from app import DatabaseManager, DataService
+from timestamp_indexes import create_timestamp_index
+
+TABLE = "bench_timestamps"
+START = datetime(2022, 1, 1)
+DAY = "2023-06-15"
+
+CASES = [
+    (
+        "dateFilter",
+        "DATE(timestamp) = %s", [DAY],
+        "timestamp >= %s AND timestamp < %s", list(DataService.prefix_range(DAY))
+    ),
+    (
+        "searchValue",
+        "timestamp LIKE %s", [f"%{DAY} 14%"],
+        "timestamp >= %s AND timestamp < %s", list(DataService.prefix_range(f"{DAY} 14"))
+    ),
+]
+
+def populate(connection, rows, chunk=10000):
+    cursor = connection.cursor()
+    cursor.execute(f"SHOW TABLES LIKE '{TABLE}'")
+    if cursor.fetchone():
+        cursor.execute(f"SELECT COUNT(*) FROM {TABLE}")
+        if cursor.fetchone()[0] == rows:
+            cursor.close()
+            return
+        cursor.execute(f"DROP TABLE {TABLE}")
+    cursor.execute(f"CREATE TABLE {TABLE} (timestamp DATETIME NOT NULL, timezone VARCHAR(10), r01 FLOAT)")
+    for offset in range(0, rows, chunk):
+        cursor.executemany(
+            f"INSERT INTO {TABLE} (timestamp, timezone, r01) VALUES (%s, %s, %s)",
+            [(START + timedelta(seconds=30 * i), '+00', (i % 1000) / 10) for i in range(offset, min(offset + chunk, rows))]
+        )
+        connection.commit()
+        print(f"\rInserted {min(offset + chunk, rows):,} / {rows:,} rows", end="")
+    print()
+    cursor.close()
+
+def run(cursor, where, params, repeat=5):
+    query = f"SELECT timestamp, r01 AS value FROM {TABLE} WHERE {where} ORDER BY timestamp DESC LIMIT 50"
+    cursor.execute("EXPLAIN " + query, params)
+    plan = cursor.fetchone()
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        cursor.execute(query, params)
+        cursor.fetchall()
+        best = min(best, time.perf_counter() - started)
+    return f"{plan['type']:<6} {str(plan['key']):<28} {plan['rows']:>10,}  {best * 1000:9.2f} ms"
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 3_000_000
+    db_manager = DatabaseManager()
+    connection = db_manager.get_connection()
+    populate(connection, rows)
+
+    cursor = connection.cursor(dictionary=True)
+    create_timestamp_index(cursor, TABLE)
+    print(f"{'filter':<12} {'':<7} {'type':<6} {'key':<28} {'rows':>10}  {'best of 5':>12}")
+    for label, old_where, old_params, new_where, new_params in CASES:
+        print(f"{label:<12} {'before':<7} {run(cursor, old_where, old_params)}")
+        print(f"{'':<12} {'after':<7} {run(cursor, new_where, new_params)}")
+    cursor.close()
+    connection.close()
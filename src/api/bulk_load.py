@@ -0,0 +1,30 @@
+import csv
+import os
+import tempfile
+
+# LOAD DATA LOCAL INFILE for bulk writers (forecast storage, historical backfill).
+# The connection must be opened with allow_local_infile=True and the server must
+# have local_infile enabled.
+
+def infile_literal(path):
+    """A file path as a MySQL string literal
+
+    Backslashes are escape characters inside MySQL strings, so Windows paths such
+    as C:\\Users\\...\\Temp\\tmp1.csv would be mangled; MySQL accepts forward slashes
+    on every platform.
+    """
+    return "'" + path.replace("\\", "/").replace("'", "\\'") + "'"
+
+def load_data_infile(cursor, table, columns, rows, replace=False):
+    """Stream rows through a temporary CSV and LOAD DATA LOCAL INFILE into table"""
+    with tempfile.NamedTemporaryFile("w", suffix=".csv", newline="", delete=False) as f:
+        csv.writer(f, lineterminator="\n").writerows(rows)
+        path = f.name
+    try:
+        cursor.execute(
+            f"LOAD DATA LOCAL INFILE {infile_literal(path)} {'REPLACE ' if replace else ''}INTO TABLE {table} "
+            "FIELDS TERMINATED BY ',' LINES TERMINATED BY '\\n' "
+            f"({', '.join(columns)})"
+        )
+    finally:
+        os.remove(path)
@@ -0,0 +1,184 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+# yhat matches Prophet.predict to within this relative tolerance. yhat_lower and
+# yhat_upper are Monte Carlo quantiles, as in Prophet, so they agree to within
+# sampling error: about 3% of the interval width at 1000 samples.
+YHAT_RTOL = 1e-9
+
+class CompiledProphet:
+    """Pure-NumPy evaluator for a fitted Prophet model exported to a .npz artifact
+
+    Supports the models we train: linear or flat growth, Fourier seasonalities
+    (additive or multiplicative), no holidays or extra regressors, MAP fit.
+    """
+
+    FIELDS = (
+        "growth", "start_ns", "t_scale_ns", "y_scale", "k", "m", "delta", "changepoints_t",
+        "sigma_obs", "beta", "periods", "orders", "s_a", "s_m", "interval_width",
+        "uncertainty_samples", "history_diff"
+    )
+
+    def __init__(self, params, seed=None):
+        self.params = params
+        self.rng = np.random.default_rng(seed)
+
+    @classmethod
+    def from_prophet(cls, model):
+        """Extract trend, changepoints, seasonality and interval parameters from a Prophet model"""
+        if model.growth not in ("linear", "flat"):
+            raise ValueError(f"Unsupported growth '{model.growth}'")
+        if model.holidays is not None or model.country_holidays is not None or model.extra_regressors:
+            raise ValueError("Holidays and extra regressors are not supported")
+        if any(s["condition_name"] for s in model.seasonalities.values()):
+            raise ValueError("Conditional seasonalities are not supported")
+        if model.params["k"].shape[0] != 1:
+            raise ValueError("Only MAP-fitted models (mcmc_samples=0) are supported")
+
+        _, _, component_cols, _ = model.make_all_seasonality_features(model.history.head(2))
+        params = {
+            "growth": np.array(model.growth),
+            "start_ns": np.int64(model.start.value),
+            "t_scale_ns": np.float64(model.t_scale.value),
+            "y_scale": np.float64(model.y_scale),
+            "k": np.float64(model.params["k"][0, 0]),
+            "m": np.float64(model.params["m"][0, 0]),
+            "delta": np.asarray(model.params["delta"][0], dtype=np.float64),
+            "changepoints_t": np.asarray(model.changepoints_t, dtype=np.float64),
+            "sigma_obs": np.float64(model.params["sigma_obs"][0, 0]),
+            "beta": np.asarray(model.params["beta"][0], dtype=np.float64),
+            "periods": np.array([s["period"] for s in model.seasonalities.values()], dtype=np.float64),
+            "orders": np.array([s["fourier_order"] for s in model.seasonalities.values()], dtype=np.int64),
+            "s_a": component_cols["additive_terms"].values.astype(np.float64),
+            "s_m": component_cols["multiplicative_terms"].values.astype(np.float64),
+            "interval_width": np.float64(model.interval_width),
+            "uncertainty_samples": np.int64(model.uncertainty_samples or 0),
+            "history_diff": np.float64(np.diff(model.history["t"]).mean())
+        }
+        return cls(params)
+
+    @classmethod
+    def load(cls, path, seed=None):
+        """Load an exported .npz artifact"""
+        with np.load(path, allow_pickle=False) as artifact:
+            params = {field: artifact[field] for field in cls.FIELDS}
+        return cls(params, seed)
+
+    def save(self, path):
+        """Write the parameters to a compressed .npz artifact"""
+        with open(path, "wb") as f:
+            np.savez_compressed(f, **self.params)
+
+    def _features(self, ds_ns):
+        """Fourier features for every seasonality, in Prophet's column order"""
+        days = ds_ns / (24 * 60 * 60 * 1e9)
+        columns = []
+        for period, order in zip(self.params["periods"], self.params["orders"]):
+            x = 2 * np.pi * days / period
+            for i in range(int(order)):
+                columns.append(np.sin((i + 1) * x))
+                columns.append(np.cos((i + 1) * x))
+        if not columns:
+            return np.zeros((len(ds_ns), 0))
+        return np.column_stack(columns)
+
+    def _trend(self, t):
+        """Expected trend on the scaled time axis"""
+        p = self.params
+        if str(p["growth"]) == "flat":
+            return np.full_like(t, p["m"])
+        deltas_t = (p["changepoints_t"][None, :] <= t[:, None]) * p["delta"]
+        k_t = deltas_t.sum(axis=1) + p["k"]
+        m_t = (deltas_t * -p["changepoints_t"]).sum(axis=1) + p["m"]
+        return k_t * t + m_t
+
+    def _trend_uncertainty(self, t, n_samples):
+        """Simulated future trend shifts, following Prophet's vectorized sampler"""
+        p = self.params
+        future = t > 1
+        n_length = int(future.sum())
+        uncertainty = np.zeros((n_samples, len(t)))
+        if n_length == 0 or str(p["growth"]) == "flat":
+            return uncertainty
+
+        single_diff = np.diff(t[future]).mean() if n_length > 1 else p["history_diff"]
+        likelihood = len(p["changepoints_t"]) * single_diff
+        mean_delta = np.mean(np.abs(p["delta"])) + 1e-8
+
+        changes = self.rng.uniform(size=(n_samples, n_length)) < likelihood
+        shifts = np.zeros(changes.shape)
+        # Only draw shift sizes where a changepoint actually occurs
+        shifts[changes] = self.rng.laplace(0, mean_delta, size=int(changes.sum()))
+        shifted = np.hstack([np.zeros((n_samples, 1)), shifts])[:, :-1]
+        slopes = (shifted + shifts) / 2
+        uncertainty[:, future] = slopes.cumsum(axis=1).cumsum(axis=1) * single_diff
+        return uncertainty
+
+    def predict_arrays(self, ds):
+        """Evaluate yhat, yhat_lower and yhat_upper for sorted datetime64 values"""
+        p = self.params
+        ds_ns = np.asarray(ds, dtype="datetime64[ns]").astype(np.int64).astype(np.float64)
+        t = (ds_ns - p["start_ns"]) / p["t_scale_ns"]
+
+        X = self._features(ds_ns)
+        additive = X @ (p["beta"] * p["s_a"]) * p["y_scale"]
+        multiplicative = X @ (p["beta"] * p["s_m"])
+        expected = self._trend(t)
+        trend = expected * p["y_scale"]
+        yhat = trend * (1 + multiplicative) + additive
+
+        n_samples = int(p["uncertainty_samples"])
+        if n_samples == 0:
+            return {"yhat": yhat, "yhat_lower": yhat.copy(), "yhat_upper": yhat.copy()}
+
+        trends = (expected + self._trend_uncertainty(t, n_samples)) * p["y_scale"]
+        noise = self.rng.normal(0, p["sigma_obs"], trends.shape) * p["y_scale"]
+        samples = trends * (1 + multiplicative) + additive + noise
+        lower_p = 100 * (1.0 - p["interval_width"]) / 2
+        upper_p = 100 * (1.0 + p["interval_width"]) / 2
+        lower, upper = np.percentile(samples, [lower_p, upper_p], axis=0)
+        return {"yhat": yhat, "yhat_lower": lower, "yhat_upper": upper}
+
+    def predict(self, df):
+        """Drop-in for Prophet.predict: takes a ds column and returns ds/yhat/yhat_lower/yhat_upper"""
+        ds = pd.to_datetime(df["ds"]).sort_values().reset_index(drop=True)
+        return pd.DataFrame({"ds": ds, **self.predict_arrays(ds.values)})
+
+def compiled_path(model_path):
+    """Path of the compiled artifact that sits next to a .pkl model"""
+    return os.path.splitext(model_path)[0] + ".npz"
+
+def export_model(model_path, verify=True):
+    """Export one pickled Prophet model to a .npz artifact next to it"""
+    import joblib
+    model = joblib.load(model_path)
+    compiled = CompiledProphet.from_prophet(model)
+
+    if verify:
+        # yhat is deterministic, so it must match Prophet on the training range
+        check = model.history[["ds"]].tail(100)
+        expected = model.predict(check)["yhat"].values
+        actual = compiled.predict_arrays(check["ds"].values)["yhat"]
+        if not np.allclose(actual, expected, rtol=YHAT_RTOL, atol=YHAT_RTOL * model.y_scale):
+            raise ValueError(f"Compiled model for {model_path} does not reproduce yhat")
+
+    output_path = compiled_path(model_path)
+    compiled.save(output_path)
+    return output_path
+
+def export_models(model_dir, verify=True):
+    """Export every prophet_rXX.pkl under model_dir"""
+    exported = []
+    for file in sorted(os.listdir(model_dir)):
+        if file.startswith("prophet_r") and file.endswith(".pkl"):
+            output_path = export_model(os.path.join(model_dir, file), verify)
+            print(f"Exported {file} -> {os.path.basename(output_path)}")
+            exported.append(output_path)
+    return exported
+
+if __name__ == "__main__":
+    # Usage: python compiled_prophet.py models/line5 [models/line4 ...]
+    for model_dir in sys.argv[1:] or [os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "line5")]:
+        export_models(model_dir)
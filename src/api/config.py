@@ -9,6 +9,50 @@ class Config:
     DB_USER = os.getenv('DB_USER', 'root')
     DB_PASSWORD = os.getenv('DB_PASSWORD', '')
     DB_NAME = os.getenv('DB_NAME', 'rakusensdatabase')
+
+    # Connection pool configuration
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 5))  # seconds to wait for a free connection
+    DB_POOL_RECYCLE = float(os.getenv('DB_POOL_RECYCLE', 300))  # seconds a connection may sit idle
+    DB_POOL_PING = os.getenv('DB_POOL_PING', 'true').lower() == 'true'
+
+    # Historical record counts: interpolated estimates below this are re-counted exactly
+    COUNT_EXACT_THRESHOLD = int(os.getenv('COUNT_EXACT_THRESHOLD', 10000))
+
+    # Event log writer: batched writes happen off the request thread
+    LOG_BATCHED = os.getenv('LOG_BATCHED', 'true').lower() == 'true'
+    LOG_MAX_PENDING = int(os.getenv('LOG_MAX_PENDING', 10000))
+    LOG_BATCH_SIZE = int(os.getenv('LOG_BATCH_SIZE', 200))
+    LOG_FLUSH_INTERVAL = float(os.getenv('LOG_FLUSH_INTERVAL', 1.0))  # seconds
+    LOG_OVERFLOW = os.getenv('LOG_OVERFLOW', 'drop')  # block, drop or sample
+
+    # Simulator: tick interval in seconds, ticks per transaction, and extra virtual
+    # lines copied from a template line for load tests. SIM_INTERVAL has a 1 second
+    # floor because timestamps have second precision, so raise the write rate with
+    # SIM_VIRTUAL_LINES instead: each line writes one row per tick, giving
+    # (lines + SIM_VIRTUAL_LINES) / SIM_INTERVAL rows per second. SIM_BATCH_TICKS
+    # commits that many ticks per transaction, which keeps high rates sustainable
+    SIM_INTERVAL = float(os.getenv('SIM_INTERVAL', 30))
+    SIM_BATCH_TICKS = int(os.getenv('SIM_BATCH_TICKS', 1))
+    SIM_VIRTUAL_LINES = int(os.getenv('SIM_VIRTUAL_LINES', 0))
+    SIM_VIRTUAL_TEMPLATE = os.getenv('SIM_VIRTUAL_TEMPLATE', 'line5')
+    SIM_SEED = int(os.getenv('SIM_SEED')) if os.getenv('SIM_SEED') else None  # fixed seed for reproducible runs
+
+    # CSV replay: files are only read from REPLAY_DIR, CHUNK_SIZE rows at a time,
+    # and written at most BATCH_SIZE rows per transaction
+    REPLAY_DIR = os.getenv('REPLAY_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'replays'))
+    REPLAY_CHUNK_SIZE = int(os.getenv('REPLAY_CHUNK_SIZE', 10000))
+    REPLAY_BATCH_SIZE = int(os.getenv('REPLAY_BATCH_SIZE', 500))
+
+    # Seconds a cached latest reading is served before re-reading the table, so rows
+    # written by other processes show up; defaults to one ingest commit interval
+    READING_CACHE_TTL = float(os.getenv('READING_CACHE_TTL', SIM_INTERVAL * SIM_BATCH_TICKS))
+
+    # Seconds cached table columns stay valid without an explicit invalidation
+    SCHEMA_CACHE_TTL = float(os.getenv('SCHEMA_CACHE_TTL', 300))
+
+    # Rows per fetchmany from the streaming historical export's single unbuffered query
+    EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', 5000))
     
     # Flask configuration
     SECRET_KEY = os.getenv('SECRET_KEY', 'your-secret-key')
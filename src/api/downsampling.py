@@ -0,0 +1,64 @@
+from datetime import datetime
+import numpy as np
+
+EPOCH = datetime(1970, 1, 1)
+
+def lttb(x, y, points):
+    """Indices kept by Largest-Triangle-Three-Buckets; x must be ascending"""
+    n = len(x)
+    points = max(int(points), 3)
+    if n <= points:
+        return np.arange(n)
+
+    # points - 2 buckets over the interior, the first and last points are always kept
+    edges = np.append(np.linspace(1, n - 1, points - 1).astype(np.int64), n)
+    selected = np.empty(points, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(points - 2):
+        start, stop = edges[i], edges[i + 1]
+        next_x = x[edges[i + 1]:edges[i + 2]].mean()
+        next_y = y[edges[i + 1]:edges[i + 2]].mean()
+        # Keep the point forming the largest triangle with the last kept point and the next bucket's centroid
+        areas = np.abs((x[a] - next_x) * (y[start:stop] - y[a]) - (x[a] - x[start:stop]) * (next_y - y[a]))
+        a = start + int(np.argmax(areas))
+        selected[i + 1] = a
+    return selected
+
+def minmax(x, y, points):
+    """Indices of the minimum and maximum of each of points / 2 equal-count buckets"""
+    n = len(x)
+    buckets = max(int(points) // 2, 1)
+    if n <= points:
+        return np.arange(n)
+
+    bucket = np.arange(n) * buckets // n
+    # Sorting by (bucket, value) puts each bucket's min first and its max last
+    order = np.lexsort((y, bucket))
+    firsts = np.searchsorted(bucket[order], np.arange(buckets))
+    lasts = np.append(firsts[1:], n) - 1
+    return np.unique(np.concatenate([order[firsts], order[lasts], [0, n - 1]]))
+
+DOWNSAMPLERS = {"lttb": lttb, "minmax": minmax}
+
+def downsample(timestamps, columns, points, method="lttb"):
+    """Sorted row indices that reduce every column to about `points` points
+
+    timestamps must be ascending. Each column is downsampled on its non-null
+    values and the kept rows are merged, so a row survives if any column needs it.
+    """
+    n = len(timestamps)
+    if n <= points:
+        return np.arange(n)
+
+    # Building the arrays with fromiter is several times faster than asarray on datetimes
+    x = np.fromiter(((t - EPOCH).total_seconds() for t in timestamps), dtype=np.float64, count=n)
+    keep = []
+    for column in columns:
+        y = np.fromiter((np.nan if v is None else v for v in column), dtype=np.float64, count=n)
+        valid = np.flatnonzero(~np.isnan(y))
+        if len(valid):
+            keep.append(valid[DOWNSAMPLERS[method](x[valid], y[valid], points)])
+    if not keep:
+        return np.unique(np.linspace(0, n - 1, points).astype(np.int64))
+    return np.unique(np.concatenate(keep))
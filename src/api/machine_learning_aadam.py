@@ -1,17 +1,28 @@
 import os
+import atexit
 import pandas as pd
 import joblib
 import mysql.connector
 from flask import Flask, jsonify
 from flask_cors import CORS
 from datetime import datetime, timedelta
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import threading
+import queue
+import uuid
 import time
+from compiled_prophet import CompiledProphet, compiled_path
+from bulk_load import load_data_infile
 
 class DatabaseManager:
     """Handles all database operations"""
     
-    def __init__(self, config):
+    def __init__(self, config, batch_size=1000, load_data_infile=False):
         self.config = config
+        self.batch_size = batch_size
+        self.load_data_infile = load_data_infile
     
     def get_connection(self):
         """Establish connection to MySQL database"""
@@ -21,7 +32,7 @@ class DatabaseManager:
             print(f"DB Connection Error: {err}")
             return None
     
-    def setup_forecast_table(self, conn, line):
+    def setup_forecast_table(self, conn, line, truncate=True):
         """Create or clear forecast table for a line"""
         cursor = conn.cursor()
         table_name = f"forecasted{line}"
@@ -31,9 +42,10 @@ class DatabaseManager:
         exists = cursor.fetchone()
         
         if exists:
-            # Clear existing table
-            cursor.execute(f"TRUNCATE TABLE {table_name}")
-            print(f"Cleared existing table: {table_name}")
+            if truncate:
+                # Clear existing table
+                cursor.execute(f"TRUNCATE TABLE {table_name}")
+                print(f"Cleared existing table: {table_name}")
         else:
             # Create new table
             cursor.execute(f"""
@@ -53,6 +65,41 @@ class DatabaseManager:
         conn.commit()
         cursor.close()
     
+    def get_last_forecast_times(self, conn, line):
+        """Return the latest stored forecast_time per sensor for a line"""
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                f"SELECT sensor, MAX(forecast_time) FROM forecasted{line} GROUP BY sensor"
+            )
+            return {sensor: last_time for sensor, last_time in cursor.fetchall()}
+        except mysql.connector.Error as err:
+            # No table yet means nothing has been forecast
+            print(f"Could not read last forecasts for {line}: {err}")
+            return {}
+        finally:
+            cursor.close()
+    
+    def expire_forecasts(self, conn, line, start, end):
+        """Delete forecasts that fall outside the current horizon"""
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                f"DELETE FROM forecasted{line} WHERE forecast_time < %s OR forecast_time > %s",
+                (start, end)
+            )
+            expired = cursor.rowcount
+            conn.commit()
+            if expired:
+                print(f"Expired {expired} stale forecasts from forecasted{line}")
+            return expired
+        except mysql.connector.Error as err:
+            conn.rollback()
+            print(f"Database delete error: {err}")
+            return 0
+        finally:
+            cursor.close()
+    
     def store_forecasts(self, conn, line, sensor, timestamp, forecast):
         """Store forecast in database"""
         cursor = conn.cursor()
@@ -69,12 +116,118 @@ class DatabaseManager:
             print(f"Database insert error: {err}")
         finally:
             cursor.close()
+    
+    def store_forecast_frame(self, conn, line, sensor, forecast):
+        """Store a sensor's whole forecast horizon in one transaction"""
+        return self.store_line_forecasts(conn, line, forecast.assign(sensor=sensor))
+    
+    def store_line_forecasts(self, conn, line, forecasts, upsert=False):
+        """Bulk store a forecast frame (sensor, ds, yhat, yhat_lower, yhat_upper) in one transaction
+        
+        With upsert, rows that already exist for (sensor, forecast_time) are updated in place.
+        """
+        start_time = time.time()
+        rows = list(zip(
+            forecasts['sensor'].tolist(),
+            [ts.to_pydatetime() for ts in pd.to_datetime(forecasts['ds'])],
+            forecasts['yhat'].tolist(),
+            forecasts['yhat_lower'].tolist(),
+            forecasts['yhat_upper'].tolist()
+        ))
+        stored = 0
+        cursor = conn.cursor()
+        try:
+            if self.load_data_infile:
+                self._load_data_infile(cursor, line, rows, upsert)
+            else:
+                for i in range(0, len(rows), self.batch_size):
+                    self._insert_batch(cursor, line, rows[i:i + self.batch_size], upsert)
+            conn.commit()
+            stored = len(rows)
+        except (mysql.connector.Error, OSError) as err:
+            conn.rollback()
+            print(f"Database insert error: {err}")
+        finally:
+            cursor.close()
+        
+        elapsed = time.time() - start_time
+        rate = stored / elapsed if elapsed > 0 else float(stored)
+        print(f"Stored {stored} forecasts in forecasted{line} ({rate:.0f} rows/s)")
+        return {"rows": stored, "seconds": elapsed, "rows_per_second": rate}
+    
+    def _insert_batch(self, cursor, line, batch, upsert=False):
+        """Insert a batch of forecast rows with a single multi-row INSERT"""
+        placeholders = ", ".join(["(%s, %s, %s, %s, %s)"] * len(batch))
+        params = [value for row in batch for value in row]
+        query = (
+            f"INSERT INTO forecasted{line} "
+            "(sensor, forecast_time, forecast_value, lower_bound, upper_bound) "
+            f"VALUES {placeholders}"
+        )
+        if upsert:
+            query += (
+                " ON DUPLICATE KEY UPDATE forecast_value = VALUES(forecast_value), "
+                "lower_bound = VALUES(lower_bound), upper_bound = VALUES(upper_bound)"
+            )
+        cursor.execute(query, params)
+    
+    def _load_data_infile(self, cursor, line, rows, upsert=False):
+        """Stream forecast rows through a temporary CSV and LOAD DATA LOCAL INFILE"""
+        load_data_infile(
+            cursor, f"forecasted{line}",
+            ["sensor", "forecast_time", "forecast_value", "lower_bound", "upper_bound"],
+            ((sensor, ts.strftime("%Y-%m-%d %H:%M:%S"), yhat, lower, upper) for sensor, ts, yhat, lower, upper in rows),
+            replace=upsert
+        )
+
+class ModelRegistry:
+    """Keeps loaded Prophet models resident, bounded by an LRU limit"""
+    
+    def __init__(self, max_models=64):
+        self.max_models = max_models
+        self._models = OrderedDict()  # model_path -> (mtime, model)
+        self._lock = threading.Lock()
+    
+    def get(self, model_path):
+        """Return the model at model_path, reloading it if the file has changed"""
+        try:
+            mtime = os.path.getmtime(model_path)
+        except OSError:
+            mtime = None
+        
+        with self._lock:
+            cached = self._models.get(model_path)
+            if cached is not None and cached[0] == mtime:
+                self._models.move_to_end(model_path)
+                return cached[1]
+        
+        if model_path.endswith(".npz"):
+            model = CompiledProphet.load(model_path)
+        else:
+            model = joblib.load(model_path)
+        
+        with self._lock:
+            self._models[model_path] = (mtime, model)
+            self._models.move_to_end(model_path)
+            while len(self._models) > self.max_models:
+                self._models.popitem(last=False)
+        return model
+    
+    def clear(self):
+        """Drop all resident models"""
+        with self._lock:
+            self._models.clear()
+    
+    def __len__(self):
+        return len(self._models)
 
 class ForecastModel:
     """Handles model loading and forecasting"""
     
-    def __init__(self, script_dir):
+    def __init__(self, script_dir, registry=None, compiled=False):
         self.script_dir = script_dir
+        self.registry = registry if registry is not None else ModelRegistry()
+        self.compiled = compiled  # prefer exported .npz models over pickled Prophet
     
     def detect_sensors(self, line):
         """Detect available sensor models for a line"""
@@ -87,32 +240,111 @@ class ForecastModel:
                     sensors.append(f"r{sensor_num}")
         return sorted(sensors)
     
+    def model_path(self, line, sensor):
+        """Path of the model for a line's sensor, the compiled artifact when enabled and exported"""
+        model_path = os.path.join(self.script_dir, "models", line, f"prophet_{sensor}.pkl")
+        if self.compiled and os.path.exists(compiled_path(model_path)):
+            return compiled_path(model_path)
+        return model_path
+    
     def load_model_and_forecast(self, model_path, timestamp):
         """Load a Prophet model and forecast for a given timestamp"""
         try:
-            model = joblib.load(model_path)
+            model = self.registry.get(model_path)
             future_df = pd.DataFrame({"ds": [timestamp]})
             forecast = model.predict(future_df)
             return forecast[["yhat", "yhat_lower", "yhat_upper"]].iloc[0]
         except Exception as e:
             print(f"Forecast error for {model_path}: {str(e)}")
             return None
+    
+    def forecast_horizon(self, model_path, timestamps):
+        """Forecast every timestamp of the horizon with a single predict call"""
+        try:
+            model = self.registry.get(model_path)
+            future_df = pd.DataFrame({"ds": timestamps})
+            forecast = model.predict(future_df)
+            return forecast[["ds", "yhat", "yhat_lower", "yhat_upper"]]
+        except Exception as e:
+            print(f"Forecast error for {model_path}: {str(e)}")
+            return None
+
+def pending_timestamps(timestamps, last_time):
+    """Timestamps of the horizon that come after the last stored forecast"""
+    if last_time is None:
+        return timestamps
+    return [timestamp for timestamp in timestamps if timestamp > last_time]
+
+def forecast_sensor(script_dir, line, sensor, timestamps, compiled=False):
+    """Process pool work unit: forecast one sensor's horizon in a worker process"""
+    # model_registry is per process, so each worker keeps its own models resident
+    forecast_model = ForecastModel(script_dir, model_registry, compiled)
+    forecast = forecast_model.forecast_horizon(forecast_model.model_path(line, sensor), timestamps)
+    if forecast is None:
+        return None
+    return forecast.assign(sensor=sensor)
 
 class ForecastGenerator:
     """Main class that orchestrates the forecasting process"""
     
-    def __init__(self, db_config, script_dir, start_time, interval, duration):
-        self.db_manager = DatabaseManager(db_config)
-        self.forecast_model = ForecastModel(script_dir)
+    def __init__(self, db_config, script_dir, start_time, interval, duration, registry=None,
+                 batch_size=1000, load_data_infile=False, parallel=False, workers=None,
+                 incremental=False, compiled=False):
+        self.db_manager = DatabaseManager(db_config, batch_size, load_data_infile)
+        self.forecast_model = ForecastModel(script_dir, registry, compiled)
         self.start_time = start_time
         self.interval = interval
         self.duration = duration
+        self.parallel = parallel
+        self.workers = workers  # None uses one worker per core
+        self.incremental = incremental  # only forecast beyond the last stored forecast_time
+        self.lines = ["line4", "line5"]
+        self._executor = None
+        self._executor_lock = threading.Lock()
     
     def generate_timestamps(self):
         """Generate all timestamps for forecasting"""
         return [self.start_time + i * self.interval 
                for i in range(int(self.duration / self.interval) + 1)]
     
+    def last_forecast_times(self, line):
+        """Latest stored forecast per sensor, or nothing when rebuilding from scratch"""
+        if not self.incremental:
+            return {}
+        conn = self.db_manager.get_connection()
+        if not conn:
+            return {}
+        try:
+            return self.db_manager.get_last_forecast_times(conn, line)
+        finally:
+            conn.close()
+    
+    def store_line(self, line, frames):
+        """Replace a line's forecast table with the given per-sensor frames
+        
+        In incremental mode the table is kept, rows outside the current horizon
+        are expired and the new frames are upserted.
+        """
+        conn = self.db_manager.get_connection()
+        if not conn:
+            return None
+        
+        try:
+            # Setup table for this line
+            self.db_manager.setup_forecast_table(conn, line, truncate=not self.incremental)
+            if self.incremental:
+                timestamps = self.generate_timestamps()
+                self.db_manager.expire_forecasts(conn, line, timestamps[0], timestamps[-1])
+            
+            # Write the whole line in a single transaction
+            if frames:
+                return self.db_manager.store_line_forecasts(
+                    conn, line, pd.concat(frames, ignore_index=True), upsert=self.incremental
+                )
+            return None
+        finally:
+            conn.close()
+    
     def process_line(self, line):
         """Process all sensors for a single line"""
         start_time = time.time()
@@ -122,68 +354,259 @@ class ForecastGenerator:
             print(f"No sensor models found for {line}")
             return
         
-        conn = self.db_manager.get_connection()
-        if not conn:
-            return
-            
-        # Setup table for this line
-        self.db_manager.setup_forecast_table(conn, line)
-        
         timestamps = self.generate_timestamps()
+        last_times = self.last_forecast_times(line)
         print(f"\nProcessing {len(sensors)} sensors for {line}...")
         
+        frames = []
+        
         for sensor in sensors:
-            model_path = os.path.join(self.forecast_model.script_dir, "models", line, 
-                                    f"prophet_{sensor}.pkl")
-            
-            for timestamp in timestamps:
-                forecast = self.forecast_model.load_model_and_forecast(model_path, timestamp)
-                if forecast is not None:
-                    self.db_manager.store_forecasts(conn, line, sensor, timestamp, forecast)
+            pending = pending_timestamps(timestamps, last_times.get(sensor))
+            if not pending:
+                continue
+            model_path = self.forecast_model.model_path(line, sensor)
+            forecast = self.forecast_model.forecast_horizon(model_path, pending)
+            if forecast is not None:
+                frames.append(forecast.assign(sensor=sensor))
         
-        conn.close()
+        stats = self.store_line(line, frames)
         
         end_time = time.time()
         elapsed_time = end_time - start_time
         print(f"Time taken to process {line}: {elapsed_time:.2f} seconds")
+        return {"rows": stats["rows"] if stats else 0, "seconds": elapsed_time}
+    
+    def executor(self):
+        """The process pool, started on first use and kept across runs
+        
+        Each worker's model_registry lives as long as the worker, so a long-lived
+        pool keeps models resident between runs instead of reloading them all.
+        """
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                atexit.register(self.close)
+            return self._executor
+    
+    def close(self):
+        """Shut the process pool down; the next parallel run starts a new one"""
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
+            atexit.unregister(self.close)
     
-    def generate_and_store_forecasts(self):
-        """Generate forecasts for all lines and store in database"""
-        for line in ["line4", "line5"]:
-            self.process_line(line)
+    def forecast_lines_parallel(self, lines):
+        """Fan (line, sensor) work units out over a process pool, gathered per line"""
+        timestamps = self.generate_timestamps()
+        units = []
+        for line in lines:
+            last_times = self.last_forecast_times(line)
+            for sensor in self.forecast_model.detect_sensors(line):
+                pending = pending_timestamps(timestamps, last_times.get(sensor))
+                if pending:
+                    units.append((line, sensor, pending))
+        print(f"\nProcessing {len(units)} sensors across {len(lines)} lines in parallel...")
+        
+        results = {line: [] for line in lines}
+        executor = self.executor()
+        try:
+            futures = [
+                (line, executor.submit(forecast_sensor, self.forecast_model.script_dir,
+                                       line, sensor, pending, self.forecast_model.compiled))
+                for line, sensor, pending in units
+            ]
+            for line, future in futures:
+                forecast = future.result()
+                if forecast is not None:
+                    results[line].append(forecast)
+        except BrokenProcessPool:
+            # A worker died; drop the pool so the next run starts a fresh one
+            self.close()
+            raise
+        return results
+    
+    def generate_and_store_forecasts(self, progress=None):
+        """Generate forecasts for all lines and store in database
+        
+        progress, if given, is called as progress(line, status, **details)
+        as each line starts and finishes.
+        """
+        progress = progress or (lambda line, status, **details: None)
+        if self.parallel:
+            start_time = time.time()
+            for line in self.lines:
+                progress(line, "running")
+            results = self.forecast_lines_parallel(self.lines)
+            
+            # Predictions run in the pool; a single writer stores them line by line
+            for line, frames in results.items():
+                if not frames and not self.incremental:
+                    print(f"No forecasts produced for {line}")
+                    progress(line, "skipped")
+                    continue
+                stats = self.store_line(line, frames)
+                progress(line, "done", rows=stats["rows"] if stats else 0,
+                         seconds=time.time() - start_time)
+            print(f"Time taken to process all lines: {time.time() - start_time:.2f} seconds")
+        else:
+            for line in self.lines:
+                progress(line, "running")
+                result = self.process_line(line)
+                if result is None:
+                    progress(line, "skipped")
+                else:
+                    progress(line, "done", **result)
         print("\nForecast generation complete!")
 
+class ForecastJobQueue:
+    """Runs forecast generation on a background worker, one job at a time"""
+    
+    ACTIVE = ("queued", "running")
+    
+    def __init__(self, generator, max_history=20):
+        self.generator = generator
+        self.max_history = max_history
+        self.jobs = OrderedDict()  # job_id -> job, oldest first
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+    
+    def submit(self):
+        """Enqueue a forecast run, coalescing into a job that is already queued or running"""
+        with self._lock:
+            for job in self.jobs.values():
+                if job["status"] in self.ACTIVE:
+                    return job, True
+            
+            job = {
+                "job_id": uuid.uuid4().hex,
+                "status": "queued",
+                "submitted_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "started_at": None,
+                "finished_at": None,
+                "seconds": None,
+                "progress": 0.0,
+                "lines": {line: {"status": "pending"} for line in self.generator.lines},
+                "error": None
+            }
+            self.jobs[job["job_id"]] = job
+            self._trim_history()
+            self._start_worker()
+        self._queue.put(job["job_id"])
+        return job, False
+    
+    def get(self, job_id):
+        """Return a snapshot of a job, or None if it is unknown"""
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            return {**job, "lines": {line: dict(info) for line, info in job["lines"].items()}}
+    
+    def _start_worker(self):
+        if not self._worker or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, daemon=True)
+            self._worker.start()
+    
+    def _trim_history(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job["status"] not in self.ACTIVE]
+        for job_id in finished[:max(0, len(self.jobs) - self.max_history)]:
+            del self.jobs[job_id]
+    
+    def _run(self):
+        while True:
+            job_id = self._queue.get()
+            with self._lock:
+                job = self.jobs[job_id]
+                job["status"] = "running"
+                job["started_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            start_time = time.time()
+            
+            def progress(line, status, **details):
+                with self._lock:
+                    job["lines"][line] = {"status": status, **details}
+                    finished = sum(1 for info in job["lines"].values()
+                                   if info["status"] in ("done", "skipped"))
+                    job["progress"] = finished / len(job["lines"])
+            
+            try:
+                self.generator.generate_and_store_forecasts(progress=progress)
+                status, error = "completed", None
+            except Exception as e:
+                print(f"Forecast job {job_id} failed: {str(e)}")
+                status, error = "failed", str(e)
+            
+            with self._lock:
+                job["status"] = status
+                job["error"] = error
+                job["finished_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                job["seconds"] = time.time() - start_time
+            self._queue.task_done()
+
 # Configuration constants
+FORECAST_BATCH_SIZE = 1000  # rows per multi-row INSERT
+FORECAST_LOAD_DATA_INFILE = False  # use LOAD DATA LOCAL INFILE instead of INSERTs
+FORECAST_PARALLEL = False  # predict sensors in a process pool
+FORECAST_WORKERS = None  # pool size, None for one worker per core
+FORECAST_INCREMENTAL = False  # upsert only new horizon instead of truncating
+FORECAST_COMPILED = False  # use NumPy models exported by compiled_prophet.py when present
+
 DB_CONFIG = {
     "host": "localhost",
     "user": "root",
     "password": "",
-    "database": "rakusensdatabase"
+    "database": "rakusensdatabase",
+    "allow_local_infile": FORECAST_LOAD_DATA_INFILE
 }
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 START_TIME = datetime(2025, 4, 7, 14, 28, 0)
 INTERVAL = timedelta(seconds=30)
 DURATION = timedelta(hours=0.05)
+MAX_RESIDENT_MODELS = 64
 
 # Flask App Setup
 app = Flask(__name__)
 CORS(app)
 
+# Models stay resident between /forecast calls
+model_registry = ModelRegistry(max_models=MAX_RESIDENT_MODELS)
+
 # Create forecast generator instance
 forecast_generator = ForecastGenerator(
     db_config=DB_CONFIG,
     script_dir=SCRIPT_DIR,
     start_time=START_TIME,
     interval=INTERVAL,
-    duration=DURATION
+    duration=DURATION,
+    registry=model_registry,
+    batch_size=FORECAST_BATCH_SIZE,
+    load_data_infile=FORECAST_LOAD_DATA_INFILE,
+    parallel=FORECAST_PARALLEL,
+    workers=FORECAST_WORKERS,
+    incremental=FORECAST_INCREMENTAL,
+    compiled=FORECAST_COMPILED
 )
 
-@app.route('/forecast', methods=['GET'])
+# Forecast runs execute on a background worker instead of inside the request
+forecast_jobs = ForecastJobQueue(forecast_generator)
+
+@app.route('/forecast', methods=['GET', 'POST'])
 def get_forecast():
-    """API endpoint to trigger forecast generation"""
-    forecast_generator.generate_and_store_forecasts()
-    return jsonify({"status": "success", "message": "Forecasts generated and stored"})
+    """API endpoint to queue forecast generation"""
+    job, coalesced = forecast_jobs.submit()
+    message = "Forecast already in progress" if coalesced else "Forecast queued"
+    return jsonify({"status": "accepted", "message": message, "job_id": job["job_id"],
+                    "coalesced": coalesced}), 202
+
+@app.route('/forecast/<job_id>', methods=['GET'])
+def get_forecast_status(job_id):
+    """API endpoint to report a forecast job's status, progress and per-line timing"""
+    job = forecast_jobs.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Unknown forecast job"}), 404
+    return jsonify(job)
 
 if __name__ == "__main__":
     forecast_generator.generate_and_store_forecasts()
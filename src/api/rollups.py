@@ -0,0 +1,27 @@
+import sys
+import time
+from app import RollupManager
+
+# Rollups are filled from a scan of every raw row, so building them is a setup
+# step run from here, never from ingest or a request. Run it with the API
+# stopped, since rows ingested during the build would be missing from it, and
+# rerun it whenever the API reports that a line's rollups miss rows.
+
+if __name__ == "__main__":
+    # Usage: python rollups.py line4 [line5 ...]
+    import mysql.connector
+    from config import Config
+    connection = mysql.connector.connect(
+        host=Config.DB_HOST, user=Config.DB_USER, password=Config.DB_PASSWORD, database=Config.DB_NAME
+    )
+    try:
+        cursor = connection.cursor()
+        rollups = RollupManager(None)
+        for line in sys.argv[1:] or ["line4", "line5"]:
+            started = time.time()
+            rollups.build(cursor, line)
+            connection.commit()
+            print(f"{line}: rollups built in {time.time() - started:.1f}s")
+        cursor.close()
+    finally:
+        connection.close()
@@ -0,0 +1,113 @@
+import os
+import sys
+from datetime import date, timedelta
+
+# Per-line, per-day Arrow IPC partitions of the sensor tables, for training code.
+# Arrow IPC files are uncompressed on disk, so read_line can memory-map them and
+# build columns without copying or parsing. pyarrow is only needed here, so it is
+# imported lazily and the API runs without it.
+ARCHIVE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "archive")
+
+def partition_path(archive_dir, line, day):
+    return os.path.join(archive_dir, line, f"{day.isoformat()}.arrow")
+
+def archived_days(archive_dir, line):
+    """Days that already have a partition, oldest first"""
+    line_dir = os.path.join(archive_dir, line)
+    if not os.path.isdir(line_dir):
+        return []
+    return sorted(
+        date.fromisoformat(file[:-len(".arrow")]) for file in os.listdir(line_dir) if file.endswith(".arrow")
+    )
+
+def rows_to_table(columns, rows):
+    """Arrow table from cursor rows: timestamp, timezone and float sensor columns"""
+    import pyarrow as pa
+    arrays = []
+    for i, name in enumerate(columns):
+        values = [row[i] for row in rows]
+        if name == "timestamp":
+            arrays.append(pa.array(values, type=pa.timestamp("s")))
+        elif name == "timezone":
+            arrays.append(pa.array(values, type=pa.string()))
+        else:
+            arrays.append(pa.array([None if v is None else float(v) for v in values], type=pa.float64()))
+    return pa.table(arrays, names=columns)
+
+def write_partition(table, path):
+    """Write one partition atomically, so readers never see a half-written file"""
+    import pyarrow as pa
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = path + ".tmp"
+    with pa.OSFile(temp_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(temp_path, path)
+
+def export_line(connection, line, archive_dir=ARCHIVE_DIR, start=None, until=None):
+    """Archive each complete day of a line that has no partition yet
+
+    Picks up the day after the newest partition, or the first day in the table.
+    Pass start to re-export from a given day, e.g. after a backfill. Days from
+    `until` (today by default) on are still being written and are left for the
+    next run. Returns the paths written.
+    """
+    until = until or date.today()
+    cursor = connection.cursor()
+    try:
+        if start is None:
+            done = archived_days(archive_dir, line)
+            if done:
+                start = done[-1] + timedelta(days=1)
+            else:
+                cursor.execute(f"SELECT MIN(timestamp) FROM {line}")
+                first = cursor.fetchone()[0]
+                if first is None:
+                    return []
+                start = first.date()
+
+        written = []
+        day = start
+        while day < until:
+            cursor.execute(
+                f"SELECT * FROM {line} WHERE timestamp >= %s AND timestamp < %s ORDER BY timestamp",
+                (day, day + timedelta(days=1))
+            )
+            rows = cursor.fetchall()
+            if rows:
+                columns = [column[0] for column in cursor.description]
+                path = partition_path(archive_dir, line, day)
+                write_partition(rows_to_table(columns, rows), path)
+                written.append(path)
+            day += timedelta(days=1)
+        return written
+    finally:
+        cursor.close()
+
+def read_line(line, archive_dir=ARCHIVE_DIR, start=None, end=None, columns=None):
+    """Load archived days [start, end) of a line into a DataFrame via memory-mapped partitions"""
+    import pyarrow as pa
+    tables = []
+    for day in archived_days(archive_dir, line):
+        if (start and day < start) or (end and day >= end):
+            continue
+        source = pa.memory_map(partition_path(archive_dir, line, day), "r")
+        table = pa.ipc.open_file(source).read_all()
+        tables.append(table.select(columns) if columns else table)
+    if not tables:
+        raise FileNotFoundError(f"No archived partitions for {line} in {archive_dir}")
+    # Sensors added later only appear in newer partitions; older rows get nulls
+    return pa.concat_tables(tables, promote_options="default").to_pandas()
+
+if __name__ == "__main__":
+    # Usage: python sensor_archive.py line4 [line5 ...]
+    import mysql.connector
+    from config import Config
+    connection = mysql.connector.connect(
+        host=Config.DB_HOST, user=Config.DB_USER, password=Config.DB_PASSWORD, database=Config.DB_NAME
+    )
+    try:
+        for line in sys.argv[1:] or ["line4", "line5"]:
+            for path in export_line(connection, line):
+                print(f"Archived {line} -> {os.path.relpath(path, ARCHIVE_DIR)}")
+    finally:
+        connection.close()
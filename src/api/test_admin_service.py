@@ -100,6 +100,18 @@ class TestAdminService(unittest.TestCase):
             type='WARNING', log_level='admin'
         )
 
+    def test_delete_sensor_invalidates_caches(self):
+        """Test deleting a sensor drops the cached columns and live reading for its table"""
+        self.mock_db.get_connection().cursor().fetchone.return_value = {'Field': 'r01'}
+        self.admin_service.schema_cache = MagicMock()
+        self.admin_service.reading_cache = MagicMock()
+
+        response = self.admin_service.delete_sensor({'sensorName': 'r01', 'tableID': 'line4'})
+
+        self.assertTrue(response['success'])
+        self.admin_service.schema_cache.invalidate.assert_called_once_with('line4')
+        self.admin_service.reading_cache.invalidate.assert_called_once_with('line4')
+
 
     def test_get_table_headers(self):
         """Test retrieval of table headers"""
@@ -1,4 +1,5 @@
 import unittest
+import numpy as np
 from unittest.mock import patch, MagicMock, call
 from datetime import datetime
 from flask import json
@@ -763,16 +764,14 @@ class TestSimulationService(unittest.TestCase):
         # Assert that the thread was started
         mock_thread.return_value.start.assert_called_once()
 
-        # Now, test stop (it should not explicitly stop the thread as it's a daemon thread)
-        # Call stop and check if it doesn't raise an error or do anything specific (since it's a daemon thread)
+        # stop signals the worker and waits for it to exit
+        mock_thread.return_value.is_alive.return_value = False
         self.sim_service.stop()
+        mock_thread.return_value.join.assert_called_once_with(None)
+        self.assertTrue(self.sim_service._stop.is_set())
 
-        # Since the `stop()` method doesn't explicitly stop the thread in this implementation,
-        # there's no direct assertion here, but we can ensure it runs without errors.
-
-    @patch('time.localtime')
-    @patch.object(SimulationService, 'generate_sensor_reading')  # Mock generate_sensor_reading to return fixed values
-    def test_insert_line_readings(self, mock_generate_reading, mock_localtime):
+    @patch.object(SimulationService, 'generate_readings')  # Mock generate_readings to return fixed values
+    def test_insert_line_readings(self, mock_generate_readings):
         """Test database insertion of readings"""
 
         # Define sensor ranges directly in the method
@@ -781,26 +780,22 @@ class TestSimulationService(unittest.TestCase):
             "r02": {"avg": 264.81, "min": 18.00, "max": 526.00}
         }
 
-        # Set the mocked current time and timezone
-        mock_localtime.return_value.tm_mon = 5  # May (for timezone offset +01)
         current_timestamp = datetime.now().replace(microsecond=0).strftime('%Y-%m-%d %H:%M:%S')
         timezone_offset = "+01"  # Simulating the timezone offset for May
 
         # Mock the sensor readings to return fixed values for r01 and r02
-        mock_generate_reading.side_effect = [130.45, 267.87]  # These are the expected values for r01 and r02
+        mock_generate_readings.return_value = np.array([[130.45, 267.87]])
 
-        # Mock the database connection and cursor
-        mock_connection = MagicMock()  # Mock the real database connection
-        mock_cursor = MagicMock()  # Mock the cursor
-        mock_connection.cursor.return_value = mock_cursor
-        self.mock_db.get_connection.return_value = mock_connection  # Mock the database manager to return the mock connection
+        # Mock the cursor; SHOW COLUMNS makes both sensors valid
+        mock_cursor = MagicMock()
+        mock_cursor.fetchall.return_value = [('timestamp',), ('timezone',), ('r01',), ('r02',)]
 
         # Define the sensors for line4 (as an example)
         sensors = ['r01', 'r02']
 
-        # Call insert_line_readings
-        self.sim_service.insert_line_readings(
-            mock_cursor, 'line4', sensors, sensor_ranges_line4, current_timestamp, timezone_offset
+        # Insert one tick of readings
+        self.sim_service.insert_line_batch(
+            mock_cursor, 'line4', sensors, sensor_ranges_line4, [(current_timestamp, timezone_offset)]
         )
 
         # Expected query to be executed (strip out extra indentation/spacing)
@@ -815,23 +810,12 @@ class TestSimulationService(unittest.TestCase):
             # Remove extra spaces and normalize the string
             return " ".join(query.strip().split())
 
-        # Normalize the expected and actual queries
-        normalized_expected_query = normalize_query(expected_query)
-        normalized_actual_query = normalize_query(mock_cursor.execute.call_args[0][0])
-
         # Ensure the query is executed with the correct parameters
-        self.assertEqual(normalized_actual_query, normalized_expected_query)
-
-        # Ensure the parameters passed to execute() match the expected values
-        self.assertEqual(mock_cursor.execute.call_args[0][1], 
-                         [current_timestamp, timezone_offset, 130.45, 267.87])
-
-        # Debugging: Print to check if execute() was called
-        print("Query executed:", mock_cursor.execute.call_args[0][0])
-        print("Parameters:", mock_cursor.execute.call_args[0][1])
+        self.assertEqual(normalize_query(mock_cursor.executemany.call_args[0][0]), normalize_query(expected_query))
 
-        # Ensure commit was called to persist the data
-        mock_connection.commit.assert_called_once()  # Ensure commit was called on the actual connection object
+        # Ensure the rows passed to executemany() match the expected values
+        self.assertEqual(mock_cursor.executemany.call_args[0][1],
+                         [[current_timestamp, timezone_offset, 130.45, 267.87]])
 
     def test_reading_range_validation(self):
         """Test sensor readings stay within defined ranges"""
@@ -865,7 +849,8 @@ class TestSimulationService(unittest.TestCase):
 
 class TestFlaskEndpoints(unittest.TestCase):
     def setUp(self):
-        self.app = FlaskApp().app
+        self.flask_app = FlaskApp()
+        self.app = self.flask_app.app
         self.app.testing = True
         self.client = self.app.test_client()
         
@@ -899,6 +884,7 @@ class TestFlaskEndpoints(unittest.TestCase):
 
     def tearDown(self):
         self.db_patcher.stop()
+        self.flask_app.log_service.close()
 
 class TestLogService(unittest.TestCase):
 
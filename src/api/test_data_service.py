@@ -1,11 +1,17 @@
 import unittest
 from unittest.mock import MagicMock, patch
 from datetime import datetime
-from app import DataService, LogService
+from app import DataService, LogService, LatestReadingCache, RecordCounter, RollupManager, SchemaCache
 from flask import json
 import re
 from threading import Thread 
 from werkzeug.security import generate_password_hash
+from datetime import timedelta
+from werkzeug.datastructures import MultiDict
+import numpy as np
+import time
+from downsampling import lttb, minmax
+from timestamp_indexes import create_timestamp_index
 
 class TestDataService(unittest.TestCase):
     def setUp(self):
@@ -37,6 +43,421 @@ class TestDataService(unittest.TestCase):
         self.assertEqual(len(response['data']), 1)
 
 
+    def test_historical_data_keyset_next_page(self):
+        """Test next-page requests seek from the cursor instead of paging with a deep OFFSET"""
+        cursor_mock = MagicMock()
+        cursor_mock.fetchall.return_value = [
+            {'timestamp': datetime(2025, 4, 7, 14, 29, 30), 'timezone': '+01', 'r01': 1.0},
+            {'timestamp': datetime(2025, 4, 7, 14, 29, 0), 'timezone': '+01', 'r01': 2.0}
+        ]
+        self.mock_db.get_connection().cursor.return_value = cursor_mock
+        self.data_service.get_table_columns = MagicMock(return_value=['timestamp', 'timezone', 'r01'])
+
+        response = self.data_service.get_historical_data('line4', {
+            'length': 2, 'cursor': '2025-04-07 14:30:00|1', 'direction': 'next'
+        })
+
+        query, params = cursor_mock.execute.call_args[0]
+        self.assertIn("timestamp <= %s ORDER BY timestamp DESC LIMIT %s OFFSET %s", query)
+        self.assertEqual(params, [datetime(2025, 4, 7, 14, 30), 2, 1])
+        self.assertEqual(response['prevCursor'], '2025-04-07 14:29:30|1')
+        self.assertEqual(response['nextCursor'], '2025-04-07 14:29:00|1')
+
+    def test_historical_data_keyset_prev_page(self):
+        """Test previous-page requests seek up from the cursor and return newest first"""
+        cursor_mock = MagicMock()
+        cursor_mock.fetchall.return_value = [
+            {'timestamp': datetime(2025, 4, 7, 14, 30, 30), 'timezone': '+01', 'r01': 1.0},
+            {'timestamp': datetime(2025, 4, 7, 14, 31, 0), 'timezone': '+01', 'r01': 2.0}
+        ]
+        self.mock_db.get_connection().cursor.return_value = cursor_mock
+        self.data_service.get_table_columns = MagicMock(return_value=['timestamp', 'timezone', 'r01'])
+
+        response = self.data_service.get_historical_data('line4', {
+            'length': 2, 'cursor': '2025-04-07 14:30:00|1', 'direction': 'prev'
+        })
+
+        query = cursor_mock.execute.call_args[0][0]
+        self.assertIn("timestamp >= %s ORDER BY timestamp ASC LIMIT %s OFFSET %s", query)
+        self.assertEqual([r['timestamp'] for r in response['data']],
+                         ['2025-04-07 14:31:00', '2025-04-07 14:30:30'])
+
+    def test_historical_data_keyset_cursor_counts_shared_timestamps(self):
+        """Test rows sharing a boundary timestamp are counted into the cursor so none are skipped"""
+        cursor_mock = MagicMock()
+        cursor_mock.fetchall.return_value = [
+            {'timestamp': datetime(2025, 4, 7, 14, 30), 'timezone': '+01', 'r01': 1.0},
+            {'timestamp': datetime(2025, 4, 7, 14, 29, 30), 'timezone': '+01', 'r01': 2.0},
+            {'timestamp': datetime(2025, 4, 7, 14, 29, 30), 'timezone': '+01', 'r01': 3.0}
+        ]
+        self.mock_db.get_connection().cursor.return_value = cursor_mock
+        self.data_service.get_table_columns = MagicMock(return_value=['timestamp', 'timezone', 'r01'])
+
+        response = self.data_service.get_historical_data('line4', {'length': 3, 'start': 0})
+
+        self.assertEqual(response['prevCursor'], '2025-04-07 14:30:00|1')
+        self.assertEqual(response['nextCursor'], '2025-04-07 14:29:30|2')
+
+    def test_historical_data_keyset_page_within_one_timestamp(self):
+        """Test a page inside a run of equal timestamps is placed within that run"""
+        cursor_mock = MagicMock()
+        same = datetime(2025, 4, 7, 14, 30)
+        cursor_mock.fetchall.return_value = [
+            {'timestamp': same, 'timezone': '+01', 'r01': 1.0},
+            {'timestamp': same, 'timezone': '+01', 'r01': 2.0}
+        ]
+        # Five rows share the timestamp
+        cursor_mock.fetchone.return_value = {'total': 5}
+        self.mock_db.get_connection().cursor.return_value = cursor_mock
+        self.data_service.get_table_columns = MagicMock(return_value=['timestamp', 'timezone', 'r01'])
+
+        response = self.data_service.get_historical_data('line4', {
+            'length': 2, 'cursor': '2025-04-07 14:30:00|1', 'direction': 'next'
+        })
+
+        # Rows 1-2 of the five: one before the page, two after it
+        self.assertEqual(response['prevCursor'], '2025-04-07 14:30:00|4')
+        self.assertEqual(response['nextCursor'], '2025-04-07 14:30:00|3')
+
+    def test_historical_data_rejects_invalid_cursor(self):
+        """Test malformed cursors are rejected before any query runs"""
+        response = self.data_service.get_historical_data('line4', {'length': 2, 'cursor': '2025-04-07 14:30:00'})
+        self.assertFalse(response['success'])
+        self.assertEqual(response['code'], 400)
+
+    def make_counter(self, buckets):
+        """RecordCounter seeded from a mocked GROUP BY hour scan"""
+        db = MagicMock()
+        db.get_connection().cursor().fetchall.return_value = buckets
+        return RecordCounter(db, exact_threshold=100)
+
+    def test_record_counter_aligned_range_is_exact(self):
+        """Test bucket-aligned ranges are answered exactly from hour and day buckets"""
+        counter = self.make_counter([
+            ('2025-04-06 23:00:00', 60), ('2025-04-07 00:00:00', 120),
+            ('2025-04-07 13:00:00', 120), ('2025-04-08 02:00:00', 120)
+        ])
+        self.assertEqual(counter.count('line4'), (420, 420, True))
+        self.assertEqual(counter.count('line4', '2025-04-06 23:00:00', '2025-04-08 00:59:59'), (420, 300, True))
+        self.assertEqual(counter.count('line4', '2025-04-07T13:00', '2025-04-07T13:59:59'), (420, 120, True))
+
+    def test_record_counter_interpolates_partial_hours(self):
+        """Test partial hours are interpolated, and small estimates defer to COUNT"""
+        counter = self.make_counter([('2025-04-07 13:00:00', 120), ('2025-04-07 14:00:00', 120)])
+        self.assertEqual(counter.count('line4', '2025-04-07 13:30:00', '2025-04-07 14:59:59'), (240, 180, False))
+        self.assertIsNone(counter.count('line4', '2025-04-07 13:30:00', '2025-04-07 13:59:59'))
+
+    def test_record_counter_counts_ingest(self):
+        """Test inserted readings update the buckets without rescanning the table"""
+        counter = self.make_counter([('2025-04-07 13:00:00', 120)])
+        counter.count('line4')
+        counter.record('line4', '2025-04-07 14:00:30')
+        self.assertEqual(counter.count('line4', '2025-04-07 14:00:00', '2025-04-07 14:59:59'), (121, 1, True))
+        counter.db_manager.get_connection().cursor().execute.assert_called_once()
+
+    def test_record_counter_keeps_ingest_during_load(self):
+        """Test rows recorded while the seeding scan runs are merged into the buckets"""
+        counter = self.make_counter([])
+
+        def scan():
+            # A batch commits and is recorded after the scan's snapshot
+            counter.record('line4', '2025-04-07 14:00:30', rows=2)
+            return [('2025-04-07 13:00:00', 120)]
+
+        counter.db_manager.get_connection().cursor().fetchall.side_effect = scan
+        counter.record('line4', '2025-04-07 12:00:00')  # before any load: picked up by the scan
+        self.assertEqual(counter.count('line4', '2025-04-07 14:00:00', '2025-04-07 14:59:59'), (122, 2, True))
+        counter.record('line4', '2025-04-07 14:01:00')
+        self.assertEqual(counter.count('line4'), (123, 123, True))
+
+    def test_record_counter_without_connection(self):
+        """Test a pool timeout makes count fall back to COUNT(*) instead of raising"""
+        db = MagicMock()
+        db.get_connection.return_value = None
+        self.assertIsNone(RecordCounter(db).count('line4'))
+
+    def test_historical_data_uses_record_counter(self):
+        """Test historical queries skip COUNT(*) when the buckets can answer"""
+        cursor_mock = MagicMock()
+        cursor_mock.fetchall.return_value = []
+        self.mock_db.get_connection().cursor.return_value = cursor_mock
+        self.data_service.get_table_columns = MagicMock(return_value=['timestamp', 'timezone', 'r01'])
+        self.data_service.record_counter = MagicMock()
+        self.data_service.record_counter.count.return_value = (5000, 1200, False)
+
+        response = self.data_service.get_historical_data('line4', {
+            'startDateTime': '2025-04-07T13:30', 'endDateTime': '2025-04-07T18:00'
+        })
+
+        self.data_service.record_counter.count.assert_called_once_with('line4', '2025-04-07T13:30', '2025-04-07T18:00')
+        self.assertEqual(cursor_mock.execute.call_count, 1)
+        self.assertNotIn("COUNT(*)", cursor_mock.execute.call_args[0][0])
+        self.assertEqual((response['recordsTotal'], response['recordsFiltered']), (5000, 1200))
+        self.assertTrue(response['recordsApproximate'])
+
+    def test_downsampling_keeps_peaks(self):
+        """Test LTTB and min/max bucketing keep the endpoints and the extreme values"""
+        x = np.arange(10000, dtype=np.float64)
+        y = np.sin(x / 500)
+        y[4321] = 50.0
+        for method in (lttb, minmax):
+            keep = method(x, y, 200)
+            self.assertLessEqual(len(keep), 202)
+            self.assertEqual((keep[0], keep[-1]), (0, 9999))
+            self.assertIn(4321, keep)
+            self.assertTrue(np.all(np.diff(keep) > 0))
+
+    def test_historical_sensor_data_points(self):
+        """Test points= downsamples sensor history and keeps it newest first"""
+        start = datetime(2025, 4, 7)
+        rows = [{'timestamp': start + timedelta(seconds=30 * i), 'value': float(i % 7)} for i in range(1000)][::-1]
+        self.mock_db.get_connection().cursor().fetchall.return_value = rows
+        self.data_service.get_table_columns = MagicMock(return_value=['timestamp', 'timezone', 'r01'])
+        self.data_service.index_checked.add('line4')
+
+        response = self.data_service.get_historical_data_sensor('line4', 'r01', MultiDict({'length': '-1', 'points': '100'}))
+
+        self.assertTrue(response['success'])
+        self.assertLessEqual(len(response['data']), 100)
+        self.assertEqual(response['data'][0]['timestamp'], '2025-04-07 08:19:30')
+        self.assertEqual(response['data'][-1]['timestamp'], '2025-04-07 00:00:00')
+        self.assertNotIn("LIMIT", self.mock_db.get_connection().cursor().execute.call_args[0][0])
+
+    def test_aggregated_data_columnar(self):
+        """Test bucketed stats come back as columns with nulls for empty buckets"""
+        start = datetime(2025, 4, 7, 6)
+        rows = [(start + timedelta(minutes=i), float(i), None if i < 5 else 1.0) for i in range(10)]
+        self.mock_db.get_connection().cursor().fetchall.return_value = rows
+        self.data_service.get_table_columns = MagicMock(return_value=['timestamp', 'timezone', 'r01', 'r02'])
+
+        response = self.data_service.get_aggregated_data('line4', MultiDict({
+            'bucket': '5m', 'sensors': 'r01,r02', 'stats': 'avg,max,p95,count',
+            'start': '2025-04-07T06:00', 'end': '2025-04-07T06:10'
+        }))
+
+        self.assertTrue(response['success'])
+        self.assertEqual(response['timestamps'], ['2025-04-07 06:00:00', '2025-04-07 06:05:00'])
+        self.assertEqual(response['data']['r01']['avg'], [2.0, 7.0])
+        self.assertEqual(response['data']['r01']['max'], [4.0, 9.0])
+        self.assertEqual(response['data']['r01']['p95'], [3.8, 8.8])
+        self.assertEqual(response['data']['r02']['avg'], [None, 1.0])
+        self.assertEqual(response['data']['r02']['count'], [0.0, 5.0])
+        query, params = self.mock_db.get_connection().cursor().execute.call_args[0]
+        self.assertIn("timestamp >= %s AND timestamp < %s ORDER BY timestamp ASC", query)
+        self.assertEqual(params, [datetime(2025, 4, 7, 6), datetime(2025, 4, 7, 6, 10)])
+
+    def test_aggregated_data_rejects_bad_input(self):
+        """Test invalid buckets, stats and sensors are rejected before querying"""
+        self.data_service.get_table_columns = MagicMock(return_value=['timestamp', 'timezone', 'r01'])
+        for args in ({'bucket': '5x'}, {'stats': 'median'}, {'sensors': 'r01,nope'},
+                     {'bucket': '1s', 'start': '2025-01-01', 'end': '2025-02-01'}):
+            response = self.data_service.get_aggregated_data('line4', MultiDict(args))
+            self.assertFalse(response['success'])
+            self.assertEqual(response['code'], 400)
+        self.mock_db.get_connection.assert_not_called()
+
+    def test_abandoned_export_discards_connection(self):
+        """Test an export closed mid-stream drops its connection instead of draining unread rows"""
+        connection = self.mock_db.get_connection.return_value
+        cursor = connection.cursor.return_value
+        cursor.fetchmany.return_value = [(datetime(2025, 4, 7, 14, 30), '+01', 130.45)]
+
+        stream = self.data_service.export_rows('line4', ['timestamp', 'timezone', 'r01'], None, None, 'csv', 1)
+        self.assertEqual(next(stream), "timestamp,timezone,r01\n")
+        self.assertEqual(next(stream), "2025-04-07 14:30:00,+01,130.45\n")
+        stream.close()
+
+        connection.discard.assert_called_once()
+        connection.close.assert_not_called()
+
+    def test_rollup_plan_picks_coarsest_level(self):
+        """Test the planner picks the widest rollup that divides the bucket and aligns with the range"""
+        rollups = RollupManager(self.mock_db)
+        self.assertEqual(rollups.plan(86400, ['avg', 'max']), 'day')
+        self.assertEqual(rollups.plan(7200, ['avg'], datetime(2025, 4, 7, 6), datetime(2025, 4, 8)), 'hour')
+        self.assertEqual(rollups.plan(3600, ['std'], datetime(2025, 4, 7, 6, 30)), 'minute')
+        self.assertIsNone(rollups.plan(300, ['avg'], datetime(2025, 4, 7, 6, 0, 30)))
+        self.assertIsNone(rollups.plan(30, ['avg']))
+        self.assertIsNone(rollups.plan(3600, ['avg', 'p95']))
+
+    def test_rollup_record_upserts_every_level(self):
+        """Test ingest folds readings into minute, hour and day buckets with one upsert each"""
+        rollups = RollupManager(self.mock_db)
+        cursor = MagicMock()
+        rollups.record(cursor, 'line4', [
+            ('2025-04-07 06:00:00', {'r01': 2.0, 'r02': None}),
+            ('2025-04-07 06:00:30', {'r01': 4.0})
+        ])
+        self.assertEqual(cursor.executemany.call_count, 3)
+        query, rows = cursor.executemany.call_args_list[2][0]
+        self.assertIn("INSERT INTO line4_rollup_minute", query)
+        self.assertIn("ON DUPLICATE KEY UPDATE", query)
+        self.assertEqual(rows, [(datetime(2025, 4, 7, 6), 'r01', 2, 6.0, 2.0, 4.0, 20.0)])
+
+    def test_rollup_ensure_only_checks_tables(self):
+        """Test ensure never builds rollups, and a line without them stays on raw rows"""
+        rollups = RollupManager(self.mock_db)
+        cursor = self.mock_db.get_connection().cursor()
+        cursor.fetchone.return_value = None
+        self.assertFalse(rollups.ensure('line4', writing=True))
+        self.assertFalse(rollups.ensure('line4', writing=True))
+        queries = [call[0][0] for call in cursor.execute.call_args_list]
+        self.assertEqual(queries, ["SHOW TABLES LIKE %s"])
+
+        cursor.fetchone.return_value = ('line5_rollup_minute',)
+        self.assertTrue(rollups.ensure('line5'))
+        self.assertTrue(rollups.ready('line5'))
+
+    def test_rollup_ensure_without_connection(self):
+        """Test a pool timeout on ingest retires the rollups, while a read just retries"""
+        rollups = RollupManager(self.mock_db)
+        self.mock_db.get_connection.return_value = None
+        self.assertFalse(rollups.ensure('line4'))
+        self.assertFalse(rollups.ensure('line5', writing=True))
+
+        cursor = MagicMock()
+        cursor.fetchone.return_value = ('line4_rollup_minute',)
+        self.mock_db.get_connection.return_value = MagicMock(cursor=MagicMock(return_value=cursor))
+        self.assertTrue(rollups.ensure('line4'))
+        self.assertFalse(rollups.ensure('line5'))
+
+    def test_rollup_build_replaces_contents(self):
+        """Test the setup build creates, clears and refills every level"""
+        rollups = RollupManager(None)
+        cursor = MagicMock()
+        cursor.fetchall.return_value = [('timestamp',), ('timezone',), ('r01',)]
+        rollups.build(cursor, 'line4')
+        queries = [call[0][0] for call in cursor.execute.call_args_list]
+        for level in ('minute', 'hour', 'day'):
+            self.assertIn(f"DELETE FROM line4_rollup_{level}", queries)
+            self.assertTrue(any(f"INSERT INTO line4_rollup_{level}" in query for query in queries))
+
+    def test_rollup_refresh_rebuilds_whole_days(self):
+        """Test a refresh clears and refills every day touched by the range"""
+        rollups = RollupManager(self.mock_db)
+        cursor = MagicMock()
+        cursor.fetchone.return_value = ('line4_rollup_minute',)
+        cursor.fetchall.return_value = [('timestamp',), ('timezone',), ('r01',)]
+
+        self.assertTrue(rollups.refresh(cursor, 'line4', datetime(2025, 4, 6, 12, 30), datetime(2025, 4, 7, 6)))
+
+        day_range = (datetime(2025, 4, 6), datetime(2025, 4, 8))
+        deletes = [call[0] for call in cursor.execute.call_args_list if call[0][0].startswith("DELETE")]
+        self.assertEqual(len(deletes), 3)
+        self.assertTrue(all(params == day_range for _, params in deletes))
+        query, params = cursor.execute.call_args_list[-1][0]
+        self.assertIn("INSERT INTO line4_rollup_day", query)
+        self.assertEqual(params[1:], day_range)
+
+        cursor.fetchone.return_value = None
+        self.assertFalse(rollups.refresh(cursor, 'line4', datetime(2025, 4, 6), datetime(2025, 4, 7)))
+
+    def test_aggregated_data_served_from_rollups(self):
+        """Test aligned aggregate queries merge rollup rows instead of scanning raw rows"""
+        self.data_service.rollups = RollupManager(self.mock_db)
+        self.data_service.rollups.ensure = MagicMock(return_value=True)
+        self.data_service.get_table_columns = MagicMock(return_value=['timestamp', 'timezone', 'r01'])
+        self.mock_db.get_connection().cursor().fetchall.return_value = [
+            (datetime(2025, 4, 7, 6), 'r01', 120, 240.0, 1.0, 3.0, 520.0),
+            (datetime(2025, 4, 7, 7), 'r01', 120, 360.0, 2.0, 4.0, 1120.0)
+        ]
+
+        response = self.data_service.get_aggregated_data('line4', MultiDict({
+            'bucket': '2h', 'stats': 'count,avg,min,max,std', 'start': '2025-04-07T06:00', 'end': '2025-04-07T08:00'
+        }))
+
+        self.assertEqual(response['source'], 'hour')
+        self.assertEqual(response['timestamps'], ['2025-04-07 06:00:00'])
+        self.assertEqual(response['data']['r01'], {'count': [240.0], 'avg': [2.5], 'min': [1.0], 'max': [4.0], 'std': [0.7638]})
+        query = self.mock_db.get_connection().cursor().execute.call_args[0][0]
+        self.assertIn("FROM line4_rollup_hour", query)
+
+    def test_prefix_range(self):
+        """Test partial date search strings become half-open ranges"""
+        self.assertEqual(DataService.prefix_range('2025'), (datetime(2025, 1, 1), datetime(2026, 1, 1)))
+        self.assertEqual(DataService.prefix_range('2025-12'), (datetime(2025, 12, 1), datetime(2026, 1, 1)))
+        self.assertEqual(DataService.prefix_range('2025-02-28'), (datetime(2025, 2, 28), datetime(2025, 3, 1)))
+        self.assertEqual(DataService.prefix_range('2025-04-07T14'), (datetime(2025, 4, 7, 14), datetime(2025, 4, 7, 15)))
+        self.assertEqual(DataService.prefix_range(' 2025-04-07 14:30 '), (datetime(2025, 4, 7, 14, 30), datetime(2025, 4, 7, 14, 31)))
+        with self.assertRaises(ValueError):
+            DataService.prefix_range('14:30')
+
+    def test_historical_sensor_filters_are_sargable(self):
+        """Test date filters are intersected into one parameterized timestamp range"""
+        cursor_mock = MagicMock()
+        cursor_mock.fetchall.return_value = []
+        self.mock_db.get_connection().cursor.return_value = cursor_mock
+        self.data_service.get_table_columns = MagicMock(return_value=['timestamp', 'timezone', 'r01'])
+        self.data_service.index_checked.add('line4')
+
+        response = self.data_service.get_historical_data_sensor('line4', 'r01', MultiDict({
+            'dateFilter': '2025-04-07', 'searchValue': '2025-04-07 14',
+            'startDateTime': '2025-04-07T14:30', 'endDateTime': '2025-04-07T18:00', 'length': '10'
+        }))
+
+        self.assertTrue(response['success'])
+        query, params = cursor_mock.execute.call_args[0]
+        self.assertIn("timestamp >= %s AND timestamp < %s ORDER BY timestamp DESC LIMIT %s", query)
+        self.assertNotIn("DATE(", query)
+        self.assertNotIn("LIKE", query)
+        self.assertEqual(params, [datetime(2025, 4, 7, 14, 30), datetime(2025, 4, 7, 15), 10])
+
+    def test_historical_sensor_rejects_bad_filters(self):
+        """Test unparseable search strings and unknown sensors are rejected"""
+        self.data_service.get_table_columns = MagicMock(return_value=['timestamp', 'timezone', 'r01'])
+        response = self.data_service.get_historical_data_sensor('line4', 'r01', MultiDict({'searchValue': "1' OR '1'='1"}))
+        self.assertEqual(response['code'], 400)
+        response = self.data_service.get_historical_data_sensor('line4', 'r01; DROP TABLE line4', MultiDict({}))
+        self.assertEqual(response['code'], 404)
+        self.mock_db.get_connection.assert_not_called()
+
+    def test_missing_timestamp_index_only_warns(self):
+        """Test a missing timestamp index is logged once and never built or fatal at request time"""
+        cursor_mock = MagicMock()
+        cursor_mock.fetchall.return_value = [{'Column_name': 'id', 'Seq_in_index': 1}]
+        self.mock_db.get_connection().cursor.return_value = cursor_mock
+
+        self.data_service.check_timestamp_index('line4')
+        self.data_service.check_timestamp_index('line4')
+
+        cursor_mock.execute.assert_called_once_with("SHOW INDEX FROM line4")
+        self.mock_log.log_event.assert_called_once_with(
+            "No timestamp index on line4; run timestamp_indexes.py line4", type='WARNING'
+        )
+
+        # A failing check (e.g. no privilege) is swallowed
+        cursor_mock.execute.side_effect = Exception("SHOW command denied")
+        self.data_service.check_timestamp_index('line5')
+
+    def test_create_timestamp_index_setup_step(self):
+        """Test the setup step builds the index only where it is missing"""
+        cursor_mock = MagicMock()
+        cursor_mock.fetchall.return_value = [{'Column_name': 'id', 'Seq_in_index': 1}]
+        self.assertTrue(create_timestamp_index(cursor_mock, 'line4'))
+        self.assertIn("CREATE INDEX idx_line4_timestamp ON line4 (timestamp)", cursor_mock.execute.call_args[0][0])
+
+        cursor_mock.fetchall.return_value = [{'Column_name': 'timestamp', 'Seq_in_index': 1}]
+        self.assertFalse(create_timestamp_index(cursor_mock, 'line4'))
+
+    def test_schema_cache_skips_show_columns(self):
+        """Test repeated column lookups hit the cache until invalidated or expired"""
+        cursor_mock = MagicMock()
+        cursor_mock.fetchall.return_value = [('timestamp',), ('timezone',), ('r01',)]
+        self.mock_db.get_connection().cursor.return_value = cursor_mock
+        cache = SchemaCache(self.mock_db, ttl=300)
+
+        for _ in range(3):
+            self.assertEqual(cache.columns('line4'), ['timestamp', 'timezone', 'r01'])
+        self.assertEqual(cursor_mock.execute.call_count, 1)
+
+        cache.invalidate('line4')
+        cache.columns('line4')
+        self.assertEqual(cursor_mock.execute.call_count, 2)
+
+        with patch('app.time.monotonic', return_value=time.monotonic() + 301):
+            cache.columns('line4')
+        self.assertEqual(cursor_mock.execute.call_count, 3)
+
     @patch('app.generate_password_hash')
     def test_get_logs(self, mock_hash):
         """Test system logs retrieval"""
@@ -180,6 +601,63 @@ class TestDataService(unittest.TestCase):
         self.assertGreater(live_data['r01'], 0, "Sensor r01 value should be greater than 0")
         self.assertGreater(live_data['r02'], 0, "Sensor r02 value should be greater than 0")
 
+    def test_live_data_served_from_cache(self):
+        """Test live data comes from the ingest-fed cache without touching the database"""
+        cache = LatestReadingCache()
+        cache.update('line4', {'timestamp': '2025-04-07 15:30:00', 'timezone': '+01', 'r01': 150.5})
+        self.data_service.reading_cache = cache
+
+        response = self.data_service.get_live_data('line4')
+
+        self.assertTrue(response['success'])
+        self.assertEqual(response['data']['r01'], 150.5)
+        self.mock_db.get_connection.assert_not_called()
+
+    def test_live_data_cold_start_fills_cache(self):
+        """Test a cache miss falls back to the database and seeds the cache"""
+        cache = LatestReadingCache()
+        self.data_service.reading_cache = cache
+        self.mock_db.get_connection().cursor().fetchone.return_value = {
+            'timestamp': datetime(2025, 4, 7, 15, 30), 'timezone': '+01', 'r01': 150.5
+        }
+
+        response = self.data_service.get_live_data('line4')
+
+        self.assertTrue(response['success'])
+        self.assertEqual(cache.get('line4')['timestamp'], '2025-04-07 15:30:00')
+
+    def test_sensor_data_served_from_cache(self):
+        """Test single sensor reads come from the cache"""
+        cache = LatestReadingCache()
+        cache.update('line4', {'timestamp': '2025-04-07 15:30:00', 'timezone': '+01', 'r01': 150.5, 'r02': 160.75})
+        self.data_service.reading_cache = cache
+
+        response = self.data_service.get_sensor_data('line4', 'r02')
+
+        self.assertEqual(response['data'], {'timestamp': '2025-04-07 15:30:00', 'r02': 160.75})
+        self.mock_db.get_connection.assert_not_called()
+
+    def test_cache_keeps_newest_reading(self):
+        """Test an older reading never replaces a newer one"""
+        cache = LatestReadingCache()
+        cache.update('line4', {'timestamp': '2025-04-07 15:30:30', 'r01': 2.0})
+        cache.update('line4', {'timestamp': '2025-04-07 15:30:00', 'r01': 1.0})
+        self.assertEqual(cache.get('line4')['r01'], 2.0)
+
+    def test_cache_entries_expire(self):
+        """Test expired readings fall through to the database, where other writers' rows are"""
+        cache = LatestReadingCache(ttl=30)
+        with patch('app.time.monotonic', return_value=1000.0):
+            cache.update('line4', {'timestamp': '2025-04-07 15:30:30', 'r01': 2.0})
+        with patch('app.time.monotonic', return_value=1029.0):
+            self.assertEqual(cache.get('line4')['r01'], 2.0)
+        with patch('app.time.monotonic', return_value=1030.0):
+            self.assertIsNone(cache.get('line4'))
+            self.assertIsNone(cache.get_sensor('line4', 'r01'))
+            # An expired entry no longer blocks an older reading re-read from the table
+            cache.update('line4', {'timestamp': '2025-04-07 15:30:00', 'r01': 1.0})
+            self.assertEqual(cache.get('line4')['r01'], 1.0)
+
 if __name__ == '__main__':
     unittest.main()
 
@@ -5,6 +5,7 @@ from app import DatabaseManager
 from config import Config
 from flask import json
 import re
+import time
 from threading import Thread
 from werkzeug.security import generate_password_hash
 
@@ -34,6 +35,60 @@ class TestDatabaseManager(unittest.TestCase):
             self.assertIsNone(conn)
             print("Database connection failed as expected.")
 
+    def test_connection_reused_after_close(self):
+        """Test a closed connection goes back to the pool instead of reconnecting"""
+        with patch('mysql.connector.connect') as mock_connect:
+            first = self.db_manager.get_connection()
+            first.close()
+            second = self.db_manager.get_connection()
+            second.close()
+            mock_connect.assert_called_once()
+            mock_connect.return_value.rollback.assert_called()
+            mock_connect.return_value.ping.assert_called_once_with(reconnect=False)
+
+    def test_pool_exhausted_times_out(self):
+        """Test checkout gives up once every pooled connection is in use"""
+        self.db_manager.pool.size = 1
+        self.db_manager.pool.timeout = 0.05
+        with patch('mysql.connector.connect'):
+            held = self.db_manager.get_connection()
+            self.assertIsNone(self.db_manager.get_connection())
+            held.close()
+            self.assertIsNotNone(self.db_manager.get_connection())
+
+    def test_idle_connection_recycled(self):
+        """Test connections idle for longer than the recycle window are replaced"""
+        self.db_manager.pool.recycle = 0.01
+        with patch('mysql.connector.connect') as mock_connect:
+            self.db_manager.get_connection().close()
+            time.sleep(0.02)
+            self.db_manager.get_connection().close()
+            self.assertEqual(mock_connect.call_count, 2)
+
+    def test_dead_connection_replaced(self):
+        """Test an idle connection that fails the liveness ping is replaced"""
+        with patch('mysql.connector.connect') as mock_connect:
+            stale, fresh = MagicMock(), MagicMock()
+            stale.ping.side_effect = Exception("MySQL server has gone away")
+            mock_connect.side_effect = [stale, fresh]
+            self.db_manager.get_connection().close()
+            connection = self.db_manager.get_connection()
+            self.assertIs(connection._connection, fresh)
+            stale.close.assert_called_once()
+
+    def test_discarded_connection_frees_its_slot(self):
+        """Test a discarded connection is closed, not pooled, and its slot is reusable"""
+        self.db_manager.pool.size = 1
+        self.db_manager.pool.timeout = 0.05
+        with patch('mysql.connector.connect') as mock_connect:
+            first, second = MagicMock(), MagicMock()
+            mock_connect.side_effect = [first, second]
+            self.db_manager.get_connection().discard()
+            first.close.assert_called_once()
+            first.rollback.assert_not_called()
+            connection = self.db_manager.get_connection()
+            self.assertIs(connection._connection, second)
+
     def tearDown(self):
         """Stop the patch for the configuration"""
         self.config_patcher.stop()
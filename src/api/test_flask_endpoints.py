@@ -10,7 +10,8 @@ from werkzeug.security import generate_password_hash
 class TestFlaskEndpoints(unittest.TestCase):
     def setUp(self):
         """Set up the Flask app and mock database connections"""
-        self.app = FlaskApp().app
+        self.flask_app = FlaskApp()
+        self.app = self.flask_app.app
         self.app.testing = True
         self.client = self.app.test_client()
         
@@ -43,9 +44,63 @@ class TestFlaskEndpoints(unittest.TestCase):
         })
         self.assertEqual(response.status_code, 200)
 
+    def test_admin_endpoint_reports_pool_exhaustion(self):
+        """Test an admin endpoint answers with JSON when no pooled connection is free"""
+        with patch.object(self.flask_app.db_manager.pool, 'acquire', side_effect=TimeoutError("pool exhausted")):
+            response = self.client.post('/api/admin/toggle-admin-status', json={'operator_id': 2, 'admin_ID': 1})
+
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.get_json()['error'], 'Database connection failed')
+
+    def test_live_data_stream_pushes_readings(self):
+        """Test the SSE stream sends the latest reading then each published one"""
+        self.mock_cursor.fetchone.return_value = {
+            'timestamp': datetime(2025, 4, 7, 14, 30), 'timezone': '+01', 'r01': 130.45
+        }
+        response = self.client.get('/api/stream/live-data/line4', buffered=False)
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        stream = iter(response.response)
+
+        first = next(stream).decode()
+        self.assertEqual(json.loads(first[len('data: '):])['r01'], 130.45)
+
+        self.flask_app.publisher.publish('line4', {'timestamp': '2025-04-07 14:30:30', 'r01': 131.2})
+        second = next(stream).decode()
+        self.assertEqual(json.loads(second[len('data: '):])['r01'], 131.2)
+
+        response.close()
+        self.assertEqual(self.flask_app.publisher.subscriber_count('line4'), 0)
+
+    def test_export_streams_csv_in_chunks(self):
+        """Test the export endpoint streams CSV from one unbuffered query, keeping rows with equal timestamps"""
+        self.mock_cursor.fetchall.return_value = [('timestamp',), ('timezone',), ('r01',)]
+        self.mock_cursor.fetchmany.side_effect = [
+            [(datetime(2025, 4, 7, 14, 30), '+01', 130.45), (datetime(2025, 4, 7, 14, 30, 30), '+01', 131.2)],
+            [(datetime(2025, 4, 7, 14, 30, 30), '+01', 131.3), (datetime(2025, 4, 7, 14, 31), '+01', 129.8)],
+            []
+        ]
+        with patch('app.Config.EXPORT_CHUNK_SIZE', 2):
+            response = self.client.get('/api/export/line4?format=csv&start=2025-04-07T14:30')
+            body = response.get_data(as_text=True)
+
+        self.assertEqual(response.mimetype, 'text/csv')
+        self.assertEqual(body.splitlines(), [
+            'timestamp,timezone,r01',
+            '2025-04-07 14:30:00,+01,130.45',
+            '2025-04-07 14:30:30,+01,131.2',
+            '2025-04-07 14:30:30,+01,131.3',
+            '2025-04-07 14:31:00,+01,129.8'
+        ])
+        query, params = self.mock_cursor.execute.call_args[0]
+        self.assertTrue(query.endswith("timestamp >= %s ORDER BY timestamp ASC"))
+        self.assertEqual(params, [datetime(2025, 4, 7, 14, 30)])
+        self.mock_cursor.fetchmany.assert_called_with(2)
+        self.mock_conn.cursor.assert_any_call(buffered=False)
+
     def tearDown(self):
-        """Stop patching the database connection"""
+        """Stop patching the database connection and the app's log writer"""
         self.db_patcher.stop()
+        self.flask_app.log_service.close()
 
 if __name__ == '__main__':
     unittest.main()
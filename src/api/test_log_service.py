@@ -142,5 +142,73 @@ class TestLogService(unittest.TestCase):
 
         print("Test log persistence passed successfully.")
 
+    def test_batched_writer_flushes_multi_row_insert(self):
+        """Test batched mode queues events and writes them in one multi-row insert"""
+        mock_connection = MagicMock()
+        mock_cursor = MagicMock()
+        mock_connection.cursor.return_value = mock_cursor
+        self.db_manager.get_connection.return_value = mock_connection
+        log_service = LogService(self.db_manager, batched=True, batch_size=3, flush_interval=5)
+
+        for i in range(3):
+            log_service.log_event(f"Event {i}", 'INFO', 'admin')
+        log_service.close()
+
+        query, rows = mock_cursor.executemany.call_args[0]
+        self.assertEqual(re.sub(r'\s+', ' ', query.strip()),
+                         "INSERT INTO logs (timestamp, level, type, message) VALUES (%s, %s, %s, %s)")
+        self.assertEqual([row[1:] for row in rows], [('admin', 'INFO', f"Event {i}") for i in range(3)])
+        self.assertIsInstance(rows[0][0], datetime)
+        mock_cursor.execute.assert_not_called()
+        mock_connection.commit.assert_called_once()
+        self.assertEqual(log_service.written, 3)
+
+        print("Test batched log writer passed successfully.")
+
+    def test_close_flushes_partial_batch(self):
+        """Test close() writes events that have not filled a batch yet"""
+        mock_cursor = self.db_manager.get_connection().cursor()
+        log_service = LogService(self.db_manager, batched=True, batch_size=100, flush_interval=60)
+
+        log_service.log_event("Shutting down", 'INFO', 'admin')
+        log_service.close()
+
+        self.assertEqual(len(mock_cursor.executemany.call_args[0][1]), 1)
+        # Once closed, events are written synchronously again
+        log_service.log_event("After close", 'INFO', 'admin')
+        mock_cursor.execute.assert_called_once()
+
+        print("Test close flush passed successfully.")
+
+    @patch('app.atexit')
+    def test_close_unregisters_exit_hook(self, mock_atexit):
+        """Test the atexit flush registered by a batched writer is removed on close"""
+        log_service = LogService(self.db_manager, batched=True)
+        mock_atexit.register.assert_called_once_with(log_service.close)
+
+        log_service.close()
+        mock_atexit.unregister.assert_called_once_with(log_service.close)
+        self.assertFalse(log_service._writer.is_alive())
+
+    def test_overflow_policies(self):
+        """Test drop discards overflow and sample thins INFO events but keeps errors"""
+        log_service = LogService(self.db_manager, max_pending=10, overflow='drop')
+        log_service._writer = MagicMock()  # Queue without a writer draining it
+        for i in range(15):
+            log_service.log_event(f"Event {i}")
+        self.assertEqual((log_service._queue.qsize(), log_service.dropped), (10, 5))
+
+        log_service = LogService(self.db_manager, max_pending=10, overflow='sample', sample_rate=0)
+        log_service._writer = MagicMock()
+        for i in range(10):
+            log_service.log_event(f"Event {i}")
+        log_service.log_event("Something failed", 'ERROR')
+        self.assertEqual((log_service._queue.qsize(), log_service.dropped), (9, 2))
+
+        with self.assertRaises(ValueError):
+            LogService(self.db_manager, overflow='ignore')
+
+        print("Test overflow policies passed successfully.")
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,7 +1,12 @@
 import unittest
 from unittest.mock import MagicMock, patch
 from datetime import datetime
-from app import SimulationService, LogService
+import numpy as np
+from app import SimulationService, LogService, ReadingPublisher, ReplayService
+import os
+import tempfile
+import time
+import backfill
 from flask import json
 import re
 from threading import Thread 
@@ -91,17 +96,15 @@ class TestSimulationService(unittest.TestCase):
         # Assert that the thread was started
         mock_thread.return_value.start.assert_called_once()
 
-        # Now, test stop (it should not explicitly stop the thread as it's a daemon thread)
-        # Call stop and check if it doesn't raise an error or do anything specific (since it's a daemon thread)
+        # stop signals the worker and waits for it to exit
+        mock_thread.return_value.is_alive.return_value = False
         self.sim_service.stop()
-
-        # Since the `stop()` method doesn't explicitly stop the thread in this implementation,
-        # there's no direct assertion here, but we can ensure it runs without errors.
+        mock_thread.return_value.join.assert_called_once_with(None)
+        self.assertTrue(self.sim_service._stop.is_set())
         print("Test simulation start/stop passed successfully.")
 
-    @patch('time.localtime')
-    @patch.object(SimulationService, 'generate_sensor_reading')
-    def test_insert_line_readings(self, mock_generate_reading, mock_localtime):
+    @patch.object(SimulationService, 'generate_readings')
+    def test_insert_line_readings(self, mock_generate_readings):
         """Test database insertion of readings"""
 
         sensor_ranges_line4 = {
@@ -109,26 +112,20 @@ class TestSimulationService(unittest.TestCase):
             "r02": {"avg": 264.81, "min": 18.00, "max": 526.00}
         }
 
-        mock_localtime.return_value.tm_mon = 5
         current_timestamp = datetime.now().replace(microsecond=0).strftime('%Y-%m-%d %H:%M:%S')
         timezone_offset = "+01"
 
-        mock_generate_reading.side_effect = [130.45, 267.87]
+        mock_generate_readings.return_value = np.array([[130.45, 267.87]])
 
-        mock_connection = MagicMock()
         mock_cursor = MagicMock()
-        mock_connection.cursor.return_value = mock_cursor
-        self.mock_db.get_connection.return_value = mock_connection
 
-        # ✅ Define sensors
         sensors = ['r01', 'r02']
 
-        # ✅ Mock SHOW COLUMNS result to make them "valid"
+        # Mock SHOW COLUMNS result to make them "valid"
         mock_cursor.fetchall.return_value = [('timestamp',), ('timezone',), ('r01',), ('r02',)]
 
-        self.sim_service.insert_line_readings(
-            mock_connection, mock_cursor, 'line4',
-            sensors, sensor_ranges_line4, current_timestamp, timezone_offset
+        readings = self.sim_service.insert_line_batch(
+            mock_cursor, 'line4', sensors, sensor_ranges_line4, [(current_timestamp, timezone_offset)]
         )
 
         expected_query = """
@@ -141,15 +138,205 @@ class TestSimulationService(unittest.TestCase):
             return " ".join(query.strip().split())
 
         normalized_expected_query = normalize_query(expected_query)
-        normalized_actual_query = normalize_query(mock_cursor.execute.call_args[0][0])
+        normalized_actual_query = normalize_query(mock_cursor.executemany.call_args[0][0])
 
         self.assertEqual(normalized_actual_query, normalized_expected_query)
-        self.assertEqual(mock_cursor.execute.call_args[0][1],
-                        [current_timestamp, timezone_offset, 130.45, 267.87])
-        mock_connection.commit.assert_called_once()
+        self.assertEqual(mock_cursor.executemany.call_args[0][1],
+                        [[current_timestamp, timezone_offset, 130.45, 267.87]])
+        self.assertEqual(readings, [
+            {"timestamp": current_timestamp, "timezone": timezone_offset, "r01": 130.45, "r02": 267.87}
+        ])
 
         print("Test insert line readings passed successfully.")
 
+    def test_sub_second_interval_rejected(self):
+        """Test intervals that would stamp several ticks with the same second are refused"""
+        with self.assertRaises(ValueError):
+            SimulationService(self.mock_db, self.mock_log, interval=0.25)
+
+    def test_write_batch_single_commit(self):
+        """Test a batch writes every line as one multi-row insert and commits once"""
+        self.sim_service.sensors = {
+            'line4': {"r01": {"avg": 129.10, "min": 16.00, "max": 258.00}},
+            'line5': {"r01": {"avg": 133.31, "min": 18.00, "max": 226.00}}
+        }
+        self.sim_service.publisher = ReadingPublisher()
+        subscriber = self.sim_service.publisher.subscribe('line5')
+        mock_connection = MagicMock()
+        mock_cursor = MagicMock()
+        mock_cursor.fetchall.return_value = [('timestamp',), ('timezone',), ('r01',)]
+        ticks = [('2025-04-07 14:30:00', '+01'), ('2025-04-07 14:30:01', '+01'), ('2025-04-07 14:30:02', '+01')]
+
+        self.sim_service.write_batch(mock_connection, mock_cursor, ticks)
+
+        self.assertEqual(mock_cursor.executemany.call_count, 2)
+        query, rows = mock_cursor.executemany.call_args[0]
+        self.assertIn("INSERT INTO line5", query)
+        self.assertEqual([row[:2] for row in rows], [list(tick) for tick in ticks])
+        mock_connection.commit.assert_called_once()
+        self.assertEqual(subscriber.qsize(), 3)
+        stats = self.sim_service.stats.snapshot()
+        self.assertEqual((stats['rows'], stats['batches'], stats['errors']), (6, 1, 0))
+        self.assertIsNotNone(stats['batch_latency_ms']['p95'])
+
+        print("Test batched write passed successfully.")
+
+    def test_write_batch_rolls_back_on_error(self):
+        """Test a failing line rolls back the whole batch and counts an error"""
+        self.sim_service.sensors = {'line4': {"r01": {"avg": 129.10, "min": 16.00, "max": 258.00}}}
+        mock_connection = MagicMock()
+        mock_cursor = MagicMock()
+        mock_cursor.fetchall.return_value = [('timestamp',), ('timezone',), ('r01',)]
+        mock_cursor.executemany.side_effect = Exception("Duplicate entry")
+
+        with self.assertRaises(Exception):
+            self.sim_service.write_batch(mock_connection, mock_cursor, [('2025-04-07 14:30:00', '+01')])
+
+        mock_connection.rollback.assert_called_once()
+        mock_connection.commit.assert_not_called()
+        self.assertEqual(self.sim_service.stats.snapshot()['errors'], 1)
+
+    def test_virtual_lines(self):
+        """Test virtual lines copy the template's sensors and tables"""
+        self.sim_service.add_virtual_lines(2, 'line5')
+        self.assertEqual(self.sim_service.sensors['line5_v002'], self.sim_service.sensors['line5'])
+        mock_cursor = MagicMock()
+        self.sim_service.create_virtual_tables(mock_cursor)
+        mock_cursor.execute.assert_any_call("CREATE TABLE IF NOT EXISTS line5_v001 LIKE line5")
+
+    def test_vectorized_readings(self):
+        """Test readings for many ticks are generated, clamped and rounded in one call"""
+        readings = self.sim_service.generate_readings('line5', ['r17', 'r01'], 1000)
+        self.assertEqual(readings.shape, (1000, 2))
+        avg = np.array([151.66, 133.31])
+        self.assertTrue(np.all(readings >= np.round(avg * 0.98, 2)))
+        self.assertTrue(np.all(readings <= np.round(avg * 1.02, 2)))
+        np.testing.assert_array_equal(readings, np.round(readings, 2))
+
+        # Tight limits clamp every value
+        self.sim_service.add_sensor_range('line4', 'r01', {"avg": 100.0, "min": 99.5, "max": 100.5})
+        clamped = self.sim_service.generate_readings('line4', ['r01'], 1000)
+        self.assertTrue(np.all((clamped >= 99.5) & (clamped <= 100.5)))
+        self.assertIn(99.5, clamped)
+
+    def test_seeded_readings_are_reproducible(self):
+        """Test two simulators with the same seed generate the same readings"""
+        first = SimulationService(self.mock_db, self.mock_log, seed=42)
+        second = SimulationService(self.mock_db, self.mock_log, seed=42)
+        np.testing.assert_array_equal(
+            first.generate_readings('line4', ['r01', 'r02'], 50),
+            second.generate_readings('line4', ['r01', 'r02'], 50)
+        )
+        self.assertEqual(first.generate_sensor_reading('r01', first.sensors['line4']),
+                         second.generate_sensor_reading('r01', second.sensors['line4']))
+
+    @patch('time.monotonic')
+    def test_next_tick_skips_missed_ticks(self, mock_monotonic):
+        """Test ticks stay on the fixed-rate schedule and overdue ones are counted as missed"""
+        self.sim_service.interval = 30
+        self.sim_service._stop = MagicMock()
+        self.sim_service._stop.wait.return_value = False
+
+        mock_monotonic.return_value = 1010.0
+        self.assertEqual(self.sim_service.next_tick(1, started=1000.0), 1)
+        self.sim_service._stop.wait.assert_called_with(20.0)
+
+        # A write that ran 75 seconds past tick 1 loses ticks 1 and 2
+        mock_monotonic.return_value = 1105.0
+        self.assertEqual(self.sim_service.next_tick(1, started=1000.0), 3)
+        self.sim_service._stop.wait.assert_called_with(0)
+        self.assertEqual(self.sim_service.stats.snapshot()['missed_ticks'], 2)
+
+        self.sim_service._stop.wait.return_value = True
+        self.assertIsNone(self.sim_service.next_tick(4, started=1000.0))
+
+    @patch('threading.Thread')
+    def test_stop_warns_when_worker_outlives_timeout(self, mock_thread):
+        """Test stop reports a worker still running after the join timeout instead of claiming it stopped"""
+        mock_thread.return_value.is_alive.return_value = True
+        self.sim_service.start()
+        self.sim_service.stop(timeout=2)
+
+        self.mock_log.log_event.assert_called_with(
+            "Temperature simulation still writing 2s after stop was requested", type='WARNING'
+        )
+
+    def test_scheduler_stops_within_a_tick(self):
+        """Test the worker writes evenly stamped ticks and exits promptly on stop"""
+        self.sim_service.interval = 1
+        self.sim_service.batch_ticks = 2
+        batches = []
+        with patch.object(SimulationService, 'write_batch', side_effect=lambda c, cur, ticks: batches.append(ticks)):
+            self.sim_service.start()
+            time.sleep(1.5)
+            stopped = time.monotonic()
+            self.sim_service.stop(timeout=5)
+            self.assertLess(time.monotonic() - stopped, 1)
+
+        self.assertFalse(self.sim_service.thread.is_alive())
+        self.assertEqual(len(batches), 1)
+        first, second = (datetime.strptime(tick[0], '%Y-%m-%d %H:%M:%S') for tick in batches[0])
+        self.assertEqual((second - first).total_seconds(), 1)
+        self.mock_log.log_event.assert_any_call("Temperature simulation stopped", type='INFO')
+
+    def test_backfill_line(self):
+        """Test a backfill writes evenly spaced chunks with seasonal timezones and refreshes rollups"""
+        mock_connection = MagicMock()
+        mock_cursor = MagicMock()
+        mock_connection.cursor.return_value = mock_cursor
+        mock_cursor.fetchall.return_value = [('timestamp',), ('timezone',), ('r01',), ('r02',)]
+        mock_cursor.fetchone.return_value = None  # no rollup tables yet
+        start, end = datetime(2025, 3, 31, 23, 0), datetime(2025, 4, 1, 1, 0)
+
+        result = backfill.backfill_line(
+            mock_connection, self.sim_service, 'line4', start, end, interval=60, seasonality=0.1, chunk_size=50
+        )
+
+        self.assertEqual(result['rows'], 120)
+        self.assertEqual(mock_cursor.executemany.call_count, 3)
+        self.assertEqual(mock_connection.commit.call_count, 3)
+        rows = [row for call in mock_cursor.executemany.call_args_list for row in call[0][1]]
+        self.assertEqual(rows[0][:2], ['2025-03-31 23:00:00', '+00'])
+        self.assertEqual(rows[-1][:2], ['2025-04-01 00:59:00', '+01'])
+        self.assertEqual(len(rows[0]), 4)
+
+    @patch('bulk_load.os.remove')
+    def test_backfill_load_data(self, mock_remove):
+        """Test --load-data loads each chunk from a CSV through the shared LOAD DATA helper"""
+        mock_connection = MagicMock()
+        mock_cursor = MagicMock()
+        mock_connection.cursor.return_value = mock_cursor
+        mock_cursor.fetchall.return_value = [('timestamp',), ('timezone',), ('r01',)]
+        mock_cursor.fetchone.return_value = None
+
+        backfill.backfill_line(mock_connection, self.sim_service, 'line4',
+                               datetime(2025, 1, 1), datetime(2025, 1, 1, 0, 2), interval=60, load_data=True)
+
+        query = mock_cursor.execute.call_args_list[1][0][0]
+        self.assertTrue(query.startswith("LOAD DATA LOCAL INFILE '"))
+        self.assertIn("INTO TABLE line4", query)
+        self.assertTrue(query.endswith("(timestamp, timezone, r01)"))
+        path = mock_remove.call_args[0][0]
+        with open(path) as f:
+            lines = f.read().splitlines()
+        os.unlink(path)
+        self.assertEqual([line.split(',')[:2] for line in lines],
+                         [['2025-01-01 00:00:00', '+00'], ['2025-01-01 00:01:00', '+00']])
+
+    def test_backfill_scale_factors(self):
+        """Test seasonality peaks at noon and drift grows linearly over the range"""
+        start, end = datetime(2025, 1, 1), datetime(2025, 1, 3)
+        times = backfill.tick_times(start, end, 6 * 3600)
+        np.testing.assert_allclose(backfill.scale_factors(times, start, end, seasonality=0.1)[:4],
+                                   [0.9, 1.0, 1.1, 1.0], atol=1e-9)
+        drift = backfill.scale_factors(times, start, end, drift=0.2)
+        self.assertAlmostEqual(drift[0], 1.0)
+        self.assertAlmostEqual(drift[4], 1.1)
+
+        # Scaled averages move the generated readings with them
+        readings = self.sim_service.generate_readings('line4', ['r01'], 3, scale=np.array([0.5, 1.0, 1.5]))
+        self.assertLess(readings[0, 0], readings[1, 0])
+        self.assertLess(readings[1, 0], readings[2, 0])
 
     def test_reading_range_validation(self):
         """Test sensor readings stay within defined ranges"""
@@ -182,5 +369,82 @@ class TestSimulationService(unittest.TestCase):
 
         print("Test reading range validation passed successfully.")
 
+class TestReplayService(unittest.TestCase):
+    def setUp(self):
+        self.mock_db = MagicMock()
+        self.mock_connection = MagicMock()
+        self.mock_cursor = MagicMock()
+        self.mock_db.get_connection.return_value = self.mock_connection
+        self.mock_connection.cursor.return_value = self.mock_cursor
+        self.mock_cursor.fetchall.return_value = [('timestamp',), ('timezone',), ('r01',), ('r02',)]
+        self.sim_service = SimulationService(self.mock_db, MagicMock(spec=LogService))
+        self.sim_service.publisher = ReadingPublisher()
+
+        self.replay_dir = tempfile.mkdtemp()
+        with open(os.path.join(self.replay_dir, 'incident.csv'), 'w') as f:
+            f.write("timestamp,r01,r02,r99\n"
+                    "2024-06-01T10:00:00Z,1.5,2.0,9\n"
+                    "2024-06-01 10:00:30+00:00,1.6,,9\n"
+                    "not a date,1.0,1.0,9\n"
+                    "2024-12-01 10:01:00,1.7,2.2,9\n")
+        self.replay_service = ReplayService(self.sim_service, MagicMock(spec=LogService), self.replay_dir,
+                                            chunk_size=2, batch_size=2)
+
+    def test_replay_at_full_speed(self):
+        """Test a file is read in chunks and written with its own timestamps and seasonal timezones"""
+        subscriber = self.sim_service.publisher.subscribe('line4')
+        result = self.replay_service.start({'line': 'line4', 'file': 'incident.csv', 'speed': 0})
+        self.assertTrue(result['success'])
+        self.replay_service.thread.join(5)
+
+        rows = [row for call in self.mock_cursor.executemany.call_args_list for row in call[0][1]]
+        self.assertEqual(rows, [
+            ['2024-06-01 10:00:00', '+01', 1.5, 2.0],
+            ['2024-06-01 10:00:30', '+01', 1.6, None],
+            ['2024-12-01 10:01:00', '+00', 1.7, 2.2]
+        ])
+        self.assertEqual(self.mock_connection.commit.call_count, 2)
+        self.assertEqual(subscriber.qsize(), 3)
+        status = self.replay_service.get_status()['data']
+        self.assertEqual(status['state'], 'finished')
+        self.assertEqual(status['stats']['rows'], 3)
+
+    def test_replay_paces_and_stops(self):
+        """Test rows are held until due and a stop ends the replay between batches"""
+        result = self.replay_service.start({'line': 'line4', 'file': 'incident.csv', 'speed': 1})
+        self.assertTrue(result['success'])
+        self.assertEqual(self.replay_service.start({'line': 'line4', 'file': 'incident.csv'})['code'], 409)
+
+        # The first row is due at once, the next one 30 seconds later
+        for _ in range(100):
+            if self.replay_service.stats.rows:
+                break
+            time.sleep(0.05)
+        self.replay_service.stop()
+        self.replay_service.thread.join(5)
+
+        self.assertFalse(self.replay_service.thread.is_alive())
+        self.assertEqual(self.replay_service.get_status()['data']['state'], 'stopped')
+        # Only the first row was due before the stop, stamped with the replay's start time
+        rows = [row for call in self.mock_cursor.executemany.call_args_list for row in call[0][1]]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0][2:], [1.5, 2.0])
+        self.assertNotEqual(rows[0][0], '2024-06-01 10:00:00')
+
+    def test_replay_validation(self):
+        """Test only known lines and files inside the replay directory are accepted"""
+        self.assertEqual(self.replay_service.start({'line': 'line4', 'file': '../config.py'})['code'], 404)
+        self.assertEqual(self.replay_service.start({'line': 'line9', 'file': 'incident.csv'})['code'], 404)
+        self.assertEqual(self.replay_service.start({'line': 'line4', 'file': 'incident.csv', 'speed': -1})['code'], 400)
+        self.assertEqual(self.replay_service.start({'line': 'line4'})['code'], 400)
+        # Rows have no due time at full speed, and flags sent as strings are parsed, not truth-tested
+        self.assertEqual(self.replay_service.start(
+            {'line': 'line4', 'file': 'incident.csv', 'speed': 0, 'retime': True})['code'], 400)
+        self.assertEqual(self.replay_service.start(
+            {'line': 'line4', 'file': 'incident.csv', 'retime': 'maybe'})['code'], 400)
+        self.assertIs(ReplayService.parse_flag("false"), False)
+        self.assertIs(ReplayService.parse_flag("True"), True)
+        self.assertIsNone(self.replay_service.thread)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,34 @@
+import sys
+
+# Historical queries filter and sort line tables on timestamp, so each one needs
+# an index led by that column. Building it on a large table takes a while, so it
+# is a setup step run from here, never from a request.
+
+def has_timestamp_index(cursor, line):
+    """Whether timestamp leads an index on the table; cursor must be a dictionary cursor"""
+    cursor.execute(f"SHOW INDEX FROM {line}")
+    return any(index['Column_name'] == 'timestamp' and index['Seq_in_index'] == 1 for index in cursor.fetchall())
+
+def create_timestamp_index(cursor, line):
+    """Create the timestamp index unless one exists; returns whether it was created"""
+    if has_timestamp_index(cursor, line):
+        return False
+    # Online DDL: reads and ingest carry on while the index builds
+    cursor.execute(f"CREATE INDEX idx_{line}_timestamp ON {line} (timestamp) ALGORITHM=INPLACE LOCK=NONE")
+    return True
+
+if __name__ == "__main__":
+    # Usage: python timestamp_indexes.py line4 [line5 ...]
+    import mysql.connector
+    from config import Config
+    connection = mysql.connector.connect(
+        host=Config.DB_HOST, user=Config.DB_USER, password=Config.DB_PASSWORD, database=Config.DB_NAME
+    )
+    try:
+        cursor = connection.cursor(dictionary=True)
+        for line in sys.argv[1:] or ["line4", "line5"]:
+            created = create_timestamp_index(cursor, line)
+            print(f"{line}: {'created idx_' + line + '_timestamp' if created else 'timestamp index already present'}")
+        cursor.close()
+    finally:
+        connection.close()
@@ -7,16 +7,23 @@ Original file is located at
     https://colab.research.google.com/drive/18ftqZK5t2X6rgCb6wwsVMsWIQxQsHcMU
 """
 
-!pip install prophet pandas
+!pip install prophet pandas pyarrow
 
 from google.colab import files
 
-# Upload the CSV file first line 4 or 5
-uploaded = files.upload()
+# Set to the directory written by src/api/sensor_archive.py (with sensor_archive.py
+# uploaded next to this notebook) to skip the CSV upload and load the memory-mapped
+# day partitions instead
+ARCHIVE_DIR = None
+LINE = "line5"
 
-# Confirm the filename (update this if needed after upload)
-csv_filename = list(uploaded.keys())[0]
-print(f"✅ Uploaded CSV file: {csv_filename}")
+if ARCHIVE_DIR is None:
+    # Upload the CSV file first line 4 or 5
+    uploaded = files.upload()
+
+    # Confirm the filename (update this if needed after upload)
+    csv_filename = list(uploaded.keys())[0]
+    print(f"✅ Uploaded CSV file: {csv_filename}")
 
 # Upload the PKL file next line 4 or 5
 uploaded = files.upload()
@@ -27,8 +34,12 @@ print(f"✅ Uploaded PKL file: {pkl_filename}")
 
 import pandas as pd
 
-# Load the CSV data
-df = pd.read_csv(csv_filename)
+if ARCHIVE_DIR is None:
+    # Load the CSV data
+    df = pd.read_csv(csv_filename)
+else:
+    from sensor_archive import read_line
+    df = read_line(LINE, ARCHIVE_DIR)
 
 # Ensure timestamp is datetime and fix timezone issues (remove timezone if present)
 df['timestamp'] = pd.to_datetime(df['timestamp'], errors='coerce', utc=True)
@@ -9,6 +9,11 @@ document.addEventListener('DOMContentLoaded', function () {
 
     let table = null;
 
+    // Keyset paging state: the last page shown and the cursors it returned
+    let lastPage = null;
+    let lastResponse = null;
+    let pendingPage = null;
+
     let availableColumns = {
         "line4": ["timestamp", "timezone","r01", "r02", "r03", "r04", "r05", "r06", "r07", "r08"],
         "line5": ["timestamp", "timezone", "r01", "r02", "r03", "r04", "r05", "r06", "r07", "r08", "r09", "r10", "r11", "r12", "r13", "r14", "r15", "r16", "r17"]
@@ -60,6 +65,10 @@ document.addEventListener('DOMContentLoaded', function () {
             return { data: col, type: "num" };
         });
 
+        // Filters or line changed, so earlier cursors no longer apply
+        lastPage = null;
+        lastResponse = null;
+
         // Initialize or reset table structure
         if ($.fn.DataTable.isDataTable("#lineTable")) {
             table.destroy();
@@ -82,11 +91,10 @@ document.addEventListener('DOMContentLoaded', function () {
             order: [[0, 'desc']], 
             responsive: true,
             autoWidth: false,
-            pageLength: -1, 
+            pageLength: 100,
             lengthChange: false,
             scrollY: '600px', 
             scrollCollapse: true,
-            scroller: true, 
             columns: columns,
             ajax: {
                 url: apiUrl,
@@ -94,11 +102,23 @@ document.addEventListener('DOMContentLoaded', function () {
                 contentType: "application/json",
                 data: function(d) {
                     const requestData = {
-                        length: -1, // Request all entries
+                        length: d.length,
+                        start: d.start,
                         dateFilter: $('#dateFilter').val(),
                         startDateTime: $('#startDateTimeFilter').val(),
                         endDateTime: $('#endDateTimeFilter').val(),
                     };
+
+                    // Next/previous seek from the neighbouring page's cursor; other jumps use OFFSET
+                    const page = Math.floor(d.start / d.length);
+                    if (lastResponse && page === lastPage + 1 && lastResponse.nextCursor) {
+                        requestData.cursor = lastResponse.nextCursor;
+                        requestData.direction = 'next';
+                    } else if (lastResponse && page === lastPage - 1 && lastResponse.prevCursor) {
+                        requestData.cursor = lastResponse.prevCursor;
+                        requestData.direction = 'prev';
+                    }
+                    pendingPage = page;
                     console.log("Request Data:", requestData);
                     
                     return JSON.stringify(requestData);
@@ -111,6 +131,8 @@ document.addEventListener('DOMContentLoaded', function () {
                         console.error("API Error:", response.error);
                         return [];
                     }
+                    lastPage = pendingPage;
+                    lastResponse = response;
                     return response.data;
                 }
             },
@@ -8,6 +8,11 @@ let scatterChart;
 let liveScatterData = { normal: [], warning: [], critical: [] };
 let forecastThresholds = {};
 let trafficLightSystem = false;
+let liveStream = null;
+let pollTimer = null;
+let forecastCache = { line: null, fetchedAt: 0 };
+
+const FORECAST_REFRESH_MS = 60000;
 
 // Fixed sensor configuration
 const SENSOR_CONFIG = {
@@ -432,48 +437,93 @@ function updateScatterChart() {
 }
 
 // Data Fetching
+function handleLiveData(liveData) {
+    // First ensure our selectors are up to date
+    updateSensorSelector(selectedLine).then(() => {
+        updateDonutCharts(liveData);
+        updateBarChart(liveData);
+        updateLiveScatterChart(liveData);
+        updateAnalytics(liveData);
+        fetchForecastedData(liveData);
+    });
+}
+
 function fetchLiveData() {
     fetch(`http://127.0.0.1:5000/api/live-data/${selectedLine}`)
         .then(response => response.json())
         .then(data => {
             if (data.success) {
-                // First ensure our selectors are up to date
-                updateSensorSelector(selectedLine).then(() => {
-                    updateDonutCharts(data.data);
-                    updateBarChart(data.data);
-                    updateLiveScatterChart(data.data);
-                    updateAnalytics(data.data);
-                    fetchForecastedData(data.data);
-                });
+                handleLiveData(data.data);
             }
         })
         .catch(console.error);
 }
 
+// Readings are pushed over Server-Sent Events; polling is only the fallback
+function connectLiveStream() {
+    if (liveStream) liveStream.close();
+    if (!window.EventSource) {
+        startPolling();
+        return;
+    }
+
+    liveStream = new EventSource(`http://127.0.0.1:5000/api/stream/live-data/${selectedLine}`);
+    liveStream.onopen = stopPolling;
+    liveStream.onmessage = event => handleLiveData(JSON.parse(event.data));
+    liveStream.onerror = () => {
+        // EventSource reconnects by itself; poll until it does
+        if (liveStream.readyState !== EventSource.OPEN) startPolling();
+    };
+}
+
+function startPolling() {
+    if (!pollTimer) {
+        fetchLiveData();
+        pollTimer = setInterval(fetchLiveData, 5000);
+    }
+}
+
+function stopPolling() {
+    clearInterval(pollTimer);
+    pollTimer = null;
+}
+
 function fetchForecastedData(liveData) {
+    // Forecasts only change when a forecast run finishes, so reuse them between readings
+    const now = Date.now();
+    if (forecastCache.line === selectedLine && now - forecastCache.fetchedAt < FORECAST_REFRESH_MS) {
+        applyForecastedData(forecastCache.data, liveData);
+        return;
+    }
+
     fetch(`http://127.0.0.1:5000/api/forecasted-data/${selectedLine}`)
         .then(response => response.json())
         .then(data => {
-            if (data.success && data.data?.length > 0) {
-                const currentTime = new Date();
-                const latestForecastTime = new Date(data.data[0].forecast_time);
-                const timeDifference = Math.abs(currentTime - latestForecastTime) / (1000 * 60);
-                
-                if (timeDifference <= 60) {
-                    trafficLightSystem = true;
-                    document.getElementById("mlWarningMessage").style.display = "none";
-                    processForecastedThresholds(data.data);
-                    updateTrafficLightStatus(data.data, liveData);
-                } else {
-                    handleInoperativeTrafficLightSystem();
-                }
-            } else {
-                handleInoperativeTrafficLightSystem();
-            }
+            forecastCache = { line: selectedLine, fetchedAt: now, data: data };
+            applyForecastedData(data, liveData);
         })
         .catch(console.error);
 }
 
+function applyForecastedData(data, liveData) {
+    if (data.success && data.data?.length > 0) {
+        const currentTime = new Date();
+        const latestForecastTime = new Date(data.data[0].forecast_time);
+        const timeDifference = Math.abs(currentTime - latestForecastTime) / (1000 * 60);
+        
+        if (timeDifference <= 60) {
+            trafficLightSystem = true;
+            document.getElementById("mlWarningMessage").style.display = "none";
+            processForecastedThresholds(data.data);
+            updateTrafficLightStatus(data.data, liveData);
+        } else {
+            handleInoperativeTrafficLightSystem();
+        }
+    } else {
+        handleInoperativeTrafficLightSystem();
+    }
+}
+
 function processForecastedThresholds(forecastedData) {
     forecastThresholds = {};
     forecastedData.forEach(record => {
@@ -567,17 +617,17 @@ document.addEventListener("DOMContentLoaded", async () => {
     await initializeDonutSlider(selectedLine);
     initCharts();
     await updateSensorSelector(selectedLine);
-    fetchLiveData();
+    connectLiveStream();
 
     document.getElementById("lineSelector").addEventListener("change", async function() {
         selectedLine = this.value;
         await initializeDonutSlider(selectedLine);
         await updateSensorSelector(selectedLine);
-        fetchLiveData();
+        stopPolling();
+        connectLiveStream();
     });
 
     document.getElementById('prevDonut').addEventListener('click', slideDonutsLeft);
     document.getElementById('nextDonut').addEventListener('click', slideDonutsRight);
     document.getElementById("sensorSelector").addEventListener("change", updateScatterChart);
-    setInterval(fetchLiveData, 5000);
 });
\ No newline at end of file
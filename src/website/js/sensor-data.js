@@ -10,6 +10,8 @@ if (!line || !sensor) {
 }
 
 const cacheKey = `sensorData_${line}_${sensor}`;
+// Long ranges are downsampled server-side to about this many points
+const maxChartPoints = 2000;
 let chartData = [];
 let historicalData = [];
 let liveData = [];
@@ -223,7 +225,7 @@ function getDataPointsForTimeRange(range) {
 }
 
 function fetchHistoricalData(pointsToFetch) {
-  fetch(`http://127.0.0.1:5000/api/historical/${line}/${sensor}?length=${pointsToFetch}`)
+  fetch(`http://127.0.0.1:5000/api/historical/${line}/${sensor}?length=${pointsToFetch}&points=${maxChartPoints}`)
     .then(response => response.json())
     .then(data => {
       if (data.success) {